@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+from metrics import counter, gauge, histogram
+
+OUTBOX_PATH = os.environ.get("CSMS_OUTBOX", "outbox.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id           INTEGER PRIMARY KEY,
+    subject      TEXT NOT NULL,
+    message      TEXT NOT NULL,
+    created      REAL NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'pending',
+    last_error   TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+ENQUEUED = counter("csms_outbox_enqueued_total", "Alerts queued for email delivery")
+DELIVERIES = counter("csms_outbox_deliveries_total",
+                     "Delivery attempts per alert by outcome (retry: failed, will be tried again)", ["result"])
+SEND_TIME = histogram("csms_email_send_seconds", "Duration of one send call (a digest batch counts once)", ["mode"])
+PENDING = gauge("csms_outbox_pending", "Alerts waiting in the outbox")
+
+
+# -------------------------------------------------
+# DURABLE ALERT OUTBOX
+# -------------------------------------------------
+# Producers (the dashboard's threshold checks) only insert a row and return.
+# A daemon worker drains due rows through `sender(subject, message)`, retrying
+# failures with exponential backoff. Rows live in a SQLite file, so alerts
+# queued before a crash or restart are still delivered afterwards.
+#
+# With a `batch_sender`, due rows are claimed together and handed over in
+# one call; `coalesce_window` holds the first due row back that many seconds
+# so alerts raised close together leave as a single batch (digest). The
+# batch sender may return one result per alert (None = sent, else the
+# exception) so only the failed rows go back for a retry; if it raises,
+# the whole batch is retried.
+
+class AlertOutbox:
+    def __init__(self, sender, path=OUTBOX_PATH, max_attempts=8, base_delay=2.0, max_delay=300.0,
+                 poll_interval=1.0, batch_sender=None, coalesce_window=0.0, max_batch=50):
+        self.sender = sender
+        self.batch_sender = batch_sender
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        # Anything a previous process was in the middle of sending goes out again
+        with self._conn:
+            self._conn.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+        PENDING.set_function(self.pending)
+
+    # ----- PRODUCER SIDE -----
+    def enqueue(self, subject, message):
+        """Queue an alert for delivery and return its id immediately."""
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (subject, message, created, next_attempt) VALUES (?, ?, ?, ?)",
+                (subject, message, now, now))
+        ENQUEUED.inc()
+        self._wake.set()
+        return cur.lastrowid
+
+    def counts(self):
+        """{status: n} over the whole outbox."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+
+    def pending(self):
+        # Scraped as a metric: one range of the status index, not a pass over every sent row
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    # ----- WORKER -----
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="alert-outbox", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _claim(self):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id, subject, message, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt LIMIT 1",
+                (time.time(),)).fetchone()
+            if row:
+                self._conn.execute("UPDATE outbox SET status = 'sending' WHERE id = ?", (row[0],))
+            return row
+
+    def _claim_batch(self):
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, subject, message, attempts, created FROM outbox "
+                "WHERE status = 'pending' AND next_attempt <= ? ORDER BY created LIMIT ?",
+                (now, self.max_batch)).fetchall()
+            if not rows:
+                return []
+            # Still inside the coalescing window: wait for more alerts to join
+            if len(rows) < self.max_batch and now - rows[0][4] < self.coalesce_window:
+                return []
+            self._conn.executemany("UPDATE outbox SET status = 'sending' WHERE id = ?", [(r[0],) for r in rows])
+            return [r[:4] for r in rows]
+
+    def _finish(self, row_id, attempts, error=None):
+        with self._lock, self._conn:
+            if error is None:
+                result = "sent"
+                self._conn.execute("UPDATE outbox SET status = 'sent', attempts = ? WHERE id = ?",
+                                   (attempts, row_id))
+            elif attempts >= self.max_attempts:
+                result = "failed"
+                self._conn.execute("UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                                   (attempts, error, row_id))
+            else:
+                result = "retry"
+                delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt = ?, last_error = ? "
+                    "WHERE id = ?", (attempts, time.time() + delay, error, row_id))
+        DELIVERIES.labels(result).inc()
+
+    def drain(self):
+        """Send everything that is currently due; returns the number of delivery attempts."""
+        if self.batch_sender is not None:
+            return self._drain_batches()
+
+        tried = 0
+        while not self._stop.is_set():
+            row = self._claim()
+            if row is None:
+                break
+            row_id, subject, message, attempts = row
+            tried += 1
+            try:
+                with SEND_TIME.labels("single").time():
+                    self.sender(subject, message)
+            except Exception as e:
+                self._finish(row_id, attempts + 1, f"{type(e).__name__}: {e}")
+            else:
+                self._finish(row_id, attempts + 1)
+        return tried
+
+    def _drain_batches(self):
+        tried = 0
+        while not self._stop.is_set():
+            rows = self._claim_batch()
+            if not rows:
+                break
+            tried += len(rows)
+            try:
+                with SEND_TIME.labels("batch").time():
+                    results = self.batch_sender([(subject, message) for _, subject, message, _ in rows])
+            except Exception as e:
+                results = [e] * len(rows)
+            for (row_id, _, _, attempts), error in zip(rows, results or [None] * len(rows)):
+                self._finish(row_id, attempts + 1, None if error is None else f"{type(error).__name__}: {error}")
+        return tried
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.drain()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+@st.cache_resource
+def get_outbox(_sender, _batch_sender=None, coalesce_window=0.0):
+    # One worker per server process, shared by every session
+    return AlertOutbox(_sender, batch_sender=_batch_sender, coalesce_window=coalesce_window).start()
@@ -0,0 +1,290 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from anomaly import kinds
+from rules import CRITICAL
+
+# Incidents raised by the anomaly detector use "anomaly:<channel>" as their rule key
+ANOMALY_PREFIX = "anomaly:"
+
+# Alert states per (station, rule)
+OK, PENDING, FIRING, ACKNOWLEDGED, RESOLVED = "ok", "pending", "firing", "acknowledged", "resolved"
+ACTIVE = (FIRING, ACKNOWLEDGED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id          INTEGER PRIMARY KEY,
+    station     TEXT NOT NULL,
+    rule        TEXT NOT NULL,
+    state       TEXT NOT NULL,
+    pending_ts  INTEGER NOT NULL,
+    fired_ts    INTEGER,
+    acked_ts    INTEGER,
+    acked_by    TEXT,
+    resolved_ts INTEGER,
+    peak        REAL,
+    notified    INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS incidents_fired ON incidents (fired_ts);
+CREATE INDEX IF NOT EXISTS incidents_open ON incidents (state);
+CREATE TABLE IF NOT EXISTS incident_log (
+    ts       INTEGER NOT NULL,
+    incident INTEGER NOT NULL,
+    state    TEXT NOT NULL,
+    value    REAL,
+    note     TEXT
+);
+CREATE INDEX IF NOT EXISTS incident_log_ts ON incident_log (ts);
+"""
+
+
+def read_incidents(conn, start_ms, end_ms, station=None):
+    """Incidents that fired within the range as dicts, newest first (any connection to the database)."""
+    sql = ("SELECT id, station, rule, state, fired_ts, acked_ts, acked_by, resolved_ts, peak, notified "
+           "FROM incidents WHERE fired_ts BETWEEN ? AND ?")
+    args = [int(start_ms), int(end_ms)]
+    if station is not None:
+        sql += " AND station = ?"
+        args.append(station)
+    rows = conn.execute(sql + " ORDER BY fired_ts DESC", args).fetchall()
+    keys = ("id", "station", "rule", "state", "fired_ts", "acked_ts", "acked_by", "resolved_ts", "peak", "notified")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+class Track:
+    """In-memory state of one (station, rule) pair."""
+    __slots__ = ("state", "incident", "since", "peak", "last_notified")
+
+    def __init__(self):
+        self.state = OK
+        self.incident = None
+        self.since = None
+        self.peak = None
+        self.last_notified = None
+
+
+# -------------------------------------------------
+# ALERT STATE MACHINE
+# -------------------------------------------------
+#   ok --critical--> pending --held for rule.hold s--> firing --ack--> acknowledged
+#   pending --clears--> ok
+#   firing / acknowledged --back past critical by rule.hysteresis--> resolved
+#
+# Runs server-side on the ingest path (one instance per process), so every
+# browser tab sees the same incidents and a new tab never re-sends anything.
+# `pending` is kept in memory only; the incident row and its log entries are
+# written once it fires, and from then on each transition is appended to
+# `incident_log` while `incidents` holds the current row per incident.
+# Notifications go out on entering `firing`, unless the same rule notified
+# less than rule.cooldown seconds ago.
+#
+# Anomaly incidents (see anomaly.py) skip pending: the detector already needs
+# several readings to warm up and `quiet` clean readings before it clears.
+
+class AlertManager:
+    def __init__(self, engine, path, notify=None, anomaly_cooldown=600.0):
+        self.engine = engine
+        self.notify = notify
+        self.anomaly_cooldown = anomaly_cooldown
+        self._lock = threading.Lock()
+        self._tracks = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._restore()
+
+    def _restore(self):
+        # Open threshold incidents survive restarts; pending rows are only left by older versions
+        with self._conn:
+            self._conn.execute("DELETE FROM incidents WHERE state = ?", (PENDING,))
+            # Anomaly detectors restart cold and would never report these as cleared
+            self._conn.execute("UPDATE incidents SET state = ?, resolved_ts = ? WHERE state IN (?, ?) AND rule LIKE ?",
+                               (RESOLVED, int(time.time() * 1000), *ACTIVE, ANOMALY_PREFIX + "%"))
+        rows = self._conn.execute(
+            "SELECT id, station, rule, state, pending_ts, peak, fired_ts FROM incidents "
+            "WHERE state IN (?, ?)", ACTIVE).fetchall()
+        for row_id, station, rule, state, pending_ts, peak, fired_ts in rows:
+            track = self._track(station, rule)
+            track.state, track.incident, track.since, track.peak = state, row_id, pending_ts, peak
+            track.last_notified = fired_ts
+
+    def _track(self, station, rule_key):
+        key = (station, rule_key)
+        track = self._tracks.get(key)
+        if track is None:
+            track = self._tracks[key] = Track()
+        return track
+
+    # ----- LOG -----
+    def _log(self, ts, incident, state, value=None, note=None):
+        self._conn.execute("INSERT INTO incident_log (ts, incident, state, value, note) VALUES (?, ?, ?, ?, ?)",
+                           (ts, incident, state, value, note))
+
+    # ----- EVALUATION -----
+    def observe(self, station, readings):
+        """Feed a batch [(ts_ms, {channel: value}), ...] from the ingest path."""
+        if not readings:
+            return
+        rules = self.engine.rules
+        values = np.array([[v.get(ch, np.nan) for ch in self.engine.channels] for _, v in readings],
+                          dtype=np.float64)
+        ts = [t for t, _ in readings]
+        levels = self.engine.evaluate(values, self.engine.station_index([station] * len(readings)))
+        critical = levels == CRITICAL
+
+        outgoing = []
+        with self._lock, self._conn:
+            for j, rule in enumerate(rules):
+                track = self._track(station, rule.key)
+                # Fast path: nothing tripped and nothing open for this rule
+                if track.state in (OK, RESOLVED) and not critical[:, j].any():
+                    continue
+                col = self.engine.channels.index(rule.channel)
+                for i in range(len(readings)):
+                    msg = self._step(station, rule, track, ts[i], float(values[i, col]), bool(critical[i, j]))
+                    if msg:
+                        outgoing.append(msg)
+
+        if self.notify:
+            for subject, body in outgoing:
+                self.notify(subject, body)
+
+    def _cleared(self, rule, value):
+        if np.isnan(value):
+            return False
+        if rule.above:
+            return value < rule.critical - rule.hysteresis
+        return value > rule.critical + rule.hysteresis
+
+    def _step(self, station, rule, track, ts, value, critical):
+        worse = (lambda a, b: max(a, b)) if rule.above else (lambda a, b: min(a, b))
+
+        if track.state in (OK, RESOLVED):
+            if not critical:
+                return None
+            # Held in memory only: most excursions clear within the hold-down and never touch the database
+            track.state, track.incident, track.since, track.peak = PENDING, None, ts, value
+            if rule.hold > 0:
+                return None
+
+        if track.state == PENDING:
+            if np.isnan(value):
+                # Channel missing from a partial reading: no information, stay pending
+                return None
+            if not critical:
+                # Flapped back before the hold-down elapsed: not an incident
+                track.state = OK
+                return None
+            track.peak = worse(track.peak, value)
+            if (ts - track.since) / 1000.0 < rule.hold:
+                return None
+
+            track.state = FIRING
+            in_cooldown = (track.last_notified is not None
+                           and (ts - track.last_notified) / 1000.0 < rule.cooldown)
+            cur = self._conn.execute(
+                "INSERT INTO incidents (station, rule, state, pending_ts, fired_ts, peak, notified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (station, rule.key, FIRING, track.since, ts, track.peak, 0 if in_cooldown else 1))
+            track.incident = cur.lastrowid
+            self._log(track.since, track.incident, PENDING)
+            self._log(ts, track.incident, FIRING, value, "notification suppressed (cooldown)" if in_cooldown else None)
+            if in_cooldown:
+                return None
+            track.last_notified = ts
+            return rule.email(value, datetime.fromtimestamp(ts / 1000), station)
+
+        # FIRING / ACKNOWLEDGED
+        if not np.isnan(value):
+            track.peak = worse(track.peak, value)
+        if self._cleared(rule, value):
+            self._conn.execute("UPDATE incidents SET state = ?, resolved_ts = ?, peak = ? WHERE id = ?",
+                               (RESOLVED, ts, track.peak, track.incident))
+            self._log(ts, track.incident, RESOLVED, value)
+            track.state, track.incident = RESOLVED, None
+        return None
+
+    def observe_anomalies(self, onsets, clears):
+        """Open/resolve anomaly incidents from AnomalyDetector.observe output (any number of stations)."""
+        outgoing = []
+        with self._lock, self._conn:
+            for station, ts, channel, flags, value, score in onsets:
+                track = self._track(station, ANOMALY_PREFIX + channel)
+                if track.state in ACTIVE:
+                    continue
+                what = ", ".join(kinds(flags))
+                in_cooldown = (track.last_notified is not None
+                               and (ts - track.last_notified) / 1000.0 < self.anomaly_cooldown)
+                cur = self._conn.execute(
+                    "INSERT INTO incidents (station, rule, state, pending_ts, fired_ts, peak, notified) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (station, ANOMALY_PREFIX + channel, FIRING, ts, ts, value, 0 if in_cooldown else 1))
+                track.state, track.incident, track.since, track.peak = FIRING, cur.lastrowid, ts, value
+                self._log(ts, track.incident, FIRING, value, f"{what} (score {score:.1f})")
+                if in_cooldown:
+                    continue
+                track.last_notified = ts
+                when = datetime.fromtimestamp(ts / 1000).strftime("%Y-%m-%d %H:%M:%S")
+                outgoing.append((f"{channel.upper()} ANOMALY",
+                                 f"Unusual {channel} readings detected ({what}).\n\n"
+                                 f"Current Value: {value}\n"
+                                 f"Time: {when}\n"
+                                 f"Location: {station}\n"
+                                 f"Score: {score:.1f}\n\n"
+                                 f"Check the sensor and the space before the threshold is reached."))
+
+            for station, ts, channel, value in clears:
+                track = self._track(station, ANOMALY_PREFIX + channel)
+                if track.state not in ACTIVE:
+                    continue
+                self._conn.execute("UPDATE incidents SET state = ?, resolved_ts = ? WHERE id = ?",
+                                   (RESOLVED, ts, track.incident))
+                self._log(ts, track.incident, RESOLVED, value)
+                track.state, track.incident = RESOLVED, None
+
+        if self.notify:
+            for subject, body in outgoing:
+                self.notify(subject, body)
+
+    # ----- OPERATOR ACTIONS -----
+    def acknowledge(self, incident_id, user):
+        ts = int(time.time() * 1000)
+        with self._lock, self._conn:
+            for track in self._tracks.values():
+                if track.incident == incident_id and track.state == FIRING:
+                    track.state = ACKNOWLEDGED
+                    self._conn.execute("UPDATE incidents SET state = ?, acked_ts = ?, acked_by = ? WHERE id = ?",
+                                       (ACKNOWLEDGED, ts, user, incident_id))
+                    self._log(ts, incident_id, ACKNOWLEDGED, note=f"by {user}")
+                    return True
+        return False
+
+    # ----- QUERIES -----
+    def active(self, station=None):
+        """Firing and acknowledged incidents as dicts, newest first."""
+        sql = ("SELECT id, station, rule, state, fired_ts, acked_by, peak, notified FROM incidents "
+               "WHERE state IN (?, ?)")
+        args = list(ACTIVE)
+        if station is not None:
+            sql += " AND station = ?"
+            args.append(station)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY fired_ts DESC", args).fetchall()
+        keys = ("id", "station", "rule", "state", "fired_ts", "acked_by", "peak", "notified")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def history(self, start_ms, end_ms, station=None):
+        """Incidents that fired within the range (deduplicated: one row per incident)."""
+        with self._lock:
+            return read_incidents(self._conn, start_ms, end_ms, station)
+
+    def log(self, start_ms, end_ms):
+        """Raw transition log rows (ts, incident, state, value, note) in time order."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT ts, incident, state, value, note FROM incident_log WHERE ts BETWEEN ? AND ? ORDER BY ts",
+                (int(start_ms), int(end_ms))).fetchall()
@@ -0,0 +1,179 @@
+import os
+import threading
+
+import numpy as np
+
+# EWMA smoothing factor (~1/alpha readings of memory) and detection limits
+ALPHA = float(os.environ.get("CSMS_ANOMALY_ALPHA", "0.05"))
+Z_LIMIT = float(os.environ.get("CSMS_ANOMALY_Z", "4.0"))
+ROBUST_LIMIT = float(os.environ.get("CSMS_ANOMALY_ROBUST_Z", "5.0"))
+RATE_LIMIT = float(os.environ.get("CSMS_ANOMALY_RATE_Z", "5.0"))
+# Identical consecutive readings before a channel counts as stuck
+STUCK_AFTER = int(os.environ.get("CSMS_STUCK_AFTER", "60"))
+# Readings per channel before anything is flagged, and clean readings before a flag clears
+WARMUP = int(os.environ.get("CSMS_ANOMALY_WARMUP", "30"))
+QUIET = int(os.environ.get("CSMS_ANOMALY_QUIET", "5"))
+
+# Detector bits, combined per channel
+SPIKE, OUTLIER, RATE, STUCK = 1, 2, 4, 8
+KIND_NAMES = {SPIKE: "spike", OUTLIER: "outlier", RATE: "rate of change", STUCK: "stuck sensor"}
+
+# Scales a MAD to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+
+def kinds(flags):
+    """Bitmask -> list of detector names."""
+    return [name for bit, name in KIND_NAMES.items() if flags & bit]
+
+
+# -------------------------------------------------
+# STREAMING ANOMALY DETECTION
+# -------------------------------------------------
+# Per (station, channel) the detector keeps a fixed handful of numbers:
+#   - EWMA mean / variance           -> z-score of each reading       (SPIKE)
+#   - running median / MAD estimates -> robust z-score               (OUTLIER)
+#   - EWMA mean / variance of d/dt   -> z-score of the rate of change   (RATE)
+#   - run length of identical values                                   (STUCK)
+# All state is (stations, channels) arrays and memory does not grow with
+# history. observe() takes the readings of any number of stations as
+# arrays and advances them together: one vectorised step covers the next
+# reading of every station in the batch, so a batch costs as many steps as
+# its deepest station has readings, not one per reading.
+# The median/MAD use the stochastic-approximation update (step towards the
+# sample by a fraction of the current spread), which needs no window.
+# Readings flagged as outliers do not move the EWMA baseline.
+
+class AnomalyDetector:
+    FIELDS = ("n", "mean", "var", "med", "mad", "last", "rate_mean", "rate_var", "same", "flags", "quiet")
+
+    def __init__(self, channels, alpha=ALPHA, z_limit=Z_LIMIT, robust_limit=ROBUST_LIMIT,
+                 rate_limit=RATE_LIMIT, stuck_after=STUCK_AFTER, warmup=WARMUP, quiet=QUIET):
+        self.channels = list(channels)
+        self.alpha = alpha
+        self.z_limit = z_limit
+        self.robust_limit = robust_limit
+        self.rate_limit = rate_limit
+        self.stuck_after = stuck_after
+        self.warmup = warmup
+        self.quiet = quiet
+        self._lock = threading.Lock()
+        self._stations = {}
+        self._last_ts = np.zeros(0, dtype=np.int64)
+        self._state = {f: np.zeros((0, len(self.channels))) for f in self.FIELDS}
+
+    def _row(self, station):
+        i = self._stations.get(station)
+        if i is None:
+            i = self._stations[station] = len(self._stations)
+            for f, arr in self._state.items():
+                self._state[f] = np.vstack([arr, np.zeros((1, arr.shape[1]))])
+            self._last_ts = np.append(self._last_ts, 0)
+        return i
+
+    def observe(self, batches):
+        """Feed [(station, ts_ms int64 array, values float array (n, channels)), ...].
+
+        Values are in `self.channels` order (NaN = missing); a station may appear
+        more than once, its parts in time order. Returns (onsets, clears): onsets
+        are (station, ts, channel, flags, value, score) for channels that just
+        became anomalous, clears are (station, ts, channel, value) for channels
+        that have been clean for `quiet` readings.
+        """
+        onsets, clears = [], []
+        parts = {}
+        for station, ts, values in batches:
+            if len(ts):
+                parts.setdefault(station, []).append((ts, values))
+        if not parts:
+            return onsets, clears
+
+        # Pad to (stations, depth): column r holds each station's r-th reading
+        names = list(parts)
+        ts = [np.concatenate([t for t, _ in p]) for p in parts.values()]
+        values = [np.concatenate([v for _, v in p]) for p in parts.values()]
+        depth = np.array([len(t) for t in ts])
+        t_grid = np.zeros((len(names), depth.max()), dtype=np.int64)
+        x_grid = np.full((len(names), depth.max(), len(self.channels)), np.nan)
+        for k, (t, x) in enumerate(zip(ts, values)):
+            t_grid[k, :len(t)] = t
+            x_grid[k, :len(t)] = x
+
+        with self._lock:
+            rows = np.array([self._row(station) for station in names])
+            for r in range(depth.max()):
+                live = np.flatnonzero(depth > r)
+                idx = rows[live]
+                s = {f: arr[idx] for f, arr in self._state.items()}
+                found_on, found_off = self._step(s, t_grid[live, r], self._last_ts[idx], x_grid[live, r])
+                for f, arr in self._state.items():
+                    arr[idx] = s[f]
+                self._last_ts[idx] = t_grid[live, r]
+                onsets += [(names[live[i]], *rest) for i, *rest in found_on]
+                clears += [(names[live[i]], *rest) for i, *rest in found_off]
+        return onsets, clears
+
+    def _step(self, s, ts, last_ts, x):
+        # One reading for each of k stations: s holds (k, channels) state rows, ts / last_ts are (k,)
+        valid = ~np.isnan(x)
+        x0 = np.where(valid, x, s["mean"])
+        warm = valid & (s["n"] >= self.warmup)
+
+        # Scores against the state before this reading
+        floor = 1e-6 * (np.abs(s["mean"]) + 1.0)
+        z = np.abs(x0 - s["mean"]) / (np.sqrt(s["var"]) + floor)
+        robust = np.abs(x0 - s["med"]) / (MAD_SCALE * s["mad"] + floor)
+        dt = np.maximum((ts - last_ts) / 1000.0, 1e-3)[:, None]
+        rate = (x0 - s["last"]) / dt
+        rate_z = np.abs(rate - s["rate_mean"]) / (np.sqrt(s["rate_var"]) + floor)
+        s["same"][:] = np.where(valid, np.where(x0 == s["last"], s["same"] + 1, 0), s["same"])
+
+        flags = ((z > self.z_limit) * SPIKE | (robust > self.robust_limit) * OUTLIER
+                 | (rate_z > self.rate_limit) * RATE | (s["same"] >= self.stuck_after) * STUCK)
+        flags = np.where(warm, flags, 0).astype(np.int64)
+
+        # Onsets / clears, with `quiet` clean readings needed before a flag drops
+        was = s["flags"].astype(np.int64)
+        s["quiet"][:] = np.where(flags > 0, 0, np.where(valid, s["quiet"] + 1, s["quiet"]))
+        active = np.where(flags > 0, was | flags, np.where(s["quiet"] >= self.quiet, 0, was))
+        onsets = [(i, int(ts[i]), self.channels[j], int(active[i, j]), float(x0[i, j]),
+                   float(max(z[i, j], robust[i, j], rate_z[i, j])))
+                  for i, j in zip(*np.nonzero((was == 0) & (active > 0)))]
+        clears = [(i, int(ts[i]), self.channels[j], float(x0[i, j]))
+                  for i, j in zip(*np.nonzero((was > 0) & (active == 0)))]
+        s["flags"][:] = active
+
+        # EWMA baseline; a plain running average until there are 1/alpha readings.
+        # Outliers do not move it.
+        a = np.maximum(self.alpha, 1.0 / (s["n"] + 1))
+        learn = valid & ((flags & OUTLIER) == 0)
+        d = x0 - s["mean"]
+        s["mean"][:] = np.where(learn, s["mean"] + a * d, s["mean"])
+        s["var"][:] = np.where(learn, (1 - a) * (s["var"] + a * d * d), s["var"])
+
+        # Robust baseline: seeded from the EWMA during warm-up, then tracked on its own
+        step = a * np.maximum(s["mad"], floor)
+        med = s["med"] + step * np.sign(x0 - s["med"])
+        mad = np.maximum(s["mad"] + step * np.sign(np.abs(x0 - s["med"]) - s["mad"]), 0)
+        s["med"][:] = np.where(warm, med, np.where(valid, s["mean"], s["med"]))
+        s["mad"][:] = np.where(warm, mad, np.where(valid, np.sqrt(s["var"]) / MAD_SCALE, s["mad"]))
+
+        # Rate-of-change baseline (needs a previous reading)
+        has_rate = valid & (s["n"] > 0)
+        ar = np.maximum(self.alpha, 1.0 / np.maximum(s["n"], 1))
+        dr = rate - s["rate_mean"]
+        s["rate_mean"][:] = np.where(has_rate, s["rate_mean"] + ar * dr, s["rate_mean"])
+        s["rate_var"][:] = np.where(has_rate, (1 - ar) * (s["rate_var"] + ar * dr * dr), s["rate_var"])
+
+        s["last"][:] = np.where(valid, x0, s["last"])
+        s["n"][:] = s["n"] + valid
+        return onsets, clears
+
+    def flags(self, station):
+        """{channel: [detector names]} for the station's currently anomalous channels."""
+        with self._lock:
+            i = self._stations.get(station)
+            if i is None:
+                return {}
+            row = self._state["flags"][i].astype(np.int64)
+        return {ch: kinds(f) for ch, f in zip(self.channels, row) if f}
@@ -1,19 +1,10 @@
-import streamlit as st
-import login
-import dashboard
-
-st.set_page_config(page_title="IoT Monitoring", layout="wide")
-
-# ------------------------
-# INITIAL SESSION STATE
-# ------------------------
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
+import router
 
 # ------------------------
-# PAGE CONTROLLER
+# ENTRY POINT
 # ------------------------
-if not st.session_state.logged_in:
-    login.login_page()
-else:
-    dashboard.dashboard_page()
+# Session bootstrap, login check and page dispatch live in router.py.
+# Streamlit runs this file as __main__; report worker processes (spawn)
+# re-import it as __mp_main__ and must not render or start services.
+if __name__ == "__main__":
+    router.run()
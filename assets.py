@@ -0,0 +1,88 @@
+import base64
+import hashlib
+import mimetypes
+import os
+import shutil
+
+import streamlit as st
+
+# Streamlit serves ./static/<file> at app/static/<file> when
+# server.enableStaticServing is on (see .streamlit/config.toml)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+STATIC_URL = "app/static"
+
+# Set CSMS_INLINE_ASSETS=1 when static serving is not available
+INLINE_ASSETS = os.environ.get("CSMS_INLINE_ASSETS", "0") == "1"
+
+# Extensions Streamlit's static handler serves with their real content type;
+# anything else (e.g. mp3) goes out as text/plain, so it has to be inlined
+STATIC_SAFE = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg"}
+
+
+# -------------------------------------------------
+# ASSET CACHE
+# -------------------------------------------------
+# Each asset is read, optionally recompressed and hashed once per process.
+# Images are published under a content-hashed name (bg1.3f2a9c1d.webp), so
+# browsers can cache them indefinitely and a changed file gets a new URL.
+
+def _recompress_webp(data):
+    try:
+        from io import BytesIO
+        from PIL import Image
+    except ImportError:
+        return None
+    img = Image.open(BytesIO(data))
+    out = BytesIO()
+    img.save(out, format="WEBP", quality=80, method=6)
+    return out.getvalue()
+
+
+@st.cache_resource(show_spinner=False)
+def _published_name(path, webp):
+    try:
+        with open(os.path.join(BASE_DIR, path), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    stem, ext = os.path.splitext(os.path.basename(path))
+    if webp:
+        converted = _recompress_webp(data)
+        if converted is not None and len(converted) < len(data):
+            data, ext = converted, ".webp"
+
+    name = f"{stem}.{hashlib.sha256(data).hexdigest()[:8]}{ext}"
+    target = os.path.join(STATIC_DIR, name)
+    if not os.path.exists(target):
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        shutil.move(tmp, target)
+    return name
+
+
+@st.cache_resource(show_spinner=False)
+def data_uri(path, mime=None):
+    """base64 data URI for `path`, encoded once per process (None if the file is missing)."""
+    try:
+        with open(os.path.join(BASE_DIR, path), "rb") as f:
+            encoded = base64.b64encode(f.read()).decode()
+    except OSError:
+        return None
+    mime = mime or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return f"data:{mime};base64,{encoded}"
+
+
+def asset_url(path, webp=False, fallback=None):
+    """URL for a static asset: a content-hashed static URL where possible, else a cached data URI."""
+    ext = os.path.splitext(path)[1].lower()
+    if INLINE_ASSETS or ext not in STATIC_SAFE:
+        return data_uri(path) or fallback
+
+    name = _published_name(path, webp)
+    if name is None:
+        return fallback
+    return f"{STATIC_URL}/{name}"
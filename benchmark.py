@@ -0,0 +1,358 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "app.py")
+
+PAGES = ("dashboard", "analytics", "reports")
+# Points of history: live readings plotted on the dashboard and stored readings of the last 30 days
+HISTORY_SIZES = (20, 1000, 10000, 100000, 1000000)
+# Stations registered with the hub (each one ingesting live, as in production)
+STATION_COUNTS = (1, 10, 100, 1000)
+
+# Reruns timed per scenario, after warm-up reruns that absorb imports and cache fills
+RERUNS = int(os.environ.get("CSMS_BENCH_RERUNS", "5"))
+WARMUP = int(os.environ.get("CSMS_BENCH_WARMUP", "2"))
+# A metric regresses when it is this much (fraction) above the baseline ...
+TOLERANCE = float(os.environ.get("CSMS_BENCH_TOLERANCE", "0.25"))
+# ... and above it by at least this much, so noise on tiny numbers is ignored
+NOISE_FLOOR = {"latency_ms_median": 25.0, "latency_ms_max": 50.0, "payload_kb": 1.0, "peak_alloc_mb": 1.0,
+               "max_rss_mb": 10.0}
+
+# Absolute per-page targets, checked for every scenario (1M points included) whatever the
+# baseline says: median rerun latency (ms, CSMS_BENCH_<PAGE>_BUDGET_MS) and payload per
+# rerun (KB). A page should answer within a second; analytics, which bins and merges a
+# whole month, within two. 512 KB is what a browser takes in without a visible stall.
+LATENCY_BUDGET_MS = {page: float(os.environ.get(f"CSMS_BENCH_{page.upper()}_BUDGET_MS", ms))
+                     for page, ms in (("dashboard", 1000), ("analytics", 2000), ("reports", 1000))}
+PAYLOAD_BUDGET_KB = {"dashboard": 512, "analytics": 512, "reports": 128}
+
+RESULTS = os.path.join(HERE, "benchmark_results.json")
+BASELINE = os.path.join(HERE, "benchmark_baseline.json")
+
+DAY_MS = 86400 * 1000
+SEED_CHUNK = 100000
+
+
+def station_name(i):
+    from data_hub import DEFAULT_STATION
+    return DEFAULT_STATION if i == 0 else f"Bench Station {i:04d}"
+
+
+def scenario_key(page, history, stations):
+    return f"{page}/history={history}/stations={stations}"
+
+
+# -------------------------------------------------
+# DATA SETUP
+# -------------------------------------------------
+# Each (history, stations) pair gets its own database, seeded once and
+# shared by the three pages. The default station holds `history` readings
+# spread over the last 30 days (what the analytics and reports pages read);
+# every other station holds a day of hourly readings.
+
+def seed(db_path, history, stations):
+    import numpy as np
+
+    from tsdb import DEMO_CHANNELS, TimeSeriesStore
+
+    rng = np.random.default_rng(7)
+    store = TimeSeriesStore(db_path)
+    end = int(time.time() * 1000)
+    ts = end - 30 * DAY_MS + (np.arange(1, history + 1) * (30 * DAY_MS // history))
+    for lo in range(0, history, SEED_CHUNK):
+        part = ts[lo:lo + SEED_CHUNK]
+        store.write_frame(station_name(0), part,
+                          {ch: rng.uniform(a, b, len(part)) for ch, (a, b) in DEMO_CHANNELS.items()})
+    day = end - np.arange(24)[::-1] * 3600 * 1000
+    for i in range(1, stations):
+        store.write_frame(station_name(i), day, {ch: rng.uniform(a, b, 24) for ch, (a, b) in DEMO_CHANNELS.items()})
+    store.close()
+
+
+def scenario_env(workdir, history):
+    # Everything the app writes stays in the scratch directory, and alerts never leave the machine
+    env = dict(os.environ)
+    env.update({
+        "CSMS_DB": os.path.join(workdir, "csms.db"),
+        "CSMS_OUTBOX": os.path.join(workdir, "outbox.db"),
+        "CSMS_REPORT_ARCHIVE": os.path.join(workdir, "report_archive"),
+        "CSMS_SEED_DEMO_HISTORY": "0",
+        "CSMS_HISTORY_WINDOW": str(history),
+        "CSMS_SCHEDULER_IN_APP": "0",
+        "CSMS_METRICS_PORT": "0",
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": "9",
+        "SMTP_SSL": "0",
+        "SMTP_LOGIN": "0",
+    })
+    return env
+
+
+# -------------------------------------------------
+# ONE SCENARIO (runs in its own interpreter)
+# -------------------------------------------------
+# A fresh process per page and size, so imports, caches and the peak RSS
+# belong to that scenario alone. The session is signed in and pointed at
+# the page through session state, then rerun headlessly with AppTest:
+#   latency     wall time of one full rerun (script run incl. fragments)
+#   payload     bytes of the ForwardMsg protobufs the rerun produced, i.e.
+#               what a browser would be sent
+#   peak alloc  tracemalloc peak during one extra rerun (traced separately,
+#               as tracing slows the timed reruns down)
+#   max rss     the process high-water mark at the end
+
+def run_scenario(page, history, stations, reruns, warmup):
+    import resource
+    import tracemalloc
+
+    import numpy as np
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    from data_hub import get_hub
+    from ingestion import CHANNELS, SIM_RANGES
+
+    payloads = []
+    forward_msgs = LocalScriptRunner.forward_msgs
+
+    def counted(self):
+        msgs = forward_msgs(self)
+        payloads.append(sum(msg.ByteSize() for msg in msgs))
+        return msgs
+
+    LocalScriptRunner.forward_msgs = counted
+
+    # Live history: `history` one-second readings already in the default station's buffer
+    hub = get_hub()
+    now = int(time.time() * 1000)
+    rng = np.random.default_rng(7)
+    hub.live().extend(now - np.arange(history)[::-1] * 1000,
+                      np.column_stack([rng.uniform(*SIM_RANGES[ch], history) for ch in CHANNELS]))
+    for i in range(1, stations):
+        hub.add_station(station_name(i))
+
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.session_state.logged_in = True
+    at.session_state.username = "benchmark"
+    at.session_state.current_page = page
+    for _ in range(warmup):
+        at.run()
+    if at.exception:
+        raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+    if page == "analytics":
+        # The first view starts forecast fits in worker processes, redone only once per refit
+        # interval; let them finish rather than time the reruns against them for the CPU
+        from forecast import get_forecaster
+        forecaster = get_forecaster()
+        forecaster.refresh()
+        deadline = time.time() + 600
+        while forecaster._running and time.time() < deadline:
+            time.sleep(0.1)
+
+    times = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - started)
+    payload = payloads[-reruns:]
+
+    tracemalloc.start()
+    at.run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        "latency_ms_median": 1000 * times[len(times) // 2],
+        "latency_ms_max": 1000 * times[-1],
+        "latency_ms_all": [round(1000 * t, 2) for t in times],
+        "payload_kb": sum(payload) / len(payload) / 1024,
+        "peak_alloc_mb": peak / 2 ** 20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _child_main(spec):
+    result = run_scenario(**spec)
+    print("BENCH_RESULT " + json.dumps(result), flush=True)
+    # Skip joining background work (ingest threads, forecast fits); the numbers are in
+    os._exit(0)
+
+
+# -------------------------------------------------
+# SUITE, BASELINE AND REGRESSIONS
+# -------------------------------------------------
+
+def scenarios(histories, station_counts, full):
+    """(history, stations) pairs: the full grid, or each axis swept with the other held at its smallest value."""
+    if full:
+        return [(h, s) for h in histories for s in station_counts]
+    pairs = [(h, min(station_counts)) for h in histories]
+    pairs += [(min(histories), s) for s in station_counts if s != min(station_counts)]
+    return pairs
+
+
+def run_child(spec, workdir, env, timeout=3600):
+    # Own process group: worker processes the app started (forecast fits, report renders) go down with it
+    out_path, err_path = os.path.join(workdir, "child.out"), os.path.join(workdir, "child.err")
+    with open(out_path, "w") as out, open(err_path, "w") as err:
+        proc = subprocess.Popen([sys.executable, __file__, "--child", json.dumps(spec)], cwd=workdir, env=env,
+                                stdout=out, stderr=err, start_new_session=True)
+        try:
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            err.write(f"timed out after {timeout}s\n")
+        finally:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            proc.wait()
+    with open(out_path) as out, open(err_path) as err:
+        return out.read(), err.read()
+
+
+def run_suite(pages, histories, station_counts, full=False, reruns=RERUNS, warmup=WARMUP, keep=False):
+    results = {}
+    for history, stations in scenarios(histories, station_counts, full):
+        workdir = tempfile.mkdtemp(prefix="csms-bench-")
+        try:
+            env = scenario_env(workdir, history)
+            started = time.time()
+            seed(env["CSMS_DB"], history, stations)
+            print(f"seeded history={history} stations={stations} in {time.time() - started:.1f}s", flush=True)
+            for page in pages:
+                key = scenario_key(page, history, stations)
+                spec = dict(page=page, history=history, stations=stations, reruns=reruns, warmup=warmup)
+                stdout, stderr = run_child(spec, workdir, env)
+                line = [ln for ln in stdout.splitlines() if ln.startswith("BENCH_RESULT ")]
+                if not line:
+                    results[key] = {"error": (stderr.strip().splitlines() or ["no result"])[-1]}
+                    print(f"  {key}: FAILED ({results[key]['error']})", flush=True)
+                    continue
+                results[key] = json.loads(line[-1][len("BENCH_RESULT "):])
+                r = results[key]
+                print(f"  {key}: {r['latency_ms_median']:.0f} ms median, {r['payload_kb']:.0f} KB, "
+                      f"{r['peak_alloc_mb']:.1f} MB peak alloc, {r['max_rss_mb']:.0f} MB RSS", flush=True)
+        finally:
+            if keep:
+                print(f"  data kept in {workdir}")
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def environment(reruns, warmup):
+    import streamlit
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "streamlit": streamlit.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(), "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "reruns": reruns, "warmup": warmup}
+
+
+def over_budget(results):
+    """[(scenario, metric, budget, value)] for every scenario that failed or went over its page's budget."""
+    found = []
+    for key, r in results.items():
+        page = key.split("/")[0]
+        if "error" in r:
+            found.append((key, "error", None, r["error"]))
+            continue
+        for metric, budget in (("latency_ms_median", LATENCY_BUDGET_MS.get(page)),
+                               ("payload_kb", PAYLOAD_BUDGET_KB.get(page))):
+            if budget is not None and r[metric] > budget:
+                found.append((key, metric, budget, r[metric]))
+    return found
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """[(scenario, metric, baseline value, new value)] for every metric over the tolerance."""
+    found = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if old is None or "error" in old:
+            continue
+        if "error" in new:
+            found.append((key, "error", None, new["error"]))
+            continue
+        for metric, floor in NOISE_FLOOR.items():
+            if new[metric] > old[metric] * (1 + tolerance) and new[metric] - old[metric] > floor:
+                found.append((key, metric, old[metric], new[metric]))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless render benchmark of the dashboard, analytics and "
+                                                 "reports pages (Streamlit AppTest).")
+    parser.add_argument("--pages", default=",".join(PAGES))
+    parser.add_argument("--history", default=",".join(map(str, HISTORY_SIZES)), help="history sizes (points)")
+    parser.add_argument("--stations", default=",".join(map(str, STATION_COUNTS)), help="station counts")
+    parser.add_argument("--full", action="store_true", help="every history size with every station count")
+    parser.add_argument("--reruns", type=int, default=RERUNS)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--output", default=RESULTS)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded scratch directories")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child_main(json.loads(args.child))
+
+    results = run_suite(args.pages.split(","), [int(h) for h in args.history.split(",")],
+                        [int(s) for s in args.stations.split(",")], args.full, args.reruns, args.warmup, args.keep)
+    run = {"environment": environment(args.reruns, args.warmup), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"results written to {args.output}")
+
+    over = over_budget(results)
+    print("budgets:")
+    for key, metric, budget, value in over:
+        print(f"  OVER BUDGET {key} {metric}: {value if isinstance(value, str) else round(value, 2)} "
+              f"(budget {budget})")
+    if not over:
+        print("  all within budget")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 1 if over else 0
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare with (run with --save-baseline to store one)")
+        return 1 if over else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    found = regressions(results, baseline["results"], args.tolerance)
+    print(f"compared with baseline from {baseline['environment'].get('at')} "
+          f"(commit {baseline['environment'].get('commit')}), tolerance {args.tolerance:.0%}")
+    for key, metric, old, new in found:
+        print(f"  REGRESSION {key} {metric}: {old if old is None else round(old, 2)} -> "
+              f"{new if isinstance(new, str) else round(new, 2)}")
+    if not found:
+        print("  no regressions")
+    return 1 if found or over else 0
+
+
+if __name__ == "__main__":
+    # python benchmark.py [--history 20,1000 --stations 1,10 --pages dashboard] [--save-baseline]
+    # Exits 1 when a page is over its budget or a metric regressed against the stored baseline.
+    sys.exit(main())
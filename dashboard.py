@@ -1,13 +1,13 @@
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
 import numpy as np
-import random, time, base64, os
+import time, os
 from datetime import datetime, timedelta
-from io import BytesIO
 import platform
-import matplotlib
+from lazy_imports import lazy_import
+# Charting loads on the first chart, not when the module is imported
+go = lazy_import("plotly.graph_objects")
+px = lazy_import("plotly.express")
 if platform.system() == "Windows":
     import winsound
 
@@ -17,85 +17,54 @@ try:
 except ImportError:
     # Create a dummy email_alert module for testing
     class DummyEmailAlert:
+        DIGEST_WINDOW = 0.0
+
         @staticmethod
         def send_email(subject, message):
             print(f"Would send email:\nSubject: {subject}\nMessage: {message}")
             return True
 
+        @staticmethod
+        def send_batch(alerts):
+            for subject, message in alerts:
+                DummyEmailAlert.send_email(subject, message)
+
 
     email_alert = DummyEmailAlert()
 
 import socket
 
+from ingestion import CHANNELS
+from data_hub import DEFAULT_STATION, HISTORY_WINDOW, get_hub
+from downloads import INLINE_DOWNLOAD_MAX_MB, download_url, get_download_server
+from decimate import box_summary, decimate, decimate_frame, envelope, histogram, method_for
+from assets import asset_url
+from alert_outbox import get_outbox
+from alert_state import ANOMALY_PREFIX
+from forecast import FORECAST_CHANNELS, MAX_HORIZON, get_forecaster
+from tsdb import ms_to_datetime
+from report_scheduler import PERIODS, get_report_scheduler, period_end
+from reports import FORMATS, get_report_jobs
+from profiling import laps
+from router import fragment, nav_pages, navigate, run
+from rules import RULES
+
+# Plain 1x1 background used when bg1.png is missing
+FALLBACK_BG = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+
 
 def is_cloud():
     host = socket.gethostname().lower()
     return "streamlit" in host or "heroku" in host or "render" in host
 
 
-# Initialize ALL session states using the new Streamlit 1.28+ API
-if "sound_allowed" not in st.session_state:
-    st.session_state.sound_allowed = True
-
-if "current_page" not in st.session_state:
-    st.session_state.current_page = "dashboard"
-
-if "email_sent" not in st.session_state:
-    st.session_state.email_sent = {"temperature": False, "humidity": False, "pressure": False, "co2": False,
-                                   "pm25": False}
-
-if "beep_on" not in st.session_state:
-    st.session_state.beep_on = False
-
-if "alarm" not in st.session_state:
-    st.session_state.alarm = False
-
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
-
-if "hist" not in st.session_state:
-    st.session_state.hist = pd.DataFrame(columns=["t", "Temp", "Hum", "Press", "CO2", "PM25"])
-
-# Initialize data storage for analytics
-if "historical_data" not in st.session_state:
-    # Generate 30 days of fake historical data
-    dates = pd.date_range(end=datetime.now(), periods=30, freq='D')
-    historical = pd.DataFrame({
-        'Date': dates,
-        'Temperature': np.random.uniform(22, 36, 30),
-        'Humidity': np.random.uniform(40, 75, 30),
-        'Pressure': np.random.uniform(980, 1025, 30),
-        'PM2.5': np.random.uniform(10, 80, 30),
-        'CO2': np.random.uniform(400, 1500, 30),
-        'Noise': np.random.uniform(25, 85, 30),
-        'Energy_Consumption': np.random.uniform(50, 200, 30)
-    })
-    st.session_state.historical_data = historical
-
-
 def analytics_page():
+    lap = laps("analytics")
 
-    # Initialize session state variables if needed
-    if "historical_data" not in st.session_state:
-        # Generate 30 days of fake historical data
-        dates = pd.date_range(end=datetime.now(), periods=30, freq='D')
-        historical = pd.DataFrame({
-            'Date': dates,
-            'Temperature': np.random.uniform(22, 36, 30),
-            'Humidity': np.random.uniform(40, 75, 30),
-            'Pressure': np.random.uniform(980, 1025, 30),
-            'PM2.5': np.random.uniform(10, 80, 30),
-            'CO2': np.random.uniform(400, 1500, 30),
-            'Noise': np.random.uniform(25, 85, 30),
-            'Energy_Consumption': np.random.uniform(50, 200, 30)
-        })
-        st.session_state.historical_data = historical
-    
-    # ----- LOGIN GUARD -----
-    if not st.session_state.logged_in:
-        st.stop()
-    
-    # ... rest of your analytics_page code ...
+    # Last 30 days from the shared time-series store
+    hub = get_hub()
+    historical_data = hub.recent_history(days=30)
+    lap("data load")
 
     # Title
     st.markdown("<div class='hero'>📊 Advanced Analytics & Trends</div>", unsafe_allow_html=True)
@@ -107,7 +76,7 @@ def analytics_page():
     # Analytics Overview Cards
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        avg_temp = st.session_state.historical_data['Temperature'].mean()
+        avg_temp = historical_data['Temperature'].mean()
         st.markdown(f"""
         <div class="stat-card">
             <div class="stat-value">{avg_temp:.1f}°C</div>
@@ -115,7 +84,7 @@ def analytics_page():
         </div>
         """, unsafe_allow_html=True)
     with col2:
-        max_co2 = st.session_state.historical_data['CO2'].max()
+        max_co2 = historical_data['CO2'].max()
         st.markdown(f"""
         <div class="stat-card">
             <div class="stat-value">{max_co2:.0f} ppm</div>
@@ -123,7 +92,7 @@ def analytics_page():
         </div>
         """, unsafe_allow_html=True)
     with col3:
-        alert_days = len(st.session_state.historical_data[st.session_state.historical_data['Temperature'] > 34])
+        alert_days = int(RULES.critical_days(historical_data, "temperature").sum())
         st.markdown(f"""
         <div class="stat-card">
             <div class="stat-value">{alert_days}</div>
@@ -131,7 +100,7 @@ def analytics_page():
         </div>
         """, unsafe_allow_html=True)
     with col4:
-        energy_avg = st.session_state.historical_data['Energy_Consumption'].mean()
+        energy_avg = historical_data['Energy_Consumption'].mean()
         st.markdown(f"""
         <div class="stat-card">
             <div class="stat-value">{energy_avg:.0f} kWh</div>
@@ -139,6 +108,8 @@ def analytics_page():
         </div>
         """, unsafe_allow_html=True)
 
+    lap("overview cards")
+
     # Time Range Selector
     st.markdown("<div class='card'><div class='hdr'>📅 Date Range Selection</div>", unsafe_allow_html=True)
     col1, col2 = st.columns(2)
@@ -153,41 +124,52 @@ def analytics_page():
                                  min_value=datetime.now() - timedelta(days=365),
                                  max_value=datetime.now())
 
-    # Filter data based on selection
-    filtered_data = st.session_state.historical_data[
-        (st.session_state.historical_data['Date'] >= pd.Timestamp(start_date)) &
-        (st.session_state.historical_data['Date'] <= pd.Timestamp(end_date))
-        ]
+    # Range query for the selection (indexed by station, channel, time)
+    filtered_data = hub.history(start_date, end_date)
+    # Correlations / summary table merged from per-bucket statistics
+    range_summary = hub.summary(start_date, end_date)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+    lap("range query")
+
     # Main Analytics Charts
-    tab1, tab2, tab3 = st.tabs(["📈 Trends Over Time", "🔍 Correlation Analysis", "📊 Statistical Summary"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📈 Trends Over Time", "🔍 Correlation Analysis", "📊 Statistical Summary",
+                                      "🔮 Forecast"])
 
     with tab1:
         st.markdown("<div class='card'><div class='hdr'>Time Series Analysis</div>", unsafe_allow_html=True)
 
+        # Long ranges come from the 1 min / 1 h / 1 day rollups instead of raw samples
+        trend_params = ["Temperature", "Humidity", "Pressure", "PM2.5", "CO2", "Noise", "Energy_Consumption"]
+        trend_data, trend_tier = hub.trend(start_date, end_date, trend_params)
+        if trend_tier:
+            st.caption(f"Showing averages of the {trend_tier} rollups")
+
         # Multi-line chart for all parameters - SIMPLIFIED VERSION
         fig = go.Figure()
 
+        x, y = decimate(trend_data['Date'], trend_data['Temperature'], method=method_for('Temperature'))
         fig.add_trace(go.Scatter(
-            x=filtered_data['Date'],
-            y=filtered_data['Temperature'],
+            x=x,
+            y=y,
             name='Temperature',
             line=dict(color='#6fe3ff', width=2)
         ))
 
+        x, y = decimate(trend_data['Date'], trend_data['Humidity'], method=method_for('Humidity'))
         fig.add_trace(go.Scatter(
-            x=filtered_data['Date'],
-            y=filtered_data['Humidity'],
+            x=x,
+            y=y,
             name='Humidity',
             line=dict(color='#ff7d7d', width=2),
             yaxis='y2'
         ))
 
+        x, y = decimate(trend_data['Date'], trend_data['CO2'], method=method_for('CO2'))
         fig.add_trace(go.Scatter(
-            x=filtered_data['Date'],
-            y=filtered_data['CO2'] / 10,
+            x=x,
+            y=y / 10,
             name='CO₂ (ppm/10)',
             line=dict(color='#cc99ff', width=2),
             yaxis='y3'
@@ -221,33 +203,43 @@ def analytics_page():
         st.markdown("<div class='card'><div class='hdr'>Individual Parameter Analysis</div>", unsafe_allow_html=True)
         selected_param = st.selectbox(
             "Select Parameter",
-            ["Temperature", "Humidity", "Pressure", "PM2.5", "CO2", "Noise", "Energy_Consumption"],
+            trend_params,
             index=0
         )
 
         col1, col2 = st.columns(2)
         with col1:
-            fig2 = px.line(filtered_data, x='Date', y=selected_param,
+            if f"{selected_param} max" in trend_data:
+                # Rollup buckets: draw each bucket's min and max, not the mean that flattens spikes
+                x, y = envelope(trend_data['Date'], trend_data[f"{selected_param} min"],
+                                trend_data[f"{selected_param} max"])
+                param_data = pd.DataFrame({'Date': x, selected_param: y})
+            else:
+                param_data = decimate_frame(trend_data, 'Date', selected_param)
+            fig2 = px.line(param_data, x='Date', y=selected_param,
                            title=f'{selected_param} Trend',
                            template="plotly_dark")
             fig2.update_traces(line_color='#7ceaff')
             st.plotly_chart(fig2, use_container_width=True)
 
         with col2:
-            fig3 = px.histogram(filtered_data, x=selected_param,
-                                title=f'{selected_param} Distribution',
-                                template="plotly_dark")
-            fig3.update_traces(marker_color='#ff7d7d')
+            # Binned server-side: the browser gets bin counts, not every sample
+            centers, counts, widths = histogram(filtered_data[selected_param])
+            fig3 = go.Figure(go.Bar(x=centers, y=counts, width=widths, marker_color='#ff7d7d'))
+            fig3.update_layout(title=f'{selected_param} Distribution', template="plotly_dark",
+                               xaxis_title=selected_param, yaxis_title="count", bargap=0)
             st.plotly_chart(fig3, use_container_width=True)
 
         st.markdown("</div>", unsafe_allow_html=True)
 
+    lap("trends chart")
+
     with tab2:
         st.markdown("<div class='card'><div class='hdr'>Correlation Analysis</div>", unsafe_allow_html=True)
 
         # Correlation matrix
         corr_params = ['Temperature', 'Humidity', 'CO2', 'PM2.5', 'Energy_Consumption']
-        corr_matrix = filtered_data[corr_params].corr()
+        corr_matrix = range_summary.corr(corr_params).reindex(index=corr_params, columns=corr_params)
 
         fig4 = go.Figure(data=go.Heatmap(
             z=corr_matrix.values,
@@ -279,7 +271,8 @@ def analytics_page():
             y_param = st.selectbox("Y-axis Parameter", corr_params, index=1, key='y_param')
 
         # FIXED: Removed trendline="ols" to avoid statsmodels dependency
-        fig5 = px.scatter(filtered_data, x=x_param, y=y_param,
+        fig5 = px.scatter(decimate_frame(filtered_data.dropna(subset=[x_param]), x_param, y_param, method="thin"),
+                          x=x_param, y=y_param,
                           title=f'{x_param} vs {y_param}',
                           template="plotly_dark")
         fig5.update_traces(marker=dict(color='#7ceaff', size=8))
@@ -287,33 +280,24 @@ def analytics_page():
 
         st.markdown("</div>", unsafe_allow_html=True)
 
+    lap("correlation")
+
     with tab3:
         st.markdown("<div class='card'><div class='hdr'>Statistical Summary</div>", unsafe_allow_html=True)
 
         # Summary statistics table
-        stats_df = filtered_data.describe().round(2)
+        stats_df = range_summary.describe().round(2)
         st.dataframe(stats_df.style.background_gradient(cmap='Blues'), use_container_width=True)
 
         # Alert statistics
         st.markdown("<div class='card'><div class='hdr'>Alert Statistics</div>", unsafe_allow_html=True)
 
+        alert_counts = RULES.critical_counts(filtered_data)
         alert_stats = pd.DataFrame({
-            'Parameter': ['Temperature', 'Humidity', 'Pressure', 'CO2', 'PM2.5'],
-            'Threshold': ['>34°C', '>70%', '<990 hPa', '>1200 ppm', '>55 µg/m³'],
-            'Alerts Count': [
-                len(filtered_data[filtered_data['Temperature'] > 34]),
-                len(filtered_data[filtered_data['Humidity'] > 70]),
-                len(filtered_data[filtered_data['Pressure'] < 990]),
-                len(filtered_data[filtered_data['CO2'] > 1200]),
-                len(filtered_data[filtered_data['PM2.5'] > 55])
-            ],
-            'Max Value': [
-                filtered_data['Temperature'].max(),
-                filtered_data['Humidity'].max(),
-                filtered_data['Pressure'].min(),
-                filtered_data['CO2'].max(),
-                filtered_data['PM2.5'].max()
-            ]
+            'Parameter': [rule.channel for rule in RULES.rules],
+            'Threshold': [rule.threshold_label for rule in RULES.rules],
+            'Alerts Count': [alert_counts[rule.key] for rule in RULES.rules],
+            'Max Value': [rule.worst(filtered_data[rule.channel]) for rule in RULES.rules]
         })
 
         st.dataframe(alert_stats.style.background_gradient(subset=['Alerts Count'], cmap='Reds'),
@@ -321,22 +305,77 @@ def analytics_page():
 
         # Export analytics data
         st.markdown("<div class='card'><div class='hdr'>Export Analytics Data</div>", unsafe_allow_html=True)
+        # Written chunk by chunk by a report worker straight from the store; nothing is built until asked for
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("📥 Download Analytics CSV"):
-                csv = filtered_data.to_csv(index=False)
-                st.download_button(
-                    label="Download CSV",
-                    data=csv,
-                    file_name=f"Analytics_Data_{start_date}_{end_date}.csv",
-                    mime="text/csv"
-                )
+            stations = hub.store.stations() or [DEFAULT_STATION]
+            default = [DEFAULT_STATION] if DEFAULT_STATION in stations else stations[:1]
+            export_stations = st.multiselect("Stations", stations, default=default, key="export_stations")
+            export_channels = st.multiselect("Columns", trend_params, default=trend_params, key="export_channels")
+            fmt_col, codec_col = st.columns(2)
+            with fmt_col:
+                export_fmt = st.selectbox("Format", ["csv", "parquet", "arrow"], key="export_fmt",
+                                          format_func={"csv": "CSV", "parquet": "Parquet", "arrow": "Arrow IPC"}.get)
+            with codec_col:
+                codec = st.selectbox("Compression", ["zstd", "none"], key="export_codec",
+                                     disabled=export_fmt == "csv")
+            if st.button("📥 Export Analytics Data", disabled=not export_stations or not export_channels):
+                start_ms, end_ms = hub.range_ms(start_date, end_date)
+                st.session_state.report_jobs.append(get_report_jobs().submit(
+                    f"Analytics Data {start_date} to {end_date}", export_fmt, start_ms, end_ms,
+                    channels=export_channels, stations=export_stations,
+                    compression=None if export_fmt == "csv" else codec))
+            fragment(report_jobs_panel, run_every=2)()
         with col2:
             if st.button("📊 Generate Analytics Report"):
                 st.info("Analytics report generation coming soon!")
 
         st.markdown("</div>", unsafe_allow_html=True)
 
+    lap("statistics")
+
+    with tab4:
+        st.markdown("<div class='card'><div class='hdr'>Forecast</div>", unsafe_allow_html=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            fc_param = st.selectbox("Parameter", FORECAST_CHANNELS, index=0, key='fc_param')
+        with col2:
+            fc_hours = st.slider("Horizon (hours)", 1, MAX_HORIZON, 12, key='fc_hours')
+
+        # Read from the forecast cache; models are fitted in background processes
+        forecaster = get_forecaster()
+        fc = forecaster.get(fc_param, horizon=fc_hours)
+        if fc is None:
+            error = forecaster.error(fc_param)
+            if error:
+                st.warning(f"Forecast unavailable: {error}")
+            else:
+                st.info("Forecast model is being fitted in the background; it will appear on the next refresh.")
+        else:
+            past = hub.store.rollup_frame(DEFAULT_STATION, "1h", fc["trained_to"] - 48 * 3600 * 1000,
+                                          fc["trained_to"], [fc_param])
+            fc_dates = ms_to_datetime(fc["ts"])
+            fig6 = go.Figure()
+            fig6.add_trace(go.Scatter(x=past['Date'], y=past[fc_param], name='Hourly mean',
+                                      line=dict(color='#7ceaff', width=2)))
+            fig6.add_trace(go.Scatter(x=np.concatenate([fc_dates, fc_dates[::-1]]),
+                                      y=np.concatenate([fc["upper"], fc["lower"][::-1]]),
+                                      fill='toself', fillcolor='rgba(204,153,255,0.2)',
+                                      line=dict(width=0), name='95% interval', hoverinfo='skip'))
+            fig6.add_trace(go.Scatter(x=fc_dates, y=fc["mean"], name='Forecast',
+                                      line=dict(color='#cc99ff', width=2, dash='dash')))
+            fig6.update_layout(template="plotly_dark", height=450,
+                               title=f"{fc_param}: next {fc_hours} h",
+                               legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+            st.plotly_chart(fig6, use_container_width=True)
+            model = "Holt-Winters (daily season)" if fc["seasonal"] else "Holt (damped trend)"
+            st.caption(f"{model}, fitted {datetime.fromtimestamp(fc['fitted_at']).strftime('%H:%M:%S')}")
+
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    lap("forecast")
+
     # Sidebar for analytics page
     with st.sidebar:
         st.markdown("### ⚙️ Analytics Settings")
@@ -345,57 +384,31 @@ def analytics_page():
 
         # Quick navigation
         st.markdown("### 🚀 Quick Navigation")
-        nav_col1, nav_col2, nav_col3 = st.columns(3)
-        with nav_col1:
-            if st.button("📊", key="analytics_side_dash", help="Go to Dashboard"):
-                st.session_state.current_page = "dashboard"
-                st.rerun()
-        with nav_col2:
-            if st.button("📈", key="analytics_side_analytics", help="Go to Analytics"):
-                st.session_state.current_page = "analytics"
-                st.rerun()
-        with nav_col3:
-            if st.button("📋", key="analytics_side_reports", help="Go to Reports"):
-                st.session_state.current_page = "reports"
-                st.rerun()
+        quick_nav("analytics")
 
         st.markdown("---")
 
         # Data info
         st.markdown("### 📊 Data Info")
-        st.metric("Days of Data", len(filtered_data))
+        st.metric("Days of Data", filtered_data["Date"].dt.normalize().nunique())
         st.metric("Parameters Tracked", "7")
 
         st.markdown("---")
 
         # Back to dashboard button
         if st.button("← Back to Dashboard", use_container_width=True):
-            st.session_state.current_page = "dashboard"
-            st.rerun()
+            navigate("dashboard")
+    lap("sidebar")
 
 
 def reports_page():
-    # Initialize session state variables if needed
-    if "historical_data" not in st.session_state:
-        # Generate 30 days of fake historical data
-        dates = pd.date_range(end=datetime.now(), periods=30, freq='D')
-        historical = pd.DataFrame({
-            'Date': dates,
-            'Temperature': np.random.uniform(22, 36, 30),
-            'Humidity': np.random.uniform(40, 75, 30),
-            'Pressure': np.random.uniform(980, 1025, 30),
-            'PM2.5': np.random.uniform(10, 80, 30),
-            'CO2': np.random.uniform(400, 1500, 30),
-            'Noise': np.random.uniform(25, 85, 30),
-            'Energy_Consumption': np.random.uniform(50, 200, 30)
-        })
-        st.session_state.historical_data = historical
-    
-    # ----- LOGIN GUARD -----
-    if not st.session_state.logged_in:
-        st.stop()
-    
-    # ... rest of your reports_page code ...
+    lap = laps("reports")
+    # Last 30 days from the shared time-series store
+    hub = get_hub()
+    historical_data = hub.recent_history(days=30)
+    incidents = hub.incidents(datetime.now() - timedelta(days=30), datetime.now())
+    lap("data load")
+
     # Title
     st.markdown("<div class='hero'>📋 Comprehensive Reports</div>", unsafe_allow_html=True)
 
@@ -419,6 +432,15 @@ def reports_page():
             "Time Period",
             ["Last 7 days", "Last 30 days", "Last quarter", "Custom range"]
         )
+    custom_range = None
+    if time_period == "Custom range":
+        col1, col2 = st.columns(2)
+        with col1:
+            range_start = st.date_input("From", value=datetime.now() - timedelta(days=30),
+                                        max_value=datetime.now(), key="report_from")
+        with col2:
+            range_end = st.date_input("To", value=datetime.now(), max_value=datetime.now(), key="report_to")
+        custom_range = (min(range_start, range_end), max(range_start, range_end))
 
     include_sections = st.multiselect(
         "Include Sections",
@@ -429,6 +451,8 @@ def reports_page():
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+    lap("report generator")
+
     # Generated Report Preview
     st.markdown("<div class='card'><div class='hdr'>📋 Report Preview</div>", unsafe_allow_html=True)
 
@@ -436,15 +460,15 @@ def reports_page():
     report_content = f"""
     # {report_type} Report
     **Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-    **Period:** {time_period}
+    **Period:** {time_period if custom_range is None else f"{custom_range[0]} – {custom_range[1]}"}
     **Location:** Main Monitoring Station
 
     ## Executive Summary
     - Total monitoring period: 30 days
     - System uptime: 99.8%
-    - Critical alerts: {len(st.session_state.historical_data[st.session_state.historical_data['Temperature'] > 34])}
-    - Average temperature: {st.session_state.historical_data['Temperature'].mean():.1f}°C
-    - Peak CO₂ level: {st.session_state.historical_data['CO2'].max():.0f} ppm
+    - Critical incidents: {len(incidents)} ({int(incidents['acked_by'].notna().sum())} acknowledged)
+    - Average temperature: {historical_data['Temperature'].mean():.1f}°C
+    - Peak CO₂ level: {historical_data['CO2'].max():.0f} ppm
 
     ## Key Findings
     1. Temperature remained within acceptable range for 85% of the period
@@ -469,16 +493,18 @@ def reports_page():
 
     st.text_area("Report Content", report_content, height=400)
 
+    lap("preview")
+
     # Report Charts
     st.markdown("<div class='card'><div class='hdr'>📈 Report Charts</div>", unsafe_allow_html=True)
 
     col1, col2 = st.columns(2)
     with col1:
-        # Alert frequency chart
-        alerts_by_day = st.session_state.historical_data['Temperature'] > 34
+        # Alert frequency chart (one bar per day, not per sample)
+        alerts_by_day = RULES.critical_days(historical_data, "temperature")
         fig1 = go.Figure(data=[go.Bar(
-            x=st.session_state.historical_data['Date'],
-            y=alerts_by_day.astype(int),
+            x=alerts_by_day.index,
+            y=alerts_by_day.astype(int).values,
             marker_color='#ff7676'
         )])
         fig1.update_layout(
@@ -489,17 +515,19 @@ def reports_page():
         st.plotly_chart(fig1, use_container_width=True)
 
     with col2:
-        # Parameter distribution
+        # Parameter distribution (quartiles computed here, not in the browser)
         fig2 = go.Figure()
         fig2.add_trace(go.Box(
-            y=st.session_state.historical_data['Temperature'],
+            x=['Temperature'],
             name='Temperature',
-            marker_color='#6fe3ff'
+            marker_color='#6fe3ff',
+            **box_summary(historical_data['Temperature'])
         ))
         fig2.add_trace(go.Box(
-            y=st.session_state.historical_data['Humidity'],
+            x=['Humidity'],
             name='Humidity',
-            marker_color='#ff7d7d'
+            marker_color='#ff7d7d',
+            **box_summary(historical_data['Humidity'])
         ))
         fig2.update_layout(
             template="plotly_dark",
@@ -511,66 +539,131 @@ def reports_page():
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+    lap("report charts")
+
+    # Alert History (one row per incident, not per critical reading)
+    if "Alert History" in include_sections:
+        st.markdown("<div class='card'><div class='hdr'>🚨 Alert History</div>", unsafe_allow_html=True)
+        if incidents.empty:
+            st.markdown("<div class='note'>✅ No incidents in the last 30 days</div>", unsafe_allow_html=True)
+        else:
+            st.dataframe(pd.DataFrame({
+                'Fired': incidents['fired_ts'],
+                'Parameter': [RULES.by_key[k].name if k in RULES.by_key else
+                              f"{k[len(ANOMALY_PREFIX):]} (anomaly)" for k in incidents['rule']],
+                'Peak': incidents['peak'].round(1),
+                'State': incidents['state'].str.title(),
+                'Acknowledged By': incidents['acked_by'].fillna("—"),
+                'Resolved': incidents['resolved_ts'],
+                'Emailed': incidents['notified'].astype(bool),
+            }), use_container_width=True, hide_index=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    lap("alert history")
+
     # Export Options
     st.markdown("<div class='card'><div class='hdr'>💾 Export Options</div>", unsafe_allow_html=True)
 
-    col1, col2, col3 = st.columns(3)
+    # Reports render in background worker processes; the page only queues them
+    jobs = get_report_jobs()
+    start_ms, end_ms = report_range(time_period, custom_range)
+
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
         if st.button("📄 Generate PDF Report", use_container_width=True):
-            st.success("PDF report generated successfully!")
+            st.session_state.report_jobs.append(jobs.submit(report_type, "pdf", start_ms, end_ms))
     with col2:
         if st.button("📊 Export to Excel", use_container_width=True):
-            st.success("Excel report exported successfully!")
+            st.session_state.report_jobs.append(jobs.submit(report_type, "xlsx", start_ms, end_ms))
     with col3:
+        if st.button("📥 Export to CSV", use_container_width=True):
+            st.session_state.report_jobs.append(jobs.submit(report_type, "csv", start_ms, end_ms))
+    with col4:
         if st.button("📧 Email Report", use_container_width=True):
-            st.success("Report emailed to registered addresses!")
+            st.session_state.report_jobs.append(jobs.submit(report_type, "pdf", start_ms, end_ms, email=True))
+
+    fragment(report_jobs_panel, run_every=2)()
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    lap("export options")
 
     # Scheduled Reports
     st.markdown("<div class='card'><div class='hdr'>⏰ Scheduled Reports</div>", unsafe_allow_html=True)
 
-    schedule_col1, schedule_col2, schedule_col3 = st.columns(3)
-    with schedule_col1:
-        st.checkbox("Daily Report", value=True, key="daily_report")
-    with schedule_col2:
-        st.checkbox("Weekly Summary", value=True, key="weekly_report")
-    with schedule_col3:
-        st.checkbox("Monthly Review", value=False, key="monthly_report")
-
-    email_recipients = st.text_input("Email Recipients", "admin@company.com, operations@company.com",
-                                     key="email_recipients")
+    # Stored schedules; a background scheduler queues the reports, no session needs to be open
+    scheduler = get_report_scheduler()
+    saved = scheduler.schedules()
+    schedule_cols = st.columns(3)
+    for col, (period, label) in zip(schedule_cols, [("daily", "Daily Report"), ("weekly", "Weekly Summary"),
+                                                    ("monthly", "Monthly Review")]):
+        with col:
+            sched = saved.get(period)
+            st.checkbox(label, value=sched["enabled"] if sched else PERIODS[period][1], key=f"{period}_report")
+            if sched and sched["enabled"]:
+                next_run = datetime.fromtimestamp(period_end(period, sched["next_start"]) / 1000)
+                st.caption(f"Next: {next_run.strftime('%Y-%m-%d %H:%M')}")
+
+    recipients = next((sched["recipients"] for sched in saved.values() if sched["recipients"]),
+                      ["admin@company.com", "operations@company.com"])
+    email_recipients = st.text_input("Email Recipients", ", ".join(recipients), key="email_recipients")
     if st.button("Save Schedule", use_container_width=True):
+        addresses = [a.strip() for a in email_recipients.split(",") if a.strip()]
+        for period in PERIODS:
+            scheduler.save(period, st.session_state[f"{period}_report"], addresses)
         st.success("Schedule saved!")
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+    lap("schedules")
+
     # Previous Reports
     st.markdown("<div class='card'><div class='hdr'>📚 Report Archive</div>", unsafe_allow_html=True)
 
-    # Mock previous reports
-    reports = [
-        {"date": "2024-01-15", "type": "Monthly Review", "status": "Completed", "size": "2.4 MB"},
-        {"date": "2024-01-08", "type": "Weekly Analysis", "status": "Completed", "size": "1.8 MB"},
-        {"date": "2024-01-01", "type": "Monthly Review", "status": "Completed", "size": "2.5 MB"},
-        {"date": "2023-12-25", "type": "Incident Report", "status": "Completed", "size": "3.1 MB"},
-        {"date": "2023-12-18", "type": "Weekly Analysis", "status": "Completed", "size": "1.7 MB"},
-    ]
-
-    for i, report in enumerate(reports):
-        col1, col2, col3, col4, col5 = st.columns([2, 2, 1, 1, 1])
+    # Newest first from the archive index, one keyset page at a time
+    archive = get_report_jobs().archive
+    kinds = ["All"] + archive.titles()
+    kind = st.selectbox("Report type", kinds, key="archive_type")
+    if st.session_state.get("archive_filter") != kind:
+        st.session_state.archive_filter = kind
+        st.session_state.archive_cursors = [None]
+    cursors = st.session_state.setdefault("archive_cursors", [None])
+    rows, next_cursor = archive.page(cursors[-1], None if kind == "All" else kind)
+
+    if not rows:
+        st.markdown("<div class='note'>No reports archived yet</div>", unsafe_allow_html=True)
+    for report in rows:
+        col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 1, 1])
         with col1:
-            st.write(f"**{report['date']}**")
+            st.write(f"**{datetime.fromtimestamp(report['created']).strftime('%Y-%m-%d %H:%M')}**")
         with col2:
-            st.write(report['type'])
+            st.write(f"{report['title']} ({report['format'].upper()})")
         with col3:
-            st.write(report['status'])
+            period = [datetime.fromtimestamp(report[k] / 1000) for k in ("period_start", "period_end")]
+            st.write(f"{period[0]:%Y-%m-%d} – {period[1]:%Y-%m-%d}")
         with col4:
-            st.write(report['size'])
+            st.write(f"{report['size'] / 1e6:.1f} MB" if report['size'] >= 1e5 else f"{report['size'] / 1e3:.0f} KB")
         with col5:
-            if st.button("Download", key=f"dl_{i}"):
-                st.success(f"Downloading {report['type']}...")
+            artifact_download("Download", report["digest"], report["format"],
+                              f"{report['title'].replace(' ', '_')}_{report['id']}{report['ext']}",
+                              f"dl_{report['id']}")
+
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("← Newer", disabled=len(cursors) == 1, key="archive_newer"):
+            cursors.pop()
+            st.rerun()
+    with page_col:
+        st.caption(f"Page {len(cursors)}")
+    with next_col:
+        if st.button("Older →", disabled=next_cursor is None, key="archive_older"):
+            cursors.append(next_cursor)
+            st.rerun()
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+    lap("archive")
+
     # Sidebar for reports page
     with st.sidebar:
         st.markdown("### ⚙️ Reports Settings")
@@ -579,19 +672,7 @@ def reports_page():
 
         # Quick navigation
         st.markdown("### 🚀 Quick Navigation")
-        nav_col1, nav_col2, nav_col3 = st.columns(3)
-        with nav_col1:
-            if st.button("📊", key="reports_side_dash", help="Go to Dashboard"):
-                st.session_state.current_page = "dashboard"
-                st.rerun()
-        with nav_col2:
-            if st.button("📈", key="reports_side_analytics", help="Go to Analytics"):
-                st.session_state.current_page = "analytics"
-                st.rerun()
-        with nav_col3:
-            if st.button("📋", key="reports_side_reports", help="Go to Reports"):
-                st.session_state.current_page = "reports"
-                st.rerun()
+        quick_nav("reports")
 
         st.markdown("---")
 
@@ -604,299 +685,103 @@ def reports_page():
 
         # Back to dashboard button
         if st.button("← Back to Dashboard", use_container_width=True):
-            st.session_state.current_page = "dashboard"
-            st.rerun()
-
+            navigate("dashboard")
+    lap("sidebar")
 
-def dashboard_page():
-    # Initialize ALL session state variables if they don't exist
-    if "hist" not in st.session_state:
-        st.session_state.hist = pd.DataFrame(columns=["t", "Temp", "Hum", "Press", "CO2", "PM25"])
-    
-    # Initialize other session state variables if needed
-    if "sound_allowed" not in st.session_state:
-        st.session_state.sound_allowed = True
-
-    if "current_page" not in st.session_state:
-        st.session_state.current_page = "dashboard"
 
-    if "email_sent" not in st.session_state:
-        st.session_state.email_sent = {"temperature": False, "humidity": False, "pressure": False, "co2": False,
-                                       "pm25": False}
+# ----- BEEP -----
+# Fallback beep used when beep-02.mp3 is missing
+FALLBACK_BEEP = "data:audio/mp3;base64,T2dnUwACAAAAAAAAAAAuZnpXAAAAABX54EgB9tEDh4dG9vZ0dG5nLm1pY3Jvc29mdC5jb20vdG9vbHMvZWNobzFfbWFpbi5tcDMA//NgxAAdGV0qb0IAAUZGw2m3m5u7u7u2Nju7R7t7tHbHf93R2x3d9v//////f//////////////////////////8R3///EQ4fBAQEEB/fuAQMBA0E0KQBAQdBAf4eH+P/8uFGh0b2QAAAAAAAAAAAA//MUZAAAAAGkAAAAAAAAA0gAAAAATEFN//MUZAMAAAGkAAAAAAAAA0gAAAAARTMu//MUZAYAAAGkAAAAAAAAA0gAAAAAOTku//MUZAkAAAGkAAAAAAAAA0gAAAAANVVV"
 
-    if "beep_on" not in st.session_state:
-        st.session_state.beep_on = False
 
-    if "alarm" not in st.session_state:
-        st.session_state.alarm = False
+def load_beep():
+    # Encoded once per process by the asset cache
+    return asset_url("beep-02.mp3", fallback=FALLBACK_BEEP)
 
-    # Initialize historical_data if not present
-    if "historical_data" not in st.session_state:
-        # Generate 30 days of fake historical data
-        dates = pd.date_range(end=datetime.now(), periods=30, freq='D')
-        historical = pd.DataFrame({
-            'Date': dates,
-            'Temperature': np.random.uniform(22, 36, 30),
-            'Humidity': np.random.uniform(40, 75, 30),
-            'Pressure': np.random.uniform(980, 1025, 30),
-            'PM2.5': np.random.uniform(10, 80, 30),
-            'CO2': np.random.uniform(400, 1500, 30),
-            'Noise': np.random.uniform(25, 85, 30),
-            'Energy_Consumption': np.random.uniform(50, 200, 30)
-        })
-        st.session_state.historical_data = historical
-
-    # ----- LOGIN GUARD -----
-    if not st.session_state.logged_in:
-        st.stop()
-
-    # Get current page from session state with safe access
-    current_page = st.session_state.get('current_page', 'dashboard')
-    
-    # ----- HIDE STREAMLIT CHROME -----
-    st.markdown("""
-    <style>
-    header, footer {visibility:hidden;}
-    [data-testid="stToolbar"] {visibility:hidden;}
-    </style>
-    """, unsafe_allow_html=True)
-
-    # ----- BACKGROUND IMAGE -----
-    def b64(file):
-        try:
-            with open(file, "rb") as f:
-                return base64.b64encode(f.read()).decode()
-        except:
-            # Return a default gradient background if image not found
-            return "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
 
-    bg = b64("bg1.png")
+# Report length per "Time Period" choice, in days ("Custom range" takes its own dates)
+REPORT_PERIODS = {"Last 7 days": 7, "Last 30 days": 30, "Last quarter": 90}
 
-    # ----- GLOBAL CSS (MATCH IMAGE FEEL) -----
-    st.markdown(f"""
-    <style>
-    .stApp {{
-        background: url("data:image/png;base64,{bg}") center/cover no-repeat;
-        color: #d8f6ff;
-    }}
-    .veil {{
-        position: fixed; inset:0;
-        background: linear-gradient(180deg, rgba(7,16,28,.55), rgba(5,12,22,.85));
-        z-index:-1;
-    }}
 
-    /* Top bar */
-    .top {{
-        display:grid; grid-template-columns: 1fr 2fr;
-        align-items:center;
-        padding: 14px 28px;
-        border-bottom:1px solid rgba(140,220,255,.25);
-        background: rgba(8,18,33,.65);
-        backdrop-filter: blur(8px);
-    }}
-    .brand {{
-        letter-spacing:.18em; font-weight:700; color:#7ceaff;
-    }}
-    .menu {{
-        text-align:right; font-weight:600;
-    }}
-    .menu span {{ 
-        margin-left:26px; 
-        color:#a8edff; 
-        cursor: pointer;
-        transition: color 0.3s;
-    }}
-    .menu span:hover {{ 
-        color: #7ceaff;
-        text-decoration: underline;
-    }}
-    .active-nav {{ 
-        color: #67ffb5 !important;
-        font-weight: 700;
-        border-bottom: 2px solid #67ffb5;
-        padding-bottom: 2px;
-    }}
-    .live {{ color:#67ffb5; }}
-
-    /* Title */
-    .hero {{
-        margin: 18px 28px;
-        font-size: 28px; font-weight:700; color:#bff5ff;
-    }}
-
-    /* Glass cards */
-    .card {{
-        background: rgba(11,24,44,.75);
-        border:1px solid rgba(140,220,255,.25);
-        box-shadow: inset 0 0 0 1px rgba(255,255,255,.02), 0 0 24px rgba(0,0,0,.45);
-        border-radius: 14px;
-        padding: 16px 18px;
-        margin-bottom: 20px;
-    }}
-    .hdr {{ font-size:20px; margin-bottom:10px; color:#bff5ff; }}
-
-    /* Table style */
-    table {{ width:100%; border-collapse:collapse; }}
-    th,td {{ padding:10px; text-align:left; }}
-    th {{ border-bottom:2px solid rgba(140,220,255,.3); }}
-    tr:not(:last-child) td {{ border-bottom:1px solid rgba(255,255,255,.06); }}
-    .ok {{ color:#67ffb5; }}
-    .mid {{ color:#ffd966; }}
-    .bad {{ color:#ff7676; }}
-
-    /* Alerts + Notifications */
-    .alert {{ background: rgba(110,20,20,.6); border-left:4px solid #ff6b6b; padding:10px; border-radius:8px; margin-bottom:8px; }}
-    .note  {{ background: rgba(15,80,65,.55); border-left:4px solid #4deac2; padding:10px; border-radius:8px; margin-bottom:8px; }}
-    .info  {{ background: rgba(20,60,110,.55); border-left:4px solid #6fe3ff; padding:10px; border-radius:8px; margin-bottom:8px; }}
-
-    /* Stats cards */
-    .stat-card {{
-        background: rgba(11,24,44,.75);
-        border:1px solid rgba(140,220,255,.25);
-        border-radius: 10px;
-        padding: 15px;
-        text-align: center;
-    }}
-    .stat-value {{ font-size: 28px; font-weight: bold; color: #7ceaff; }}
-    .stat-label {{ font-size: 14px; color: #a8edff; margin-top: 5px; }}
-
-    /* Navigation buttons */
-    .nav-btn {{
-        background: none;
-        border: none;
-        color: #a8edff;
-        font-size: 16px;
-        font-weight: 600;
-        cursor: pointer;
-        padding: 5px 10px;
-        margin-left: 20px;
-    }}
-    .nav-btn:hover {{
-        color: #7ceaff;
-        text-decoration: underline;
-    }}
-    .nav-btn.active {{
-        color: #67ffb5;
-        border-bottom: 2px solid #67ffb5;
-    }}
-
-    /* Custom button styling */
-    .stButton > button {{
-        background: rgba(11,24,44,.75);
-        border: 1px solid rgba(140,220,255,.25);
-        color: #d8f6ff;
-        border-radius: 8px;
-        transition: all 0.3s;
-    }}
-    .stButton > button:hover {{
-        background: rgba(11,24,44,.9);
-        border: 1px solid rgba(140,220,255,.5);
-        color: #7ceaff;
-    }}
-    </style>
-    <div class="veil"></div>
-    """, unsafe_allow_html=True)
-
-    # ----- HEADER / NAVBAR -----
-    now = datetime.now().strftime("%H:%M:%S")
-
-    # Create navigation using Streamlit buttons instead of pure JavaScript
-    st.markdown(f"""
-    <div class="top">
-      <div class="brand">CRITICAL SPACE MONITORING</div>
-      <div class="menu">
-        <span style="{'color: #67ffb5; font-weight: 700; border-bottom: 2px solid #67ffb5; padding-bottom: 2px;' if current_page == 'dashboard' else ''}">Dashboard</span>
-        <span style="{'color: #67ffb5; font-weight: 700; border-bottom: 2px solid #67ffb5; padding-bottom: 2px;' if current_page == 'analytics' else ''}">Analytics</span>
-        <span style="{'color: #67ffb5; font-weight: 700; border-bottom: 2px solid #67ffb5; padding-bottom: 2px;' if current_page == 'reports' else ''}">Reports</span>
-        <span class="live">● LIVE&nbsp;{now}</span>
-      </div>
-    </div>
-    """, unsafe_allow_html=True)
-
-    # Create clickable navigation using columns
-    nav_col1, nav_col2, nav_col3, nav_col4 = st.columns([2, 1, 1, 2])
+def report_range(time_period, custom_range=None):
+    """(start_ms, end_ms) for a "Time Period" choice; a custom (first, last) date pair covers both days in full."""
+    # Whole minutes, so repeating a request within the minute is served from the archive
+    now_ms = int(time.time() // 60 * 60000)
+    if custom_range is not None:
+        first, last = (datetime.combine(d, datetime.min.time()) for d in custom_range)
+        return int(first.timestamp() * 1000), min(int((last + timedelta(days=1)).timestamp() * 1000) - 1, now_ms)
+    return now_ms - REPORT_PERIODS[time_period] * 86400 * 1000, now_ms
 
-    with nav_col1:
-        # Empty column for spacing
-        pass
 
-    with nav_col2:
-        if st.button("Dashboard", key="nav_dashboard", use_container_width=True):
-            st.session_state.current_page = "dashboard"
-            st.rerun()
-
-    with nav_col3:
-        if st.button("Analytics", key="nav_analytics", use_container_width=True):
-            st.session_state.current_page = "analytics"
-            st.rerun()
+# ----- REPORT JOBS -----
+# Fragment: polls this session's jobs without re-running the reports page
+def artifact_download(label, digest, fmt, file_name, key):
+    # Only this (logged-in) session gets the file: a short-lived link to the
+    # download listener, which streams it from disk, or else a deferred
+    # download button, which reads it into memory on click (size-capped)
+    ext, mime = FORMATS[fmt]
+    path = get_report_jobs().archive.path(digest, ext)
+    server = get_download_server()
+    if server is not None:
+        token = server.links.issue(st.session_state.session_id, path, file_name, mime)
+        st.link_button(label, download_url(server, token), key=key)
+        return
 
-    with nav_col4:
-        if st.button("Reports", key="nav_reports", use_container_width=True):
-            st.session_state.current_page = "reports"
-            st.rerun()
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        st.caption("No longer in the archive")
+        return
+    if size > INLINE_DOWNLOAD_MAX_MB * 2 ** 20:
+        st.warning(f"{size / 2 ** 20:.0f} MB is too large to download through the app; "
+                   f"enable the download listener (CSMS_DOWNLOAD_PORT)")
+        return
 
-    # Add some spacing
-    st.markdown("<br><br>", unsafe_allow_html=True)
+    def read():
+        with open(path, "rb") as f:
+            return f.read()
+
+    st.download_button(label, read, file_name=file_name, mime=mime, key=key, on_click="ignore")
+
+
+def report_jobs_panel():
+    jobs = get_report_jobs()
+    for job_id in reversed(st.session_state.get("report_jobs", [])[-10:]):
+        job = jobs.job(job_id)
+        if job is None:
+            continue
+        ext = FORMATS[job["format"]][0]
+        label = f"{job['title']} ({job['format'].upper()}) #{job['id']}"
+        if job["status"] == "done":
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.write(f"✅ {label} — {job['size'] / 1024:.0f} KB")
+            with col2:
+                artifact_download("Download", job["digest"], job["format"],
+                                  f"{job['title'].replace(' ', '_')}{ext}", f"job_dl_{job['id']}")
+            if job["error"]:
+                st.warning(job["error"])
+        elif job["status"] == "failed":
+            st.error(f"{label} failed: {job['error']}")
+        else:
+            st.progress(job["progress"], text=f"{label}: {job['stage'] or job['status']}")
 
-    # Handle page navigation - FIXED LINE
-    if current_page != "dashboard":
-        if current_page == "analytics":
-            analytics_page()
-        elif current_page == "reports":
-            reports_page()
-        return
 
+# ----- LIVE PANEL -----
+# Re-run on its own timer as a fragment (see dashboard_page); everything
+# outside it renders only on a full rerun.
+def live_panel():
+    lap = laps("dashboard")
     # ----- TITLE -----
     st.markdown("<div class='hero'>Critical Space Environment Monitoring – Real-Time Dashboard</div>",
                 unsafe_allow_html=True)
 
-    # ----- DATA (demo) -----
-    def read():
-        return {
-            "Temperature": round(random.uniform(22, 36), 1),
-            "Humidity": round(random.uniform(40, 75), 1),
-            "Pressure": round(random.uniform(980, 1025), 1),
-            "PM2.5": round(random.uniform(10, 80), 1),
-            "CO2": round(random.uniform(400, 1500), 1),
-            "Noise": round(random.uniform(25, 85), 1)
-        }
-
-    s = read()
-
-    # ----- STATUS -----
-    def status(name, val):
-        if name == "Temperature":
-            if val > 34: return "High", "bad"
-            if val > 26: return "Warm", "mid"
-            return "Normal", "ok"
-        if name == "Humidity":
-            if val > 70: return "Very High", "bad"
-            if val > 60: return "High", "mid"
-            return "Normal", "ok"
-        if name == "CO2":
-            if val > 1200: return "High", "bad"
-            if val > 800:  return "Moderate", "mid"
-            return "Normal", "ok"
-        if name == "PM2.5":
-            if val > 55: return "High", "bad"
-            if val > 35: return "Moderate", "mid"
-            return "Clean", "ok"
-        if name == "Pressure":
-            if val < 990: return "Low", "bad"
-            if val < 1000: return "Moderate", "mid"
-            return "Normal", "ok"
-        return "Safe", "ok"
-
-    # ----- BEEP -----
-    def load_beep():
-        try:
-            with open("beep-02.mp3", "rb") as f:
-                return base64.b64encode(f.read()).decode()
-        except:
-            # Fallback to online beep if local file not found
-            return "T2dnUwACAAAAAAAAAAAuZnpXAAAAABX54EgB9tEDh4dG9vZ0dG5nLm1pY3Jvc29mdC5jb20vdG9vbHMvZWNobzFfbWFpbi5tcDMA//NgxAAdGV0qb0IAAUZGw2m3m5u7u7u2Nju7R7t7tHbHf93R2x3d9v//////f//////////////////////////8R3///EQ4fBAQEEB/fuAQMBA0E0KQBAQdBAf4eH+P/8uFGh0b2QAAAAAAAAAAAA//MUZAAAAAGkAAAAAAAAA0gAAAAATEFN//MUZAMAAAGkAAAAAAAAA0gAAAAARTMu//MUZAYAAAGkAAAAAAAAA0gAAAAAOTku//MUZAkAAAGkAAAAAAAAA0gAAAAANVVV"
-
+    # ----- DATA -----
+    # Readings are produced by the ingest thread; the panel only reads the latest one
+    hub = get_hub()
+    s = hub.latest(wait=2.0) or {ch: float("nan") for ch in CHANNELS}
     beep = load_beep()
+    lap("reading")
 
     # ----- QUICK STATS ROW -----
     col1, col2, col3, col4 = st.columns(4)
@@ -922,7 +807,7 @@ def dashboard_page():
         </div>
         """, unsafe_allow_html=True)
     with col4:
-        air_quality = "Good" if s['PM2.5'] < 35 else "Moderate" if s['PM2.5'] < 55 else "Poor"
+        air_quality = ["Good", "Moderate", "Poor"][RULES.evaluate_reading(s)["pm25"]]
         st.markdown(f"""
         <div class="stat-card">
             <div class="stat-value">{air_quality}</div>
@@ -930,6 +815,8 @@ def dashboard_page():
         </div>
         """, unsafe_allow_html=True)
 
+    lap("quick stats")
+
     # ----- MAIN GRID (TOP ROW: LEFT + RIGHT) -----
     top_left, top_right = st.columns([1.15, 2.0], gap="large")
 
@@ -956,39 +843,40 @@ def dashboard_page():
 
         for name, val in rows:
             key = key_map[name]
-            lab, cls = status(key, s[key])
+            lab, cls = RULES.status(key, s[key])
             html += f"<tr><td>{name}</td><td>{val}</td><td class='{cls}'>{lab}</td></tr>"
 
         html += "</table></div>"
         st.markdown(html, unsafe_allow_html=True)
 
+    lap("status table")
+
     # RIGHT: LINE GRAPH (big card)
     with top_right:
-        st.markdown("<div class='card'><div class='hdr'>Real-Time Trends (Last 20 readings)</div>",
+        st.markdown(f"<div class='card'><div class='hdr'>Real-Time Trends (Last {HISTORY_WINDOW} readings)</div>",
                     unsafe_allow_html=True)
 
-        # Add all parameters to history - NOW SAFE
-        st.session_state.hist.loc[len(st.session_state.hist)] = [
-            datetime.now().strftime("%H:%M:%S"),
-            s["Temperature"],
-            s["Humidity"],
-            s["Pressure"],
-            s["CO2"],
-            s["PM2.5"]
-        ]
+        # Zero-copy views of the newest readings in the shared live buffer
+        hist = hub.live()
+        t = hist.timestamps(last=HISTORY_WINDOW)
 
-        # Keep only last 20 points
-        if len(st.session_state.hist) > 20:
-            st.session_state.hist = st.session_state.hist.iloc[-20:]
+        def trace(channel):
+            # Decimate on the epoch-ms stamps; only the points kept are converted to local time
+            x, y = decimate(t, hist.column(channel, last=HISTORY_WINDOW))
+            return ms_to_datetime(x).to_numpy(), y
 
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=st.session_state.hist["t"], y=st.session_state.hist["Temp"],
+        x, y = trace("Temperature")
+        fig.add_trace(go.Scatter(x=x, y=y,
                                  name="Temperature", line=dict(color="#6fe3ff", width=2)))
-        fig.add_trace(go.Scatter(x=st.session_state.hist["t"], y=st.session_state.hist["Hum"],
+        x, y = trace("Humidity")
+        fig.add_trace(go.Scatter(x=x, y=y,
                                  name="Humidity", line=dict(color="#ff7d7d", width=2)))
-        fig.add_trace(go.Scatter(x=st.session_state.hist["t"], y=st.session_state.hist["Press"] / 10,
+        x, y = trace("Pressure")
+        fig.add_trace(go.Scatter(x=x, y=y / 10,
                                  name="Pressure (hPa/10)", line=dict(color="#ffcc66", width=2)))
-        fig.add_trace(go.Scatter(x=st.session_state.hist["t"], y=st.session_state.hist["CO2"] / 20,
+        x, y = trace("CO2")
+        fig.add_trace(go.Scatter(x=x, y=y / 20,
                                  name="CO₂ (ppm/20)", line=dict(color="#cc99ff", width=2)))
 
         fig.update_layout(
@@ -1000,120 +888,38 @@ def dashboard_page():
         st.plotly_chart(fig, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
+    lap("chart build")
+
     # ----- BOTTOM GRID (ALERTS | NOTIFICATIONS) -----
     bottom_left, bottom_right = st.columns([1, 1], gap="large")
 
     # ALERTS
     with bottom_left:
         st.markdown("<div class='card'><div class='hdr'>⚠️ Critical Alerts</div>", unsafe_allow_html=True)
-        unsafe = False
-
-        # Check all parameters and send emails if needed
-        if s["Temperature"] > 34:
-            unsafe = True
-            st.markdown(f"<div class='alert'>🔥 Temperature exceeded 34°C (Current: {s['Temperature']}°C)</div>",
-                        unsafe_allow_html=True)
-
-            if not st.session_state.email_sent["temperature"]:
-                try:
-                    email_alert.send_email(
-                        "CRITICAL TEMPERATURE ALERT",
-                        f"Temperature crossed safe limit!\n\n"
-                        f"Current Value: {s['Temperature']}°C\n"
-                        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                        f"Location: Main Monitoring Station\n"
-                        f"Threshold: 34°C\n\n"
-                        f"Please take immediate action."
-                    )
-                    st.session_state.email_sent["temperature"] = True
-                except Exception as e:
-                    st.error(f"Failed to send email alert: {e}")
-
-        if s["Humidity"] > 70:
-            unsafe = True
-            st.markdown(f"<div class='alert'>💧 Humidity exceeded 70% (Current: {s['Humidity']}%)</div>",
-                        unsafe_allow_html=True)
-
-            if not st.session_state.email_sent["humidity"]:
-                try:
-                    email_alert.send_email(
-                        "HIGH HUMIDITY ALERT",
-                        f"Humidity crossed critical limit!\n\n"
-                        f"Current Value: {s['Humidity']}%\n"
-                        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                        f"Location: Main Monitoring Station\n"
-                        f"Threshold: 70%\n\n"
-                        f"Risk of mold growth and equipment damage."
-                    )
-                    st.session_state.email_sent["humidity"] = True
-                except Exception as e:
-                    st.error(f"Failed to send email alert: {e}")
-
-        if s["Pressure"] < 990:
-            unsafe = True
-            st.markdown(f"<div class='alert'>🌡️ Pressure below 990 hPa (Current: {s['Pressure']} hPa)</div>",
-                        unsafe_allow_html=True)
-
-            if not st.session_state.email_sent["pressure"]:
-                try:
-                    email_alert.send_email(
-                        "LOW PRESSURE ALERT",
-                        f"Atmospheric pressure below safe limit!\n\n"
-                        f"Current Value: {s['Pressure']} hPa\n"
-                        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                        f"Location: Main Monitoring Station\n"
-                        f"Threshold: 990 hPa\n\n"
-                        f"May indicate weather changes or system issues."
-                    )
-                    st.session_state.email_sent["pressure"] = True
-                except Exception as e:
-                    st.error(f"Failed to send email alert: {e}")
-
-        if s["CO2"] > 1200:
-            unsafe = True
-            st.markdown(f"<div class='alert'>☁️ CO₂ exceeded 1200 ppm (Current: {s['CO2']} ppm)</div>",
-                        unsafe_allow_html=True)
-
-            if not st.session_state.email_sent["co2"]:
-                try:
-                    email_alert.send_email(
-                        "HIGH CO₂ ALERT",
-                        f"CO₂ level crossed safe limit!\n\n"
-                        f"Current Value: {s['CO2']} ppm\n"
-                        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                        f"Location: Main Monitoring Station\n"
-                        f"Threshold: 1200 ppm\n\n"
-                        f"Ventilation required for occupant safety."
-                    )
-                    st.session_state.email_sent["co2"] = True
-                except Exception as e:
-                    st.error(f"Failed to send email alert: {e}")
-
-        if s["PM2.5"] > 55:
-            unsafe = True
-            st.markdown(f"<div class='alert'>💨 PM2.5 exceeded 55 µg/m³ (Current: {s['PM2.5']} µg/m³)</div>",
-                        unsafe_allow_html=True)
-
-            if not st.session_state.email_sent["pm25"]:
-                try:
-                    email_alert.send_email(
-                        "POOR AIR QUALITY ALERT",
-                        f"PM2.5 level crossed safe limit!\n\n"
-                        f"Current Value: {s['PM2.5']} µg/m³\n"
-                        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                        f"Location: Main Monitoring Station\n"
-                        f"Threshold: 55 µg/m³\n\n"
-                        f"Air purification or ventilation required."
-                    )
-                    st.session_state.email_sent["pm25"] = True
-                except Exception as e:
-                    st.error(f"Failed to send email alert: {e}")
-
-        if not unsafe:
+        # Incidents are tracked server-side (alert_state.AlertManager): they fire after
+        # the hold-down, notify once through the outbox and resolve with hysteresis
+        incidents = hub.alerts.active(DEFAULT_STATION)
+        anomalies = hub.anomalies.flags(DEFAULT_STATION)
+        for inc in incidents:
+            rule = RULES.by_key.get(inc["rule"])
+            if rule is not None:
+                text = rule.alert_text(s[rule.channel])
+            else:
+                # Raised by the anomaly detector before any threshold was crossed
+                channel = inc["rule"][len(ANOMALY_PREFIX):]
+                what = ", ".join(anomalies.get(channel, ["anomaly"]))
+                text = f"📈 Unusual {channel} readings: {what} (Current: {s.get(channel)})"
+            col_a, col_b = st.columns([4, 1])
+            with col_a:
+                acked = f" — acknowledged by {inc['acked_by']}" if inc["acked_by"] else ""
+                st.markdown(f"<div class='alert'>{text}{acked}</div>", unsafe_allow_html=True)
+            with col_b:
+                if inc["state"] == "firing" and st.button("Ack", key=f"ack_{inc['id']}"):
+                    hub.alerts.acknowledge(inc["id"], st.session_state.get("username", "operator"))
+                    st.rerun(scope="fragment")
+
+        if not incidents:
             st.markdown("<div class='note'>✅ All parameters within safe range</div>", unsafe_allow_html=True)
-            # Reset all email flags when safe
-            for key in st.session_state.email_sent:
-                st.session_state.email_sent[key] = False
 
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -1121,142 +927,69 @@ def dashboard_page():
     with bottom_right:
         st.markdown("<div class='card'><div class='hdr'>📢 System Notifications</div>", unsafe_allow_html=True)
 
-        # Show which emails were sent
-        email_count = sum(st.session_state.email_sent.values())
+        # Show how many open incidents were emailed
+        email_count = sum(inc["notified"] for inc in incidents)
         if email_count > 0:
             st.markdown(f"<div class='alert'>📧 {email_count} alert email(s) sent to admin</div>",
                         unsafe_allow_html=True)
         else:
             st.markdown("<div class='note'>📧 No emails sent (all parameters normal)</div>", unsafe_allow_html=True)
 
+        outbox = get_outbox(email_alert.send_email, email_alert.send_batch, email_alert.DIGEST_WINDOW)
+        queued = outbox.pending()
+        if queued:
+            st.markdown(f"<div class='info'>📨 {queued} alert email(s) waiting in outbox</div>",
+                        unsafe_allow_html=True)
+
         st.markdown("<div class='note'>📱 SMS notifications active</div>", unsafe_allow_html=True)
         st.markdown("<div class='note'>☁️ Data synced to cloud storage</div>", unsafe_allow_html=True)
         st.markdown("<div class='note'>📊 Logged to database</div>", unsafe_allow_html=True)
         st.markdown("<div class='note'>🔄 Real-time monitoring active</div>", unsafe_allow_html=True)
 
+        lap("alert checks")
+
         # Export section
         st.markdown("<div class='hdr'>📄 Quick Export</div>", unsafe_allow_html=True)
 
-        def make_pdf(data):
-            try:
-                from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
-                from reportlab.lib.pagesizes import A4
-                from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-                from reportlab.lib.units import inch
-                from reportlab.lib import colors
-                from reportlab.platypus import TableStyle
-
-                buf = BytesIO()
-                doc = SimpleDocTemplate(buf, pagesize=A4)
-                styles = getSampleStyleSheet()
-
-                # Custom styles
-                title_style = ParagraphStyle(
-                    'CustomTitle',
-                    parent=styles['Title'],
-                    fontSize=24,
-                    spaceAfter=30,
-                    textColor=colors.HexColor('#4deac2')
-                )
-
-                content = []
-
-                # Title
-                content.append(Paragraph("Critical Space Monitoring Report", title_style))
-                content.append(Spacer(1, 20))
-
-                # Report info
-                content.append(
-                    Paragraph(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles["Normal"]))
-                content.append(Paragraph("Location: Main Monitoring Station", styles["Normal"]))
-                content.append(Spacer(1, 20))
-
-                # Parameter table
-                table_data = [['Parameter', 'Value', 'Status']]
-
-                for param, value in data.items():
-                    lab, _ = status(param, value)
-                    table_data.append([param, str(value), lab])
-
-                table = Table(table_data, colWidths=[2 * inch, 1.5 * inch, 1.5 * inch])
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a3b5a')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#0b182c')),
-                    ('TEXTCOLOR', (0, 1), (-1, -1), colors.white),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#4deac2')),
-                ]))
-
-                content.append(table)
-                content.append(Spacer(1, 30))
-
-                doc.build(content)
-                pdf_bytes = buf.getvalue()
-                buf.close()
-                return pdf_bytes
-
-            except Exception as e:
-                st.error(f"Error generating PDF: {e}")
-                # Fallback to simple text report
-                simple_report = f"""
-                Critical Space Monitoring Report
-                =================================
-
-                Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-                Location: Main Monitoring Station
-
-                Sensor Readings:
-                """
-                for param, value in data.items():
-                    lab, _ = status(param, value)
-                    simple_report += f"\n{param}: {value} ({lab})"
-
-                # Convert to PDF bytes
-                from reportlab.platypus import SimpleDocTemplate, Paragraph
-                from reportlab.lib.styles import getSampleStyleSheet
-                buf = BytesIO()
-                doc = SimpleDocTemplate(buf, pagesize=A4)
-                styles = getSampleStyleSheet()
-                content = [Paragraph(simple_report.replace('\n', '<br/>'), styles["Normal"])]
-                doc.build(content)
-                pdf_bytes = buf.getvalue()
-                buf.close()
-                return pdf_bytes
-
         col1, col2 = st.columns(2)
         with col1:
+            # Rendered by the report workers; the panel's next refresh offers the download
+            jobs = get_report_jobs()
             if st.button("📊 Generate PDF"):
-                pdf_data = make_pdf(s)
+                now_ms = int(time.time() * 1000)
+                st.session_state.snapshot_job = jobs.submit("Dashboard Snapshot", "pdf", now_ms, now_ms,
+                                                            reading=dict(s))
+            job = jobs.job(st.session_state.get("snapshot_job"))
+            if jobs.artifact(job):
+                artifact_download("⬇️ Download", job["digest"], "pdf",
+                                  f"Dashboard_Report_{datetime.fromtimestamp(job['created']).strftime('%Y%m%d_%H%M%S')}.pdf",
+                                  "snapshot_dl")
+            elif job is not None and job["status"] == "failed":
+                st.error(f"Error generating PDF: {job['error']}")
+            elif job is not None:
+                st.caption("Generating PDF…")
+        with col2:
+            # Built only when asked for, from the reading on screen at that moment
+            if st.button("📥 Export CSV"):
+                st.session_state.snapshot_csv = (
+                    f"Sensor_Data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    ",".join(s) + "\n" + ",".join(str(v) for v in s.values()) + "\n")
+            if st.session_state.get("snapshot_csv"):
+                name, csv = st.session_state.snapshot_csv
                 st.download_button(
-                    label="⬇️ Download",
-                    data=pdf_data,
-                    file_name=f"Dashboard_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                    mime="application/pdf"
+                    label="⬇️ Download CSV",
+                    data=csv,
+                    file_name=name,
+                    mime="text/csv"
                 )
-        with col2:
-            csv = pd.DataFrame([s]).to_csv(index=False)
-            st.download_button(
-                label="📥 Download CSV",
-                data=csv,
-                file_name=f"Sensor_Data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
 
         st.markdown("</div>", unsafe_allow_html=True)
 
-    # ---------- EVENT BASED BEEP ----------
-    # Check if any parameter is in critical state
-    critical_conditions = [
-        s["Temperature"] > 34,
-        s["Humidity"] > 70,
-        s["Pressure"] < 990,
-        s["CO2"] > 1200,
-        s["PM2.5"] > 55
-    ]
+    lap("export widgets")
 
-    any_critical = any(critical_conditions)
+    # ---------- EVENT BASED BEEP ----------
+    # Sound for firing incidents; acknowledging one silences it
+    any_critical = any(inc["state"] == "firing" for inc in incidents)
 
     if any_critical and not st.session_state.alarm and st.session_state.sound_allowed:
         st.markdown("<div class='alert'>🚨 AUDIBLE ALARM ACTIVATED</div>", unsafe_allow_html=True)
@@ -1273,7 +1006,7 @@ def dashboard_page():
             stamp = str(time.time())
             st.markdown(f"""
                 <audio id="alarmAudio" autoplay>
-                    <source src="data:audio/mp3;base64,{beep}#{stamp}" type="audio/mp3">
+                    <source src="{beep}#{stamp}" type="audio/mp3">
                 </audio>
                 <script>
                     setTimeout(function() {{
@@ -1292,7 +1025,217 @@ def dashboard_page():
     # Reset alarm when all conditions are safe
     if not any_critical:
         st.session_state.alarm = False
+    lap("alarm")
+
+
+def live_status():
+    # Sidebar metrics, refreshed together with the live panel
+    hub = get_hub()
+    st.metric("Total Readings", f"{hub.ingestor().received}")
+    st.metric("Active Alerts", f"{len(hub.alerts.active(DEFAULT_STATION))}")
+
+
+# Styles only the live dashboard uses (status table, alert feed)
+DASHBOARD_CSS = """
+<style>
+table { width:100%; border-collapse:collapse; }
+th,td { padding:10px; text-align:left; }
+th { border-bottom:2px solid rgba(140,220,255,.3); }
+tr:not(:last-child) td { border-bottom:1px solid rgba(255,255,255,.06); }
+.ok { color:#67ffb5; }
+.mid { color:#ffd966; }
+.bad { color:#ff7676; }
+.alert { background: rgba(110,20,20,.6); border-left:4px solid #ff6b6b; padding:10px; border-radius:8px; margin-bottom:8px; }
+.info  { background: rgba(20,60,110,.55); border-left:4px solid #6fe3ff; padding:10px; border-radius:8px; margin-bottom:8px; }
+</style>
+"""
+
+
+# ----- PAGE CHROME -----
+# Theme, background and navbar shared by the logged-in pages; the router
+# (router.py) calls it before the page itself renders.
+def quick_nav(prefix):
+    icons = {"dashboard": "📊", "analytics": "📈", "reports": "📋"}
+    pages = nav_pages()
+    for col, page in zip(st.columns(len(pages)), pages):
+        with col:
+            if st.button(icons.get(page.name, page.label[:1]), key=f"{prefix}_side_{page.name}",
+                         help=f"Go to {page.label}"):
+                navigate(page.name)
+
+
+def page_chrome(current_page):
+    lap = laps(current_page)
+
+    # ----- HIDE STREAMLIT CHROME -----
+    st.markdown("""
+    <style>
+    header, footer {visibility:hidden;}
+    [data-testid="stToolbar"] {visibility:hidden;}
+    </style>
+    """, unsafe_allow_html=True)
+
+    # ----- BACKGROUND IMAGE -----
+    # Served by URL from the content-hashed static copy (cached by the browser)
+    bg = asset_url("bg1.png", webp=True, fallback=FALLBACK_BG)
+    lap("asset load")
+
+    # ----- GLOBAL CSS (MATCH IMAGE FEEL) -----
+    st.markdown(f"""
+    <style>
+    .stApp {{
+        background: url("{bg}") center/cover no-repeat;
+        color: #d8f6ff;
+    }}
+    .veil {{
+        position: fixed; inset:0;
+        background: linear-gradient(180deg, rgba(7,16,28,.55), rgba(5,12,22,.85));
+        z-index:-1;
+    }}
+
+    /* Top bar */
+    .top {{
+        display:grid; grid-template-columns: 1fr 2fr;
+        align-items:center;
+        padding: 14px 28px;
+        border-bottom:1px solid rgba(140,220,255,.25);
+        background: rgba(8,18,33,.65);
+        backdrop-filter: blur(8px);
+    }}
+    .brand {{
+        letter-spacing:.18em; font-weight:700; color:#7ceaff;
+    }}
+    .menu {{
+        text-align:right; font-weight:600;
+    }}
+    .menu span {{ 
+        margin-left:26px; 
+        color:#a8edff; 
+        cursor: pointer;
+        transition: color 0.3s;
+    }}
+    .menu span:hover {{ 
+        color: #7ceaff;
+        text-decoration: underline;
+    }}
+    .active-nav {{ 
+        color: #67ffb5 !important;
+        font-weight: 700;
+        border-bottom: 2px solid #67ffb5;
+        padding-bottom: 2px;
+    }}
+    .live {{ color:#67ffb5; }}
+
+    /* Title */
+    .hero {{
+        margin: 18px 28px;
+        font-size: 28px; font-weight:700; color:#bff5ff;
+    }}
+
+    /* Glass cards */
+    .card {{
+        background: rgba(11,24,44,.75);
+        border:1px solid rgba(140,220,255,.25);
+        box-shadow: inset 0 0 0 1px rgba(255,255,255,.02), 0 0 24px rgba(0,0,0,.45);
+        border-radius: 14px;
+        padding: 16px 18px;
+        margin-bottom: 20px;
+    }}
+    .hdr {{ font-size:20px; margin-bottom:10px; color:#bff5ff; }}
+
+    /* Notifications */
+    .note  {{ background: rgba(15,80,65,.55); border-left:4px solid #4deac2; padding:10px; border-radius:8px; margin-bottom:8px; }}
+
+    /* Stats cards */
+    .stat-card {{
+        background: rgba(11,24,44,.75);
+        border:1px solid rgba(140,220,255,.25);
+        border-radius: 10px;
+        padding: 15px;
+        text-align: center;
+    }}
+    .stat-value {{ font-size: 28px; font-weight: bold; color: #7ceaff; }}
+    .stat-label {{ font-size: 14px; color: #a8edff; margin-top: 5px; }}
+
+    /* Navigation buttons */
+    .nav-btn {{
+        background: none;
+        border: none;
+        color: #a8edff;
+        font-size: 16px;
+        font-weight: 600;
+        cursor: pointer;
+        padding: 5px 10px;
+        margin-left: 20px;
+    }}
+    .nav-btn:hover {{
+        color: #7ceaff;
+        text-decoration: underline;
+    }}
+    .nav-btn.active {{
+        color: #67ffb5;
+        border-bottom: 2px solid #67ffb5;
+    }}
+
+    /* Custom button styling */
+    .stButton > button {{
+        background: rgba(11,24,44,.75);
+        border: 1px solid rgba(140,220,255,.25);
+        color: #d8f6ff;
+        border-radius: 8px;
+        transition: all 0.3s;
+    }}
+    .stButton > button:hover {{
+        background: rgba(11,24,44,.9);
+        border: 1px solid rgba(140,220,255,.5);
+        color: #7ceaff;
+    }}
+    </style>
+    <div class="veil"></div>
+    """, unsafe_allow_html=True)
+
+    lap("css emit")
+
+    # ----- HEADER / NAVBAR -----
+    now = datetime.now().strftime("%H:%M:%S")
+
+    # Create navigation using Streamlit buttons instead of pure JavaScript
+    menu = "".join(f"<span class='{'active-nav' if page.name == current_page else ''}'>{page.label}</span>"
+                   for page in nav_pages())
+    st.markdown(f"""
+    <div class="top">
+      <div class="brand">CRITICAL SPACE MONITORING</div>
+      <div class="menu">
+        {menu}
+        <span class="live">● LIVE&nbsp;{now}</span>
+      </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Create clickable navigation using columns
+    pages = nav_pages()
+    nav_cols = st.columns([2] + [1] * (len(pages) - 1) + [2])
+    for col, page in zip(nav_cols[1:], pages):
+        with col:
+            if st.button(page.label, key=f"nav_{page.name}", use_container_width=True):
+                navigate(page.name)
+
+    # Add some spacing
+    st.markdown("<br><br>", unsafe_allow_html=True)
+    lap("navbar")
+
+
+# ----- LIVE DASHBOARD PAGE -----
+def dashboard_page():
+    st.markdown(DASHBOARD_CSS, unsafe_allow_html=True)
 
+    # ----- LIVE DATA -----
+    # Only the live panel re-runs every tick; the chrome above and the sidebar
+    # below are rendered once per full rerun
+    refresh_rate = st.session_state.get("refresh_rate", 3)
+    fragment(live_panel, run_every=refresh_rate)()
+
+    lap = laps("dashboard")
     # ----- SIDEBAR -----
     with st.sidebar:
         st.markdown("### ⚙️ Dashboard Settings")
@@ -1310,8 +1253,8 @@ def dashboard_page():
 
         st.markdown("---")
 
-        # Refresh rate
-        refresh_rate = st.select_slider(
+        # Refresh rate (changing it triggers a full rerun, which reschedules the fragments)
+        st.select_slider(
             "Refresh Rate (seconds)",
             options=[1, 2, 3, 5, 10],
             value=3,
@@ -1320,11 +1263,12 @@ def dashboard_page():
 
         # Test sound button
         if st.button("🔊 Test Alarm Sound", key="test_sound"):
+            beep = load_beep()
             if beep and st.session_state.sound_allowed:
                 stamp = str(time.time())
                 st.markdown(f"""
                     <audio autoplay>
-                        <source src="data:audio/mp3;base64,{beep}#{stamp}" type="audio/mp3">
+                        <source src="{beep}#{stamp}" type="audio/mp3">
                     </audio>
                 """, unsafe_allow_html=True)
                 st.success("Test sound played!")
@@ -1333,107 +1277,28 @@ def dashboard_page():
 
         # System status
         st.markdown("### 📈 System Status")
-        total_readings = len(st.session_state.hist) if "hist" in st.session_state else 0
-        st.metric("Total Readings", f"{total_readings}")
-        st.metric("Active Alerts", f"{sum(critical_conditions)}")
+        fragment(live_status, run_every=refresh_rate)()
 
         st.markdown("---")
 
         # Quick navigation
         st.markdown("### 🚀 Quick Navigation")
-        nav_col1, nav_col2, nav_col3 = st.columns(3)
-        with nav_col1:
-            if st.button("📊", key="sidebar_dash", help="Go to Dashboard"):
-                st.session_state.current_page = "dashboard"
-                st.rerun()
-        with nav_col2:
-            if st.button("📈", key="sidebar_analytics", help="Go to Analytics"):
-                st.session_state.current_page = "analytics"
-                st.rerun()
-        with nav_col3:
-            if st.button("📋", key="sidebar_reports", help="Go to Reports"):
-                st.session_state.current_page = "reports"
-                st.rerun()
+        quick_nav("sidebar")
 
         st.markdown("---")
 
         # Logout button
         if st.button("🚪 Logout", key="logout"):
             st.session_state.logged_in = False
-            st.session_state.current_page = "dashboard"
-            st.rerun()
-
-    # ----- REFRESH -----
-    time.sleep(refresh_rate)
-    st.rerun()
+            navigate("dashboard")
+    lap("sidebar")
 
 
-# Main function to run the app
+# `streamlit run dashboard.py` serves the same app as app.py
 def main():
-    # Set page config
-    st.set_page_config(
-        page_title="Critical Space Monitoring",
-        page_icon="🚨",
-        layout="wide",
-        initial_sidebar_state="expanded"
-    )
-
-    # Check if user is logged in
-    if not st.session_state.logged_in:
-        # Show login page
-        st.markdown(f"""
-        <style>
-        .stApp {{
-            background: linear-gradient(135deg, #0a1929 0%, #0c1b2e 100%);
-        }}
-        .login-container {{
-            max-width: 400px;
-            margin: 100px auto;
-            padding: 40px;
-            background: rgba(11,24,44,.85);
-            border-radius: 20px;
-            border: 1px solid rgba(140,220,255,.25);
-            box-shadow: 0 20px 40px rgba(0,0,0,0.5);
-        }}
-        .login-title {{
-            text-align: center;
-            color: #7ceaff;
-            font-size: 28px;
-            margin-bottom: 30px;
-            font-weight: bold;
-        }}
-        </style>
-        <div class="login-container">
-            <div class="login-title">CRITICAL SPACE MONITORING</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            st.markdown("### 🔐 Login")
-            username = st.text_input("Username", key="username")
-            password = st.text_input("Password", type="password", key="password")
-
-            if st.button("Login", key="login_button", use_container_width=True):
-                if username == "admin" and password == "admin":  # Simple demo login
-                    st.session_state.logged_in = True
-                    st.session_state.current_page = "dashboard"
-                    st.rerun()
-                else:
-                    st.error("Invalid credentials")
-    else:
-        # User is logged in, show the appropriate page
-        current_page = st.session_state.get('current_page', 'dashboard')
-        if current_page == "dashboard":
-            dashboard_page()
-        elif current_page == "analytics":
-            analytics_page()
-        elif current_page == "reports":
-            reports_page()
+    run()
 
 
 # Run the app
 if __name__ == "__main__":
     main()
-
-
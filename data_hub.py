@@ -0,0 +1,192 @@
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from alert_state import AlertManager
+from anomaly import AnomalyDetector
+from decimate import method_for
+from ingestion import CHANNELS, Ingestor, make_source
+from rules import RULES
+from time_index import TimeIndex
+from tsdb import ROLLUP_TIERS, TimeSeriesStore, ms_to_datetime, pick_tier, seed_demo_history, to_ms
+
+DEFAULT_STATION = "Main Monitoring Station"
+
+# Sensor source spec (see ingestion.make_source), e.g. "sim", "udp://0.0.0.0:9999"
+SENSOR_SOURCE = os.environ.get("CSMS_SOURCE", "sim")
+
+# Live trend window (number of most recent readings plotted). Each station's
+# in-memory buffer holds that many readings plus headroom for the burst that
+# can arrive in one poll, so the anomaly pass still sees a whole batch.
+HISTORY_WINDOW = int(os.environ.get("CSMS_HISTORY_WINDOW", "20"))
+INGEST_HEADROOM = int(os.environ.get("CSMS_INGEST_HEADROOM", "4096"))
+INGEST_CAPACITY = HISTORY_WINDOW + INGEST_HEADROOM
+
+# Time-series database; an empty one is backfilled with demo history unless disabled
+DB_PATH = os.environ.get("CSMS_DB", "csms.db")
+SEED_DEMO_HISTORY = os.environ.get("CSMS_SEED_DEMO_HISTORY", "1") == "1"
+
+# Days of history per station kept in memory as a time-sorted index (see time_index.py)
+HISTORY_CACHE_DAYS = int(os.environ.get("CSMS_HISTORY_CACHE_DAYS", "31"))
+
+# Roughly how many points a full-width chart can show
+CHART_POINTS = int(os.environ.get("CSMS_CHART_POINTS", "1000"))
+
+# Seconds the anomaly detector collects batches from all stations before one pass over them
+ANOMALY_BATCH_INTERVAL = float(os.environ.get("CSMS_ANOMALY_BATCH_INTERVAL", "0.25"))
+
+
+# -------------------------------------------------
+# PROCESS-WIDE DATA HUB
+# -------------------------------------------------
+# One instance per server process (see get_hub). It owns the ingest
+# pipelines and the historical store; browser sessions only read from it,
+# so N viewers cost one pipeline and all of them see the same numbers.
+# Alert rules and the anomaly detector run here too, on every ingested
+# batch, so incidents do not depend on anyone having the dashboard open.
+# Threshold rules run on each station's ingest thread; the detector runs on
+# one thread of its own over the batches of all stations at once.
+
+class DataHub:
+    def __init__(self, db_path=DB_PATH, notify=None):
+        self._lock = threading.Lock()
+        self._ingestors = {}
+        self._indexes = {}
+        self.store = TimeSeriesStore(db_path)
+        self.alerts = AlertManager(RULES, db_path, notify=notify)
+        self.anomalies = AnomalyDetector(CHANNELS)
+        self._detect_queue = queue.SimpleQueue()
+        threading.Thread(target=self._detect_loop, name="anomaly-detector", daemon=True).start()
+        if SEED_DEMO_HISTORY and self.store.is_empty():
+            seed_demo_history(self.store, DEFAULT_STATION)
+
+    # ----- LIVE DATA -----
+    def add_station(self, station, source_spec=SENSOR_SOURCE, capacity=INGEST_CAPACITY):
+        with self._lock:
+            if station not in self._ingestors:
+                def persist(batch, station=station):
+                    self.store.write_many(station, batch)
+                    self.alerts.observe(station, batch)
+                    # The batch is the newest rows of the station's buffer, already as arrays
+                    ts, data = self._ingestors[station].buffer.snapshot(last=len(batch))
+                    self._detect_queue.put((station, ts, data.T))
+
+                ingestor = self._ingestors[station] = Ingestor(make_source(source_spec), capacity=capacity,
+                                                               sink=persist)
+                ingestor.start()
+            return self._ingestors[station]
+
+    def _detect_loop(self):
+        while True:
+            batches = [self._detect_queue.get()]
+            time.sleep(ANOMALY_BATCH_INTERVAL)
+            while not self._detect_queue.empty():
+                batches.append(self._detect_queue.get())
+            try:
+                self.alerts.observe_anomalies(*self.anomalies.observe(batches))
+            except Exception as e:
+                print(f"[anomaly] detection pass failed: {type(e).__name__}: {e}")
+
+    def ingestor(self, station=DEFAULT_STATION):
+        ing = self._ingestors.get(station)
+        return ing if ing is not None else self.add_station(station)
+
+    def stations(self):
+        return list(self._ingestors)
+
+    def live(self, station=DEFAULT_STATION):
+        """The station's RingBuffer; all of its read methods return read-only views."""
+        return self.ingestor(station).buffer
+
+    def latest(self, station=DEFAULT_STATION, wait=0.0):
+        return self.ingestor(station).latest(wait=wait)
+
+    # ----- HISTORICAL DATA -----
+    @staticmethod
+    def range_ms(start, end):
+        # Plain dates are inclusive of the whole end day
+        if not isinstance(end, datetime) and isinstance(end, date):
+            end = datetime(end.year, end.month, end.day) + timedelta(days=1) - timedelta(milliseconds=1)
+        return to_ms(start), to_ms(end)
+
+    def index(self, station=DEFAULT_STATION):
+        """The station's in-memory TimeIndex of the last HISTORY_CACHE_DAYS, caught up with the store."""
+        with self._lock:
+            idx = self._indexes.get(station)
+            now = to_ms(datetime.now())
+            if idx is None:
+                idx = self._indexes[station] = TimeIndex(retention_ms=2 * HISTORY_CACHE_DAYS * 86400 * 1000)
+                idx.append(*self.store.columns(station, now - HISTORY_CACHE_DAYS * 86400 * 1000, now))
+            else:
+                # Only rows newer than the index's last timestamp are read
+                idx.append(*self.store.columns(station, idx.last + 1 if len(idx) else 0, now))
+        return idx
+
+    def history(self, start, end, station=DEFAULT_STATION, channels=None):
+        """Stored readings between `start` and `end` (inclusive; plain dates cover the whole day).
+
+        Ranges inside the cached window are zero-copy slices of the time index;
+        anything older is read from the store.
+        """
+        start_ms, end_ms = self.range_ms(start, end)
+        idx = self.index(station)
+        if len(idx) and start_ms >= to_ms(datetime.now()) - HISTORY_CACHE_DAYS * 86400 * 1000:
+            return idx.frame(start_ms, end_ms, channels)
+        return self.store.frame(station, start_ms, end_ms, channels)
+
+    def trend(self, start, end, channels, station=DEFAULT_STATION, points=CHART_POINTS):
+        """Chart data for a range, read from the coarsest rollup tier that still fills `points`.
+
+        Returns (frame, tier) where tier is None when raw samples were used. A
+        rollup frame holds bucket means, plus "<channel> min" / "<channel> max"
+        columns for the channels drawn as min/max envelopes.
+        """
+        start_ms, end_ms = self.range_ms(start, end)
+        tier = pick_tier(start_ms, end_ms, points)
+        if tier is None:
+            return self.store.frame(station, start_ms, end_ms, channels), None
+        extremes = [ch for ch in channels if method_for(ch) == "minmax"]
+        # Neighbouring buckets are merged in SQLite, down to about `points` rows
+        width = ROLLUP_TIERS[tier]
+        step = (end_ms - start_ms) // (width * points) * width
+        return self.store.rollup_frame(station, tier, start_ms, end_ms, channels, extremes=extremes, step=step), tier
+
+    def summary(self, start, end, station=DEFAULT_STATION):
+        """stats.Summary of the range, merged from hourly/daily rollup buckets (no raw rows read)."""
+        return self.store.summary(station, *self.range_ms(start, end))
+
+    def recent_history(self, days=30, station=DEFAULT_STATION):
+        now = datetime.now()
+        return self.history(now - timedelta(days=days), now, station)
+
+    # ----- INCIDENTS -----
+    def incidents(self, start, end, station=DEFAULT_STATION):
+        """Incidents that fired in the range, one row each, with local datetimes."""
+        df = pd.DataFrame(self.alerts.history(*self.range_ms(start, end), station=station),
+                          columns=["id", "station", "rule", "state", "fired_ts", "acked_ts", "acked_by",
+                                   "resolved_ts", "peak", "notified"])
+        for col in ("fired_ts", "acked_ts", "resolved_ts"):
+            df[col] = ms_to_datetime(df[col].to_numpy(dtype="float64"))
+        return df
+
+
+def _alert_notifier():
+    # Incident notifications go through the durable outbox (None: log incidents only)
+    try:
+        import email_alert
+    except ImportError:
+        return None
+    from alert_outbox import get_outbox
+    return get_outbox(email_alert.send_email, email_alert.send_batch, email_alert.DIGEST_WINDOW).enqueue
+
+
+@st.cache_resource
+def get_hub():
+    hub = DataHub(notify=_alert_notifier())
+    hub.add_station(DEFAULT_STATION)
+    return hub
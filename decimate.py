@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+
+# Points per trace sent to the browser: about 2x the pixel width of a full-width chart
+MAX_POINTS = int(os.environ.get("CSMS_MAX_TRACE_POINTS", "2000"))
+
+# Channels whose short spikes matter more than their shape; these use min/max envelopes
+SPIKY_CHANNELS = {"PM2.5"}
+
+
+# -------------------------------------------------
+# INDEX SELECTION
+# -------------------------------------------------
+# Every reducer returns sorted integer indices into the input, so the same
+# selection can be applied to x, y and any other aligned column.
+
+def _numeric(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ms]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, points=MAX_POINTS):
+    """Largest-Triangle-Three-Buckets: keeps the visually significant points, including peaks."""
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    x = _numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+
+    out = np.empty(points, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket is the third triangle vertex
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(x, y, points=MAX_POINTS):
+    """Min and max of each bucket, in time order: an envelope that never drops a spike."""
+    n = len(y)
+    if points >= n or points < 2:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, points // 2 + 1).astype(np.int64)
+    out = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        seg = y[lo:hi]
+        out.append(lo + int(np.argmin(seg)))
+        out.append(lo + int(np.argmax(seg)))
+    return np.unique(out)
+
+
+def thin_indices(x, y, points=MAX_POINTS):
+    """For x/y scatter plots: an even stride plus the extremes of both axes."""
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    x = _numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+    stride = np.linspace(0, n - 1, points - 4).astype(np.int64)
+    extremes = [np.argmin(x), np.argmax(x), np.argmin(y), np.argmax(y)]
+    return np.unique(np.concatenate([stride, extremes]))
+
+
+# -------------------------------------------------
+# TRACE HELPERS
+# -------------------------------------------------
+
+def method_for(name):
+    return "minmax" if name in SPIKY_CHANNELS else "lttb"
+
+
+def _finite(x, y):
+    y = np.asarray(y, dtype=np.float64)
+    keep = ~np.isnan(y)
+    return np.asarray(x)[keep], y[keep]
+
+
+def decimate(x, y, points=MAX_POINTS, method="lttb"):
+    """Reduce one line series to at most ~`points` points; NaNs are dropped first."""
+    x, y = _finite(x, y)
+    pick = minmax_indices if method == "minmax" else lttb_indices
+    idx = pick(x, y, points)
+    return x[idx], y[idx]
+
+
+def envelope(x, lo, hi, points=MAX_POINTS):
+    """Min/max envelope from per-bucket extremes (e.g. rollup min/max columns): a low and a high point per bucket."""
+    lo, hi = np.asarray(lo, dtype=np.float64), np.asarray(hi, dtype=np.float64)
+    keep = ~(np.isnan(lo) | np.isnan(hi))
+    x, lo, hi = np.asarray(x)[keep], lo[keep], hi[keep]
+    if 2 * len(x) > points >= 2:
+        # More buckets than fit: merge neighbours, keeping the lowest low and the highest high
+        starts = np.unique(np.linspace(0, len(x), points // 2 + 1).astype(np.int64)[:-1])
+        x, lo, hi = x[starts], np.minimum.reduceat(lo, starts), np.maximum.reduceat(hi, starts)
+    return np.repeat(x, 2), np.column_stack([lo, hi]).ravel()
+
+
+def decimate_frame(df, x, y, points=MAX_POINTS, method=None):
+    """Rows of `df` kept by decimating column `y` against column `x` (for plotly.express)."""
+    df = df[df[y].notna()]
+    pick = {"minmax": minmax_indices, "thin": thin_indices}.get(method or method_for(y), lttb_indices)
+    return df.iloc[pick(df[x].to_numpy(), df[y].to_numpy(), points)]
+
+
+def histogram(values, bins="auto", max_bins=100):
+    """Server-side binning so a histogram ships bin counts, not every sample."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return np.empty(0), np.empty(0), np.empty(0)
+    edges = np.histogram_bin_edges(values, bins=bins)
+    if len(edges) - 1 > max_bins:
+        edges = np.histogram_bin_edges(values, bins=max_bins)
+    counts, edges = np.histogram(values, bins=edges)
+    return (edges[:-1] + edges[1:]) / 2, counts, np.diff(edges)
+
+
+def box_summary(values):
+    """Precomputed quartiles/fences for go.Box(q1=..., median=..., ...) instead of raw samples."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {}
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {
+        "q1": [q1],
+        "median": [median],
+        "q3": [q3],
+        "lowerfence": [inside.min()],
+        "upperfence": [inside.max()],
+        "mean": [values.mean()],
+    }
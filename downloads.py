@@ -0,0 +1,108 @@
+import os
+import secrets
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit
+
+import streamlit as st
+
+# Listener that streams archived reports to the browser (port 0 turns it off)
+DOWNLOAD_HOST = os.environ.get("CSMS_DOWNLOAD_HOST", "0.0.0.0")
+DOWNLOAD_PORT = int(os.environ.get("CSMS_DOWNLOAD_PORT", "0"))
+# Where browsers reach the listener, e.g. behind a reverse proxy (default: the app's host on DOWNLOAD_PORT)
+DOWNLOAD_URL = os.environ.get("CSMS_DOWNLOAD_URL", "")
+# Seconds a download link stays valid
+DOWNLOAD_TTL = float(os.environ.get("CSMS_DOWNLOAD_TTL", "300"))
+# Largest file served through st.download_button, which holds the whole file in server memory
+INLINE_DOWNLOAD_MAX_MB = float(os.environ.get("CSMS_INLINE_DOWNLOAD_MAX_MB", "50"))
+
+CHUNK = 1 << 20
+
+
+# -------------------------------------------------
+# SHORT-LIVED DOWNLOAD LINKS
+# -------------------------------------------------
+# A logged-in session that shows a download gets an unguessable token for
+# that one file, valid for DOWNLOAD_TTL seconds. The listener answers only
+# tokens it issued and streams the file from disk in CHUNK-sized writes, so
+# a large report never sits in memory. Reruns reuse a session's token for
+# the same file while it has more than half its lifetime left.
+
+class DownloadLinks:
+    def __init__(self, ttl=DOWNLOAD_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._issued = {}
+
+    def issue(self, session_id, path, file_name, mime):
+        now = time.time()
+        with self._lock:
+            self._tokens = {t: e for t, e in self._tokens.items() if e["expires"] > now}
+            token = self._issued.get((session_id, path))
+            entry = self._tokens.get(token)
+            if entry is None or entry["expires"] - now < self.ttl / 2:
+                token = secrets.token_urlsafe(24)
+                self._tokens[token] = {"path": path, "file_name": file_name, "mime": mime,
+                                       "expires": now + self.ttl}
+                self._issued = {k: t for k, t in self._issued.items() if t in self._tokens}
+                self._issued[(session_id, path)] = token
+            return token
+
+    def resolve(self, token):
+        with self._lock:
+            entry = self._tokens.get(token)
+        if entry is None or entry["expires"] <= time.time():
+            return None
+        return entry
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        entry = self.server.links.resolve(parts[1]) if len(parts) == 2 and parts[0] == "download" else None
+        try:
+            f = open(entry["path"], "rb") if entry else None
+        except OSError:
+            f = None
+        if f is None:
+            self.send_error(404)
+            return
+        with f:
+            self.send_response(200)
+            self.send_header("Content-Type", entry["mime"])
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(entry['file_name'])}")
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile, CHUNK)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def get_download_server(host=DOWNLOAD_HOST, port=DOWNLOAD_PORT):
+    """Serve download links on a daemon thread (once per process); returns the server, or None when off or unavailable."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        print(f"[downloads] cannot listen on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.links = DownloadLinks()
+    threading.Thread(target=server.serve_forever, name="downloads", daemon=True).start()
+    return server
+
+
+def download_url(server, token):
+    base = DOWNLOAD_URL
+    if not base:
+        # Same host the browser used for the app, on the listener's port
+        page = urlsplit(st.context.url or "")
+        base = f"{page.scheme or 'http'}://{page.hostname or 'localhost'}:{server.server_address[1]}"
+    return f"{base.rstrip('/')}/download/{token}"
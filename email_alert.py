@@ -1,4 +1,10 @@
+import os
 import smtplib
+import threading
+import time
+from datetime import datetime
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 # -------------------------------------------------
@@ -9,13 +15,186 @@ APP_PASSWORD = "qtfh vmme vgbq kztr"
 RECEIVER_EMAIL = "parthbhale1234@gmail.com"
 # -------------------------------------------------
 
-def send_email(subject, message):
+# Override to point at another server, e.g. a local stand-in:
+#   SMTP_HOST=localhost SMTP_PORT=1025 SMTP_SSL=0 SMTP_LOGIN=0
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "465"))
+SMTP_SSL = os.environ.get("SMTP_SSL", "1") == "1"
+SMTP_LOGIN = os.environ.get("SMTP_LOGIN", "1") == "1"
+
+# Alerts raised within this many seconds of each other go out as one digest (0 = never coalesce)
+DIGEST_WINDOW = float(os.environ.get("ALERT_DIGEST_WINDOW", "30"))
+
+# Idle session handling: NOOP every KEEPALIVE seconds, hang up after IDLE_TIMEOUT
+KEEPALIVE = float(os.environ.get("SMTP_KEEPALIVE", "30"))
+IDLE_TIMEOUT = float(os.environ.get("SMTP_IDLE_TIMEOUT", "300"))
+
+# The session itself is gone, or the server could not be reached at all (a
+# dropped or refused connection, a timeout, a failed DNS lookup - all OSError):
+# reopen it and try the message once more. Anything else (a refused recipient,
+# a rejected message, bad credentials) is the message's own failure and is
+# returned to the caller as is.
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, OSError)
+
 
-    msg = MIMEText(message)
+def _session_lost(e):
+    # SMTPException derives from OSError; of those only a disconnect means the session is gone
+    return isinstance(e, RECONNECT_ERRORS) and (
+        isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(e, smtplib.SMTPException))
+
+
+def _message(subject, body):
+    msg = MIMEText(body)
     msg["Subject"] = subject
     msg["From"] = SENDER_EMAIL
     msg["To"] = RECEIVER_EMAIL
+    return msg
+
+
+# -------------------------------------------------
+# POOLED SMTP SESSION
+# -------------------------------------------------
+# One authenticated connection is kept open and reused for every message,
+# so an incident costs one TLS handshake + login instead of one per alert.
+# A daemon thread sends NOOP while the session is idle and closes it after
+# IDLE_TIMEOUT; a dropped session is reopened transparently on next use.
+
+class SMTPPool:
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, use_ssl=SMTP_SSL, login=SMTP_LOGIN,
+                 keepalive=KEEPALIVE, idle_timeout=IDLE_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.login = login
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.connects = 0
+        self._server = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._keepalive_loop, name="smtp-keepalive", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        smtp = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = smtp(self.host, self.port, timeout=30)
+        if self.login:
+            server.login(SENDER_EMAIL, APP_PASSWORD)
+        self.connects += 1
+        return server
+
+    def _close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                # QUIT could not be exchanged; drop the socket anyway
+                self._server.close()
+            self._server = None
+
+    def _session(self):
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def _send_one(self, msg):
+        try:
+            self._session().send_message(msg)
+        except RECONNECT_ERRORS as e:
+            if not _session_lost(e):
+                raise
+            self._close()
+            self._session().send_message(msg)
+
+    def send_each(self, messages):
+        """Send every message over the pooled session; returns one result per message (None = sent, else the exception)."""
+        results = []
+        with self._lock:
+            for msg in messages:
+                try:
+                    self._send_one(msg)
+                except RECONNECT_ERRORS as e:
+                    if _session_lost(e):
+                        # Even a fresh session failed: the server is unreachable, don't retry message by message
+                        results += [e] * (len(messages) - len(results))
+                        break
+                    results.append(e)
+                else:
+                    results.append(None)
+                self._last_used = time.time()
+        return results
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-        server.login(SENDER_EMAIL, APP_PASSWORD)
-        server.send_message(msg)
+    def send(self, messages):
+        """Send all messages over the pooled session, raising the first failure."""
+        for error in self.send_each(messages):
+            if error is not None:
+                raise error
+
+    def _keepalive_loop(self):
+        while True:
+            time.sleep(self.keepalive)
+            with self._lock:
+                if self._server is None:
+                    continue
+                if time.time() - self._last_used > self.idle_timeout:
+                    self._close()
+                    continue
+                try:
+                    self._server.noop()
+                except Exception:
+                    # Reopened lazily by the next send
+                    self._close()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPPool()
+        return _pool
+
+
+def send_email(subject, message):
+    get_pool().send([_message(subject, message)])
+
+
+def send_batch(alerts):
+    """Send [(subject, message), ...] over one session; several alerts become a single digest.
+
+    Returns one result per alert (None = sent, else the exception), so an
+    outbox only retries the alerts that actually failed. A digest is one
+    message: if it fails the exception is raised for the whole batch.
+    """
+    if not alerts:
+        return []
+    if len(alerts) == 1 or DIGEST_WINDOW <= 0:
+        return get_pool().send_each([_message(subject, message) for subject, message in alerts])
+
+    subjects = ", ".join(dict.fromkeys(subject for subject, _ in alerts))
+    body = f"{len(alerts)} alerts raised (digest generated {datetime.now().strftime('%Y-%m-%d %H:%M:%S')})\n"
+    for i, (subject, message) in enumerate(alerts, 1):
+        body += f"\n{'=' * 50}\n[{i}] {subject}\n{'=' * 50}\n{message}\n"
+    get_pool().send([_message(f"CSMS ALERT DIGEST ({len(alerts)}): {subjects}", body)])
+    return [None] * len(alerts)
+
+
+def send_report(subject, body, path, filename, recipients=None):
+    """Send a generated report file as an attachment over the pooled session."""
+    msg = MIMEMultipart()
+    msg["Subject"] = subject
+    msg["From"] = SENDER_EMAIL
+    msg["To"] = ", ".join(recipients) if recipients else RECEIVER_EMAIL
+    msg.attach(MIMEText(body))
+    with open(path, "rb") as f:
+        part = MIMEApplication(f.read(), Name=filename)
+    part["Content-Disposition"] = f'attachment; filename="{filename}"'
+    msg.attach(part)
+    get_pool().send([msg])
@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+
+from tsdb import ms_to_datetime
+
+HOUR_MS = 3600 * 1000
+
+# Time span read from the store per chunk; peak memory is one chunk of one station
+CHUNK_HOURS = int(os.environ.get("CSMS_EXPORT_CHUNK_HOURS", "24"))
+# Default codec for Parquet / Arrow files ("zstd", "lz4", "snappy" (Parquet only) or "none")
+COMPRESSION = os.environ.get("CSMS_EXPORT_COMPRESSION", "zstd")
+
+# format -> (extension, mime type)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+# -------------------------------------------------
+# CHUNKED READS
+# -------------------------------------------------
+# An export walks the range in CHUNK_HOURS windows and, within each window,
+# one station at a time. Each chunk is read straight from the time-series
+# store and written out before the next one is read, so exporting a year of
+# several stations holds one window of one station in memory at a time.
+
+def export_columns(store, stations, channels=None):
+    """The exported channels: `channels` as given, else every channel of the stations in first-seen order."""
+    if channels:
+        return list(channels)
+    return list(dict.fromkeys(ch for station in stations for ch in store.channels(station)))
+
+
+def iter_chunks(store, stations, start_ms, end_ms, channels, chunk_ms=CHUNK_HOURS * HOUR_MS):
+    """Yield (station, ts int64 array, {channel: float64 array}) chunks in time order; empty chunks are skipped."""
+    for lo in range(int(start_ms), int(end_ms) + 1, chunk_ms):
+        hi = min(lo + chunk_ms - 1, int(end_ms))
+        for station in stations:
+            ts, cols = store.columns(station, lo, hi, channels)
+            if len(ts):
+                yield station, ts, cols
+
+
+# -------------------------------------------------
+# WRITERS
+# -------------------------------------------------
+# Every format has the same columns: Date (local time), Station, then one
+# float column per exported channel (projection: only those are read).
+# Parquet and Arrow write one record batch / row group per chunk.
+
+def _frame(station, ts, cols, channels):
+    import pandas as pd
+
+    data = {"Date": ms_to_datetime(ts), "Station": station}
+    data.update({ch: cols.get(ch, np.full(len(ts), np.nan)) for ch in channels})
+    return pd.DataFrame(data)
+
+
+def _write_csv(chunks, channels, path, compression):
+    import pandas as pd
+
+    with open(path, "w", newline="") as f:
+        pd.DataFrame(columns=["Date", "Station"] + channels).to_csv(f, index=False)
+        for station, ts, cols in chunks:
+            _frame(station, ts, cols, channels).to_csv(f, header=False, index=False)
+
+
+def _arrow_schema(pa, channels):
+    return pa.schema([("Date", pa.timestamp("ms")), ("Station", pa.string())] +
+                     [(ch, pa.float64()) for ch in channels])
+
+
+def _arrow_table(pa, schema, station, ts, cols, channels):
+    # Built from the arrays directly; NaN (channel missing at that time) is written as null
+    date = ms_to_datetime(ts).to_numpy().astype("datetime64[ms]")
+    arrays = [pa.array(date, pa.timestamp("ms")), pa.repeat(pa.scalar(station, pa.string()), len(ts))]
+    arrays += [pa.array(cols[ch], pa.float64(), from_pandas=True) if ch in cols else pa.nulls(len(ts), pa.float64())
+               for ch in channels]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Parquet / Arrow export needs pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _write_parquet(chunks, channels, path, compression):
+    pa = _pyarrow()
+    schema = _arrow_schema(pa, channels)
+    with pa.parquet.ParquetWriter(path, schema, compression=None if compression == "none" else compression) as writer:
+        for station, ts, cols in chunks:
+            writer.write_table(_arrow_table(pa, schema, station, ts, cols, channels))
+
+
+def _write_arrow(chunks, channels, path, compression):
+    pa = _pyarrow()
+    schema = _arrow_schema(pa, channels)
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        for station, ts, cols in chunks:
+            writer.write_table(_arrow_table(pa, schema, station, ts, cols, channels))
+
+
+WRITERS = {"csv": _write_csv, "parquet": _write_parquet, "arrow": _write_arrow}
+
+
+def write_export(store, fmt, path, stations, start_ms, end_ms, channels=None, compression=COMPRESSION,
+                 progress=None):
+    """Stream the range for `stations` into `path` as csv / parquet / arrow; returns the rows written."""
+    if fmt not in WRITERS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    channels = export_columns(store, stations, channels)
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for chunk in iter_chunks(store, stations, start_ms, end_ms, channels):
+            rows += len(chunk[1])
+            yield chunk
+            if progress is not None:
+                progress(min((int(chunk[1][-1]) - start_ms) / max(end_ms - start_ms, 1), 1.0), f"{rows:,} rows")
+
+    WRITERS[fmt](counted(), channels, path, compression)
+    return rows
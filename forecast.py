@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import streamlit as st
+
+from data_hub import DEFAULT_STATION, get_hub
+
+HOUR_MS = 3600 * 1000
+
+# Longest horizon offered on the Analytics page (hours); shorter ones are slices of it
+MAX_HORIZON = 24
+# Hourly averages the models are trained on
+TRAINING_DAYS = int(os.environ.get("CSMS_FORECAST_TRAINING_DAYS", "14"))
+# Seconds between scheduled refits, and worker processes doing them
+REFIT_INTERVAL = float(os.environ.get("CSMS_FORECAST_REFIT", "900"))
+WORKERS = int(os.environ.get("CSMS_FORECAST_WORKERS", "2"))
+
+FORECAST_CHANNELS = ["Temperature", "Humidity", "Pressure", "PM2.5", "CO2", "Noise"]
+
+
+# -------------------------------------------------
+# MODEL FITTING (runs in worker processes)
+# -------------------------------------------------
+# Additive ETS (Holt-Winters) with a damped trend and a daily season on
+# hourly means; without two full days of history the season is dropped.
+# Prediction intervals come from the model's own state-space form.
+
+def fit_forecast(ts, values, horizon=MAX_HORIZON, start_params=None, level=0.95):
+    """Fit one channel and forecast `horizon` hours past the last bucket.
+
+    `ts` are hourly bucket starts (epoch ms), `values` the hourly means; gaps
+    are filled by interpolation. Returns a dict of plain arrays (picklable).
+    """
+    import pandas as pd
+    from statsmodels.tsa.exponential_smoothing.ets import ETSModel
+
+    grid = np.arange(ts[0], ts[-1] + 1, HOUR_MS, dtype=np.int64)
+    y = pd.Series(np.interp(grid, ts, values))
+    seasonal = "add" if len(y) >= 2 * 24 else None
+    model = ETSModel(y, error="add", trend="add", damped_trend=True,
+                     seasonal=seasonal, seasonal_periods=24 if seasonal else None)
+    try:
+        fit = model.fit(start_params=start_params, disp=False)
+    except Exception:
+        # A stale warm start (e.g. the season was just switched on) -> fit from scratch
+        fit = model.fit(disp=False)
+
+    pred = fit.get_prediction(start=len(y), end=len(y) + horizon - 1).summary_frame(alpha=1 - level)
+    return {
+        "ts": grid[-1] + HOUR_MS * np.arange(1, horizon + 1, dtype=np.int64),
+        "mean": pred["mean"].to_numpy(),
+        "lower": pred["pi_lower"].to_numpy(),
+        "upper": pred["pi_upper"].to_numpy(),
+        "params": np.asarray(fit.params),
+        "seasonal": seasonal is not None,
+        "trained_to": int(grid[-1]),
+        "aic": float(fit.aic),
+    }
+
+
+# -------------------------------------------------
+# FORECAST SERVICE
+# -------------------------------------------------
+# Fitted forecasts are cached per (station, channel). A scheduler thread
+# submits refits to a process pool every REFIT_INTERVAL seconds, but only for
+# channels whose hourly rollup has gained a new bucket; refits are warm-started
+# from the previous parameters. Pages only ever read the cache.
+
+class ForecastService:
+    def __init__(self, store, stations=(DEFAULT_STATION,), channels=FORECAST_CHANNELS,
+                 refit_interval=REFIT_INTERVAL, workers=WORKERS):
+        self.store = store
+        self.stations = list(stations)
+        self.channels = list(channels)
+        self.refit_interval = refit_interval
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._running = {}
+        self._errors = {}
+        # spawn: forking a process that runs Streamlit's threads is not safe
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="forecast-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refit_interval)
+
+    def refresh(self):
+        """Submit refits for every channel with new hourly data; returns the number submitted."""
+        now = int(time.time() * 1000)
+        start = now - TRAINING_DAYS * 24 * HOUR_MS
+        submitted = 0
+        for station in self.stations:
+            for channel in self.channels:
+                key = (station, channel)
+                with self._lock:
+                    if key in self._running:
+                        continue
+                    cached = self._cache.get(key)
+
+                # Complete hours only: the current bucket is still filling
+                rows = self.store.rollup_range(station, channel, "1h", start, now - HOUR_MS)
+                ok = rows["count"] > 0
+                ts, values = rows["ts"][ok], rows["mean"][ok]
+                if len(ts) < 12:
+                    continue
+                if cached is not None and cached["trained_to"] >= ts[-1]:
+                    continue
+
+                params = cached["params"] if cached is not None and cached["seasonal"] == (len(ts) >= 48) else None
+                future = self._pool.submit(fit_forecast, ts, values, MAX_HORIZON, params)
+                with self._lock:
+                    self._running[key] = future
+                future.add_done_callback(lambda f, key=key: self._done(key, f))
+                submitted += 1
+        return submitted
+
+    def _done(self, key, future):
+        with self._lock:
+            self._running.pop(key, None)
+            try:
+                result = future.result()
+            except Exception as e:
+                self._errors[key] = f"{type(e).__name__}: {e}"
+                return
+            result["fitted_at"] = time.time()
+            self._cache[key] = result
+            self._errors.pop(key, None)
+
+    def get(self, channel, station=DEFAULT_STATION, horizon=MAX_HORIZON):
+        """Cached forecast sliced to `horizon` hours, or None while the first fit is still running."""
+        with self._lock:
+            result = self._cache.get((station, channel))
+        if result is None:
+            return None
+        horizon = max(1, min(int(horizon), len(result["ts"])))
+        out = {k: result[k][:horizon] for k in ("ts", "mean", "lower", "upper")}
+        out.update(fitted_at=result["fitted_at"], trained_to=result["trained_to"], seasonal=result["seasonal"])
+        return out
+
+    def error(self, channel, station=DEFAULT_STATION):
+        with self._lock:
+            return self._errors.get((station, channel))
+
+
+@st.cache_resource
+def get_forecaster():
+    # One scheduler + process pool per server process
+    return ForecastService(get_hub().store).start()
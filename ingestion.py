@@ -0,0 +1,458 @@
+import json
+import os
+import random
+import selectors
+import socket
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+from metrics import counter, histogram
+from ring_buffer import RingBuffer
+
+# Full channel set produced by every source, in buffer column order
+CHANNELS = ["Temperature", "Humidity", "Pressure", "PM2.5", "CO2", "Noise"]
+
+# Value ranges of the demo station (same as the old random read())
+SIM_RANGES = {
+    "Temperature": (22, 36),
+    "Humidity": (40, 75),
+    "Pressure": (980, 1025),
+    "PM2.5": (10, 80),
+    "CO2": (400, 1500),
+    "Noise": (25, 85),
+}
+
+
+# Ingest lag: age of the oldest reading in a batch when it reaches the buffer (seconds)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+INGESTED = counter("csms_ingest_readings_total", "Readings received from the sensor sources", ["source"])
+INGEST_ERRORS = counter("csms_ingest_errors_total", "Source failures (the source is reopened after each)", ["source"])
+INGEST_LAG = histogram("csms_ingest_lag_seconds", "Age of the oldest reading of a batch when it was ingested",
+                       ["source"], buckets=LAG_BUCKETS)
+INGEST_SINK_ERRORS = counter("csms_ingest_sink_errors_total",
+                             "Batches the sink failed to persist or check (the source stays open)", ["source"])
+INGEST_SINK = histogram("csms_ingest_sink_seconds", "Time to persist a batch and run the alert rules on it",
+                        ["source"])
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+# -------------------------------------------------
+# LINE PROTOCOL
+# -------------------------------------------------
+# One reading per line, either JSON
+#     {"ts": 1700000000000, "Temperature": 24.1, "CO2": 612}
+# or comma/space separated key=value pairs
+#     ts=1700000000000,Temperature=24.1,CO2=612
+# `ts` (epoch ms) is optional and defaults to the receive time.
+
+def parse_line(line):
+    """Parse one line into (ts_ms, {channel: value}); returns None for junk."""
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", "replace")
+    line = line.strip()
+    if not line:
+        return None
+
+    try:
+        if line.startswith("{"):
+            fields = json.loads(line)
+        else:
+            fields = dict(part.split("=", 1) for part in line.replace(" ", ",").split(",") if "=" in part)
+        ts = int(float(fields.pop("ts", now_ms())))
+        values = {k: float(v) for k, v in fields.items() if k in SIM_RANGES}
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+    if not values:
+        return None
+    return ts, values
+
+
+def parse_lines(data):
+    out = []
+    for line in data.splitlines():
+        reading = parse_line(line)
+        if reading is not None:
+            out.append(reading)
+    return out
+
+
+# -------------------------------------------------
+# SOURCES
+# -------------------------------------------------
+# A source is anything with open(), poll(timeout) -> [(ts_ms, values), ...]
+# and close(). poll() must return within roughly `timeout` seconds so the
+# ingest thread can notice a stop request.
+
+class Source:
+    name = "source"
+
+    def open(self):
+        pass
+
+    def poll(self, timeout):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SimulatorSource(Source):
+    """Seeded random readings in the demo station's value ranges."""
+    name = "simulator"
+
+    def __init__(self, rate_hz=1.0, seed=None):
+        self.period = 1.0 / float(rate_hz)
+        self.rng = random.Random(seed)
+        self._next = None
+
+    def reading(self):
+        return {ch: round(self.rng.uniform(lo, hi), 1) for ch, (lo, hi) in SIM_RANGES.items()}
+
+    def open(self):
+        self._next = time.time()
+
+    def poll(self, timeout):
+        now = time.time()
+        if now < self._next:
+            time.sleep(min(timeout, self._next - now))
+            now = time.time()
+
+        out = []
+        # Catch up on ticks missed while the thread was descheduled, but never
+        # more than one second's worth
+        limit = max(1, int(1.0 / self.period))
+        while self._next <= now and len(out) < limit:
+            out.append((int(self._next * 1000), self.reading()))
+            self._next += self.period
+        if self._next <= now:
+            self._next = now + self.period
+        return out
+
+
+class UDPSource(Source):
+    """Line-protocol datagrams; one datagram may carry several lines."""
+    name = "udp"
+
+    def __init__(self, host="0.0.0.0", port=9999):
+        self.addr = (host, int(port))
+        self.sock = None
+
+    def open(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(self.addr)
+
+    def poll(self, timeout):
+        self.sock.settimeout(timeout)
+        out = []
+        try:
+            data, _ = self.sock.recvfrom(65535)
+        except socket.timeout:
+            return out
+        out.extend(parse_lines(data))
+
+        # Drain whatever else is already queued without blocking
+        self.sock.setblocking(False)
+        try:
+            while True:
+                data, _ = self.sock.recvfrom(65535)
+                out.extend(parse_lines(data))
+        except (BlockingIOError, socket.timeout):
+            pass
+        return out
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+
+class TCPSource(Source):
+    """Line-protocol server; any number of clients may connect and stream lines."""
+    name = "tcp"
+
+    def __init__(self, host="0.0.0.0", port=9998):
+        self.addr = (host, int(port))
+        self.sel = None
+        self.server = None
+        self.partial = {}
+
+    def open(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.addr)
+        self.server.listen()
+        self.server.setblocking(False)
+        self.sel = selectors.DefaultSelector()
+        self.sel.register(self.server, selectors.EVENT_READ)
+
+    def _drop(self, conn):
+        self.sel.unregister(conn)
+        self.partial.pop(conn, None)
+        conn.close()
+
+    def poll(self, timeout):
+        out = []
+        for key, _ in self.sel.select(timeout):
+            sock = key.fileobj
+            if sock is self.server:
+                conn, _ = self.server.accept()
+                conn.setblocking(False)
+                self.sel.register(conn, selectors.EVENT_READ)
+                self.partial[conn] = b""
+                continue
+
+            try:
+                chunk = sock.recv(65536)
+            except (BlockingIOError, ConnectionError):
+                chunk = b""
+            if not chunk:
+                self._drop(sock)
+                continue
+
+            data = self.partial[sock] + chunk
+            data, _, rest = data.rpartition(b"\n")
+            self.partial[sock] = rest
+            out.extend(parse_lines(data))
+        return out
+
+    def close(self):
+        if self.sel:
+            for conn in list(self.partial):
+                self._drop(conn)
+            self.sel.close()
+            self.sel = None
+        if self.server:
+            self.server.close()
+            self.server = None
+
+
+class SerialSource(Source):
+    """Line protocol from a serial port or pty. Uses pyserial when installed, else reads the device node directly."""
+    name = "serial"
+
+    def __init__(self, device, baudrate=9600):
+        self.device = device
+        self.baudrate = int(baudrate)
+        self.port = None
+        self.fd = None
+        self.partial = b""
+
+    def open(self):
+        try:
+            import serial
+            self.port = serial.Serial(self.device, self.baudrate, timeout=0)
+        except ImportError:
+            # Plain ptys and pre-configured ttys work without pyserial
+            self.fd = os.open(self.device, os.O_RDONLY | os.O_NONBLOCK | os.O_NOCTTY)
+
+    def _read(self, timeout):
+        if self.port is not None:
+            deadline = time.time() + timeout
+            while True:
+                chunk = self.port.read(self.port.in_waiting or 1)
+                if chunk or time.time() >= deadline:
+                    return chunk
+                time.sleep(0.01)
+
+        sel = selectors.DefaultSelector()
+        sel.register(self.fd, selectors.EVENT_READ)
+        try:
+            if not sel.select(timeout):
+                return b""
+        finally:
+            sel.close()
+        try:
+            return os.read(self.fd, 65536)
+        except BlockingIOError:
+            return b""
+
+    def poll(self, timeout):
+        chunk = self._read(timeout)
+        if not chunk:
+            return []
+        data, _, self.partial = (self.partial + chunk).rpartition(b"\n")
+        return parse_lines(data)
+
+    def close(self):
+        if self.port is not None:
+            self.port.close()
+            self.port = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class FileTailSource(Source):
+    """Follows a growing line-protocol file (tail -F), reopening it after rotation."""
+    name = "file"
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.from_start = from_start
+        self.f = None
+        self.inode = None
+        self.partial = b""
+
+    def _reopen(self, seek_end):
+        if self.f:
+            self.f.close()
+        self.f = open(self.path, "rb")
+        self.inode = os.fstat(self.f.fileno()).st_ino
+        if seek_end:
+            self.f.seek(0, os.SEEK_END)
+        self.partial = b""
+
+    def open(self):
+        self._reopen(seek_end=not self.from_start)
+
+    def _rotated(self):
+        try:
+            st_ = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return st_.st_ino != self.inode or st_.st_size < self.f.tell()
+
+    def poll(self, timeout):
+        chunk = self.f.read()
+        if not chunk:
+            if self._rotated():
+                self._reopen(seek_end=False)
+            else:
+                time.sleep(timeout)
+            return []
+        data, _, self.partial = (self.partial + chunk).rpartition(b"\n")
+        return parse_lines(data)
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.f = None
+
+
+def make_source(spec):
+    """Build a source from a spec string such as
+
+        sim                      sim?rate=100&seed=7
+        udp://0.0.0.0:9999       tcp://0.0.0.0:9998
+        serial:///dev/ttyUSB0?baud=115200
+        file:///var/log/station.log
+    """
+    url = urlparse(spec)
+    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    scheme = url.scheme or url.path
+
+    if scheme in ("sim", "simulator"):
+        seed = query.get("seed")
+        return SimulatorSource(rate_hz=float(query.get("rate", 1.0)),
+                               seed=int(seed) if seed is not None else None)
+    if scheme == "udp":
+        return UDPSource(url.hostname or "0.0.0.0", url.port or 9999)
+    if scheme == "tcp":
+        return TCPSource(url.hostname or "0.0.0.0", url.port or 9998)
+    if scheme == "serial":
+        return SerialSource(url.path, query.get("baud", 9600))
+    if scheme == "file":
+        return FileTailSource(url.path, from_start=query.get("from_start") == "1")
+    raise ValueError(f"Unknown sensor source: {spec}")
+
+
+# -------------------------------------------------
+# INGEST THREAD
+# -------------------------------------------------
+
+class Ingestor:
+    """Runs one source on a daemon thread and publishes every reading into a shared RingBuffer.
+
+    `sink`, if given, is called with each polled batch [(ts_ms, values), ...]
+    (used to persist readings). A sink failure is logged and counted but is
+    not the source's fault, so the source is kept open; only source errors
+    close and reopen it.
+    """
+
+    def __init__(self, source, capacity=10000, buffer=None, sink=None):
+        self.source = source
+        self.buffer = buffer if buffer is not None else RingBuffer(CHANNELS, capacity=capacity)
+        self.sink = sink
+        self.received = 0
+        self.errors = 0
+        self.last_error = None
+        self.sink_errors = 0
+        self.last_sink_error = None
+        self._first = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._ingested = INGESTED.labels(source.name)
+        self._errors = INGEST_ERRORS.labels(source.name)
+        self._lag = INGEST_LAG.labels(source.name)
+        self._sink_time = INGEST_SINK.labels(source.name)
+        self._sink_errors = INGEST_SINK_ERRORS.labels(source.name)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"ingest-{self.source.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.source.open()
+                while not self._stop.is_set():
+                    batch = self.source.poll(0.5)
+                    for ts, values in batch:
+                        self.buffer.append(values, ts)
+                        self.received += 1
+                        self._first.set()
+                    if not batch:
+                        continue
+                    self._ingested.inc(len(batch))
+                    self._lag.observe(max(0.0, time.time() - min(ts for ts, _ in batch) / 1000))
+                    if self.sink is not None:
+                        self._deliver(batch)
+            except Exception as e:
+                self.errors += 1
+                self._errors.inc()
+                self.last_error = e
+                # Back off before reopening a broken socket/port/file
+                self._stop.wait(1.0)
+            finally:
+                try:
+                    self.source.close()
+                except Exception:
+                    pass
+
+    def _deliver(self, batch):
+        started = time.perf_counter()
+        try:
+            self.sink(batch)
+        except Exception as e:
+            self.sink_errors += 1
+            self._sink_errors.inc()
+            self.last_sink_error = e
+            print(f"[ingest] {self.source.name}: sink failed on {len(batch)} readings: {type(e).__name__}: {e}")
+            return
+        self._sink_time.observe(time.perf_counter() - started)
+
+    def latest(self, wait=0.0):
+        """Latest reading as a dict (None if nothing arrived within `wait` seconds)."""
+        if wait and not self._first.is_set():
+            self._first.wait(wait)
+        return self.buffer.latest()
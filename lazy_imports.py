@@ -0,0 +1,143 @@
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import types
+
+# Modules the dashboard needs after login, imported in the background while the login page is up
+PRELOAD = ("numpy", "pandas", "plotly.graph_objects", "plotly.express", "data_hub", "forecast", "reports",
+           "report_scheduler")
+
+# Cold-start import budgets (seconds, fresh interpreter) checked by `python lazy_imports.py`
+LOGIN_IMPORT_BUDGET = float(os.environ.get("CSMS_LOGIN_IMPORT_BUDGET", "1.5"))
+DASHBOARD_IMPORT_BUDGET = float(os.environ.get("CSMS_DASHBOARD_IMPORT_BUDGET", "4.0"))
+
+# What a fresh server process imports before the login page renders: app.py -> router.py, then the page module
+LOGIN_CHAIN = "app, login"
+
+# Must not be loaded by the login page (beyond what Streamlit itself loads)
+HEAVY = ("numpy", "pandas", "plotly.express", "matplotlib", "statsmodels", "reportlab", "openpyxl", "pyarrow")
+
+
+# -------------------------------------------------
+# LAZY MODULES
+# -------------------------------------------------
+# lazy_import("plotly.express") returns a stand-in that imports the real
+# module on first attribute access, so `px = lazy_import(...)` at the top of
+# a page module costs nothing until a chart is actually drawn. importlib's
+# per-module locks make the first access safe from several threads.
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = self.__dict__["_module"] = importlib.import_module(self.__name__)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    return sys.modules.get(name) or LazyModule(name)
+
+
+# -------------------------------------------------
+# BACKGROUND PRELOAD
+# -------------------------------------------------
+# preload() imports PRELOAD on a daemon thread, once per process, and then
+# runs `then` (e.g. starting process-wide services). The page that called it
+# has already been sent, so the work overlaps with the user signing in
+# instead of delaying the first paint.
+
+_preload_lock = threading.Lock()
+_preload_thread = None
+preloaded = threading.Event()
+
+
+def _preload(modules, then):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"[preload] {name}: {type(e).__name__}: {e}")
+    try:
+        if then is not None:
+            then()
+    finally:
+        preloaded.set()
+
+
+def preload(modules=PRELOAD, then=None):
+    global _preload_thread
+    with _preload_lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=_preload, args=(modules, then), name="preload", daemon=True)
+            _preload_thread.start()
+
+
+# -------------------------------------------------
+# IMPORT-TIME BUDGET
+# -------------------------------------------------
+# Cold start is measured in a fresh interpreter (nothing cached in
+# sys.modules), best of a few runs to ride out disk and CPU noise.
+
+_PROBE = """
+import sys, time
+t = time.perf_counter()
+import streamlit
+base = set(sys.modules)
+import {module}
+print(time.perf_counter() - t)
+print(" ".join(sorted(set(sys.modules) - base)))
+"""
+
+
+def import_cost(module, runs=3):
+    """(seconds to import streamlit + `module`, modules `module` added) in a fresh interpreter.
+
+    `module` may list several, e.g. LOGIN_CHAIN.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, added = None, []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)], cwd=here, capture_output=True,
+                             text=True, check=True).stdout.split("\n")
+        seconds = float(out[0])
+        if best is None or seconds < best:
+            best, added = seconds, out[1].split()
+    return best, added
+
+
+def check_budget():
+    """Print the cold-start import costs; returns False if a budget is exceeded."""
+    ok = True
+    seconds, added = import_cost(LOGIN_CHAIN)
+    heavy = [h for h in HEAVY if h in added]
+    print(f"login:     {seconds:.2f}s (budget {LOGIN_IMPORT_BUDGET:.2f}s)")
+    if seconds > LOGIN_IMPORT_BUDGET:
+        ok = False
+        print("  over budget")
+    if heavy:
+        ok = False
+        print(f"  login page loads heavy modules: {', '.join(heavy)}")
+
+    seconds, _ = import_cost("dashboard")
+    print(f"dashboard: {seconds:.2f}s (budget {DASHBOARD_IMPORT_BUDGET:.2f}s)")
+    if seconds > DASHBOARD_IMPORT_BUDGET:
+        ok = False
+        print("  over budget")
+    return ok
+
+
+if __name__ == "__main__":
+    # Run after a deploy / in CI: exits non-zero when cold start regresses
+    sys.exit(0 if check_budget() else 1)
@@ -1,21 +1,22 @@
 import streamlit as st
 from datetime import datetime
-import base64
 import time
 import json
 from streamlit.components.v1 import html
 
+from assets import asset_url, data_uri
+
 
 def play_sound(file):
-    try:
-        with open(file, "rb") as f:
-            sound = base64.b64encode(f.read()).decode()
+    # Encoded once per process; components.html renders in an iframe, so inline it
+    sound = data_uri(file, "audio/mp3")
+    if sound:
         html(f"""
         <audio autoplay>
-            <source src="data:audio/mp3;base64,{sound}" type="audio/mp3">
+            <source src="{sound}" type="audio/mp3">
         </audio>
         """, height=0)
-    except:
+    else:
         # Fallback sound using Web Audio API
         html("""
         <script>
@@ -385,18 +386,15 @@ def login_page():
     col1, col2, col3 = st.columns([1, 2, 1])
 
     with col2:
-        # Load logo - try different methods
+        # Load logo - try different names; served from the static asset cache
         logo_html = ""
-        logo_paths = ["logo.png", "Logo.png", "LOGO.png", "./logo.png"]
+        logo_paths = ["logo.png", "Logo.png", "LOGO.png"]
 
         for path in logo_paths:
-            try:
-                with open(path, "rb") as f:
-                    logo_data = base64.b64encode(f.read()).decode()
-                logo_html = f'<img src="data:image/png;base64,{logo_data}" alt="CSMS Logo">'
+            logo_url = asset_url(path)
+            if logo_url:
+                logo_html = f'<img src="{logo_url}" alt="CSMS Logo">'
                 break
-            except:
-                continue
 
         if not logo_html:
             # Fallback if no logo found
@@ -502,151 +500,8 @@ def login_page():
         """, unsafe_allow_html=True)
 
 
-# ====================
-# DASHBOARD PAGE
-# ====================
-
-def dashboard_page():
-    """Main dashboard after successful login"""
-    st.markdown("""
-    <style>
-    .stApp {
-        background: linear-gradient(135deg, #0a0e17 0%, #121828 100%);
-    }
-
-    .dashboard-header {
-        background: linear-gradient(90deg, #00ccff, #0066ff);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        padding: 20px 0;
-        border-bottom: 1px solid rgba(0, 150, 255, 0.2);
-        margin-bottom: 30px;
-    }
-
-    .metric-card {
-        background: rgba(10, 14, 23, 0.8);
-        border: 1px solid rgba(0, 150, 255, 0.2);
-        border-radius: 12px;
-        padding: 20px;
-        margin: 10px 0;
-    }
-
-    .logout-btn {
-        background: linear-gradient(90deg, #ff6b6b, #ff8e53) !important;
-        border: none !important;
-        border-radius: 8px !important;
-        padding: 12px 24px !important;
-        color: white !important;
-        font-weight: 600 !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    # Header with logout button
-    col1, col2, col3 = st.columns([3, 1, 1])
-    with col1:
-        st.markdown(f'<h1 class="dashboard-header">🚀 Welcome to CSMS, {st.session_state.username}!</h1>',
-                    unsafe_allow_html=True)
-    with col3:
-        if st.button("Logout", type="primary", use_container_width=True):
-            st.session_state.logged_in = False
-            st.rerun()
-
-    # Success message
-    st.success("✅ You have successfully logged into the Critical Space Monitoring System.")
-
-    # System metrics
-    st.markdown("### 📊 System Overview")
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        st.markdown("""
-        <div class="metric-card">
-            <h3 style="color:#00ccff; margin:0;">System Status</h3>
-            <h1 style="color:#00ff88; margin:10px 0;">🟢 ACTIVE</h1>
-            <p style="color:#8892b0; margin:0; font-size:12px;">All systems operational</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col2:
-        st.markdown("""
-        <div class="metric-card">
-            <h3 style="color:#00ccff; margin:0;">Security Level</h3>
-            <h1 style="color:#00ff88; margin:10px 0;">MAXIMUM</h1>
-            <p style="color:#8892b0; margin:0; font-size:12px;">Biometric verified</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col3:
-        st.markdown("""
-        <div class="metric-card">
-            <h3 style="color:#00ccff; margin:0;">CPU Usage</h3>
-            <h1 style="color:#00ccff; margin:10px 0;">42%</h1>
-            <p style="color:#8892b0; margin:0; font-size:12px;">Normal operation</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col4:
-        st.markdown("""
-        <div class="metric-card">
-            <h3 style="color:#00ccff; margin:0;">Memory</h3>
-            <h1 style="color:#00ccff; margin:10px 0;">78%</h1>
-            <p style="color:#8892b0; margin:0; font-size:12px;">Optimal</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    st.markdown("---")
-
-    # Quick Actions
-    st.markdown("### ⚡ Quick Actions")
-    col1, col2, col3 = st.columns(3)
-
-    with col1:
-        if st.button("📊 View Detailed Metrics", use_container_width=True):
-            st.info("Detailed system metrics would appear here")
-
-    with col2:
-        if st.button("🔒 Security Dashboard", use_container_width=True):
-            st.info("Security dashboard would appear here")
-
-    with col3:
-        if st.button("📋 Generate Report", use_container_width=True):
-            st.info("Report generation would start here")
-
-    # Recent Activity
-    st.markdown("---")
-    st.markdown("### 📈 Recent Activity")
-
-    activity_data = [
-        {"time": "10:30 AM", "event": "Biometric Login", "user": "admin", "status": "✅ Success"},
-        {"time": "10:25 AM", "event": "System Check", "user": "system", "status": "✅ Completed"},
-        {"time": "10:15 AM", "event": "Database Backup", "user": "system", "status": "✅ Completed"},
-        {"time": "09:45 AM", "event": "Network Scan", "user": "security", "status": "✅ No threats"},
-    ]
-
-    for activity in activity_data:
-        col1, col2, col3, col4 = st.columns([2, 3, 2, 2])
-        with col1:
-            st.write(f"🕒 {activity['time']}")
-        with col2:
-            st.write(f"**{activity['event']}**")
-        with col3:
-            st.write(activity['user'])
-        with col4:
-            st.write(f"{activity['status']}")
-
-
-# Main app logic
+# `streamlit run login.py` starts the full app (session setup, routing) like app.py
 if __name__ == "__main__":
-    # Initialize session state
-    if "logged_in" not in st.session_state:
-        st.session_state.logged_in = False
-    if "username" not in st.session_state:
-        st.session_state.username = ""
-
-    # Display appropriate page
-    if not st.session_state.logged_in:
-        login_page()
-    else:
-        dashboard_page()
+    import router
 
+    router.run()
@@ -0,0 +1,326 @@
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+# Local listener serving /metrics in the Prometheus text format (port 0 turns it off)
+METRICS_HOST = os.environ.get("CSMS_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("CSMS_METRICS_PORT", "9464"))
+
+# Default histogram bucket upper bounds (seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# -------------------------------------------------
+# PER-THREAD ACCUMULATION
+# -------------------------------------------------
+# Counters and histograms are hit from the ingest threads on every batch, so
+# an update must not take a lock. Each thread writes only to its own list of
+# values (created on its first update); a scrape sums the lists. Lists of
+# threads that have exited are folded into one retired total, so the number
+# of lists stays bounded by the live threads however many script-run
+# threads Streamlit starts and drops.
+
+class _Shards:
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []
+        self._retired = [0.0] * size
+
+    def values(self):
+        """The calling thread's own value list."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = [0.0] * self._size
+            with self._lock:
+                self._live.append((threading.current_thread(), values))
+            return values
+
+    def total(self):
+        with self._lock:
+            live = []
+            for thread, values in self._live:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    # The thread is gone and cannot write again
+                    self._retired = [a + b for a, b in zip(self._retired, values)]
+            self._live = live
+            total = list(self._retired)
+            for _, values in live:
+                total = [a + b for a, b in zip(total, values)]
+        return total
+
+
+# -------------------------------------------------
+# METRIC TYPES
+# -------------------------------------------------
+# A metric is a family of children, one per combination of label values
+# (`INGESTED.labels("udp").inc(5)`); a metric without labels is used
+# directly (`ENQUEUED.inc()`). Hot paths look their child up once and keep it.
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def samples(self):
+        """[(suffix, {label: value}, number)] for the exposition."""
+        with self._lock:
+            children = list(self._children.items())
+        out = []
+        for values, child in children:
+            labels = dict(zip(self.labelnames, values))
+            out.extend((suffix, {**labels, **extra}, number) for suffix, extra, number in child.samples())
+        return out
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self._shards.values()[0] += amount
+
+    def samples(self):
+        return [("", {}, self._shards.total()[0])]
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _child = _CounterChild
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Read the value from `function()` at scrape time instead."""
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            return [("", {}, self._value)]
+        try:
+            return [("", {}, self._function())]
+        except Exception:
+            return [("", {}, math.nan)]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    _child = _GaugeChild
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set_function(self, function):
+        self.labels().set_function(function)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._buckets = buckets
+        # One slot per bucket (last: above every bound), then sum and count
+        self._shards = _Shards(len(buckets) + 3)
+
+    def observe(self, value):
+        values = self._shards.values()
+        values[bisect.bisect_left(self._buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self):
+        total = self._shards.total()
+        out, seen = [], 0
+        for bound, n in zip(self._buckets + (math.inf,), total):
+            seen += n
+            out.append(("_bucket", {"le": bound}, seen))
+        return out + [("_sum", {}, total[-2]), ("_count", {}, total[-1])]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+
+# -------------------------------------------------
+# REGISTRY AND TEXT EXPOSITION
+# -------------------------------------------------
+# Metrics are declared at module level with counter() / gauge() /
+# histogram(). The registry is one per process (get_registry) and declaring
+# a name again returns the existing metric, so a module that Streamlit
+# re-imports after an edit keeps feeding the same series.
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def get_or_create(self, cls, name, help, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif metric.kind != cls.kind or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} is already declared as a different {metric.kind}")
+            return metric
+
+    def exposition(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, number in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_labels(labels)} {_number(number)}")
+        return "\n".join(lines) + "\n"
+
+
+@st.cache_resource(show_spinner=False)
+def get_registry():
+    return Registry()
+
+
+def counter(name, help, labelnames=()):
+    return get_registry().get_or_create(Counter, name, help, labelnames)
+
+
+def gauge(name, help, labelnames=()):
+    return get_registry().get_or_create(Gauge, name, help, labelnames)
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return get_registry().get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value):
+    return _escape_help(value).replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(_number(v) if k == "le" else v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value))
+
+
+# -------------------------------------------------
+# HTTP LISTENER
+# -------------------------------------------------
+# A plain threading HTTP server on its own daemon thread, started once per
+# process next to the Streamlit server. It binds to localhost by default;
+# scrape it with a local Prometheus / agent, or set CSMS_METRICS_HOST.
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.exposition().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics on a daemon thread (once per process); returns the server, or None when off or unavailable."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        # e.g. a second app process on the same host: it just isn't scraped
+        print(f"[metrics] cannot listen on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.registry = get_registry()
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
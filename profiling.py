@@ -0,0 +1,262 @@
+import bisect
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import streamlit as st
+
+# Set to 0 to turn section timing off (laps and sections become no-ops)
+PROFILING = os.environ.get("CSMS_PROFILING", "1") == "1"
+# Histogram bucket upper bounds (ms); the last bucket is everything slower
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# One-rerun captures kept for the admin page
+CAPTURES_KEPT = 5
+
+
+# -------------------------------------------------
+# SECTION STATISTICS
+# -------------------------------------------------
+# Per (page, section): run count, total wall and CPU time, net allocated
+# memory blocks (sys.getallocatedblocks, which costs nothing to read) and a
+# wall-time histogram on fixed log-spaced buckets. Shared by all sessions;
+# one record is a handful of additions under a lock.
+
+class SectionStats:
+    def __init__(self):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.blocks = 0
+        self.max = 0.0
+        self.hist = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, wall, cpu, blocks):
+        self.count += 1
+        self.wall += wall
+        self.cpu += cpu
+        self.blocks += blocks
+        self.max = max(self.max, wall)
+        self.hist[bisect.bisect_left(BUCKETS_MS, wall * 1000)] += 1
+
+    def quantile(self, q):
+        """Upper bound (ms) of the bucket holding the q-quantile."""
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.hist):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max * 1000
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "wall_ms_mean": 1000 * self.wall / max(self.count, 1),
+            "cpu_ms_mean": 1000 * self.cpu / max(self.count, 1),
+            "wall_ms_p50": self.quantile(0.5),
+            "wall_ms_p95": self.quantile(0.95),
+            "wall_ms_max": 1000 * self.max,
+            "alloc_blocks_mean": self.blocks / max(self.count, 1),
+            "histogram": dict(zip([f"<={b:g}ms" for b in BUCKETS_MS] + ["slower"], self.hist)),
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sections = {}
+        self.captures = []
+        self.started = time.time()
+
+    def record(self, page, section, wall, cpu, blocks):
+        with self._lock:
+            stats = self._sections.get((page, section))
+            if stats is None:
+                stats = self._sections[(page, section)] = SectionStats()
+            stats.add(wall, cpu, blocks)
+
+    def sections(self):
+        """[(page, section, stats dict)] in first-recorded order."""
+        with self._lock:
+            return [(page, section, stats.to_dict()) for (page, section), stats in self._sections.items()]
+
+    def reset(self):
+        with self._lock:
+            self._sections.clear()
+            self.captures.clear()
+            self.started = time.time()
+
+    def add_capture(self, capture):
+        with self._lock:
+            self.captures = (self.captures + [capture])[-CAPTURES_KEPT:]
+
+    def to_json(self):
+        return json.dumps({
+            "since": self.started,
+            "exported": time.time(),
+            "buckets_ms": list(BUCKETS_MS),
+            "sections": [dict(page=page, section=section, **stats) for page, section, stats in self.sections()],
+            "captures": list(self.captures),
+        }, indent=2)
+
+
+@st.cache_resource(show_spinner=False)
+def get_profiler():
+    # One set of statistics per server process
+    return Profiler()
+
+
+# -------------------------------------------------
+# INSTRUMENTATION
+# -------------------------------------------------
+# Two ways to time a page:
+#   lap = laps("dashboard")      ...code...   lap("reading")   ...code...   lap("chart build")
+# records each stretch of code since the previous lap under that name, so a
+# page is split into sections without re-indenting it, and
+#   with section("analytics", "export"): ...
+# times one block.
+
+class _Laps:
+    def __init__(self, page):
+        self.page = page
+        self.profiler = get_profiler()
+        self._mark()
+
+    def _mark(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        self._blocks = sys.getallocatedblocks()
+
+    def __call__(self, name):
+        self.profiler.record(self.page, name, time.perf_counter() - self._wall, time.thread_time() - self._cpu,
+                             sys.getallocatedblocks() - self._blocks)
+        self._mark()
+
+
+def _no_lap(name):
+    pass
+
+
+def laps(page):
+    return _Laps(page) if PROFILING else _no_lap
+
+
+@contextmanager
+def section(page, name):
+    if not PROFILING:
+        yield
+        return
+    lap = _Laps(page)
+    try:
+        yield
+    finally:
+        lap(name)
+
+
+# -------------------------------------------------
+# ONE-RERUN CAPTURE
+# -------------------------------------------------
+# The admin page arms a capture for this session ("cprofile" or
+# "tracemalloc"); the router runs the next full rerun of the chosen page
+# under it and files the top entries with the profiler.
+
+def arm_capture(mode, page):
+    st.session_state.profile_capture = (mode, page)
+
+
+@contextmanager
+def capture(page):
+    armed = st.session_state.get("profile_capture")
+    if not armed or armed[1] != page:
+        yield
+        return
+    del st.session_state["profile_capture"]
+    mode = armed[0]
+    started = time.time()
+    if mode == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+    else:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(10)
+        before = tracemalloc.take_snapshot()
+    try:
+        yield
+    finally:
+        if mode == "cprofile":
+            prof.disable()
+            out = io.StringIO()
+            pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(40)
+            report = out.getvalue()
+        else:
+            stats = tracemalloc.take_snapshot().compare_to(before, "lineno")
+            if not was_tracing:
+                tracemalloc.stop()
+            report = "\n".join(str(s) for s in stats[:40])
+        get_profiler().add_capture({"page": page, "mode": mode, "at": started, "report": report})
+
+
+# -------------------------------------------------
+# ADMIN PAGE (hidden: ?page=admin)
+# -------------------------------------------------
+
+def admin_page():
+    import pandas as pd
+
+    profiler = get_profiler()
+    st.markdown("<div class='hero'>🛠️ Render Profiling</div>", unsafe_allow_html=True)
+
+    rows = profiler.sections()
+    st.markdown("<div class='card'><div class='hdr'>Sections</div>", unsafe_allow_html=True)
+    st.caption(f"Since {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(profiler.started))}"
+               + ("" if PROFILING else " — profiling is off (CSMS_PROFILING=0)"))
+    if rows:
+        table = pd.DataFrame([{"Page": page, "Section": section, "Runs": s["count"],
+                               "Mean ms": s["wall_ms_mean"], "p50 ms": s["wall_ms_p50"],
+                               "p95 ms": s["wall_ms_p95"], "Max ms": s["wall_ms_max"],
+                               "CPU ms": s["cpu_ms_mean"], "Alloc blocks": s["alloc_blocks_mean"]}
+                              for page, section, s in rows])
+        st.dataframe(table.round(2), use_container_width=True, hide_index=True)
+
+        labels = [f"{page} / {section}" for page, section, _ in rows]
+        pick = st.selectbox("Histogram", labels, key="profile_hist")
+        hist = rows[labels.index(pick)][2]["histogram"]
+        st.bar_chart(pd.Series(hist, index=pd.Index(list(hist), name="wall time")))
+    else:
+        st.markdown("<div class='note'>No sections recorded yet</div>", unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("⬇️ Export JSON", profiler.to_json(), file_name="csms_profile.json",
+                           mime="application/json")
+    with col2:
+        if st.button("Reset statistics"):
+            profiler.reset()
+            st.rerun()
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    st.markdown("<div class='card'><div class='hdr'>Capture one rerun</div>", unsafe_allow_html=True)
+    from router import nav_pages
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        mode = st.selectbox("Profiler", ["cprofile", "tracemalloc"], key="profile_mode")
+    with col2:
+        page = st.selectbox("Page", [p.name for p in nav_pages()], key="profile_page")
+    with col3:
+        if st.button("Arm", use_container_width=True):
+            arm_capture(mode, page)
+    armed = st.session_state.get("profile_capture")
+    if armed:
+        st.info(f"The next full rerun of '{armed[1]}' in this session runs under {armed[0]}")
+    for cap in reversed(profiler.captures):
+        when = time.strftime("%H:%M:%S", time.localtime(cap["at"]))
+        with st.expander(f"{when} — {cap['page']} ({cap['mode']})"):
+            st.code(cap["report"], language=None)
+    st.markdown("</div>", unsafe_allow_html=True)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+
+# Generated reports live here, one file per distinct content
+ARCHIVE_DIR = os.environ.get("CSMS_REPORT_ARCHIVE", "report_archive")
+# Rows per page of the archive listing
+PAGE_SIZE = int(os.environ.get("CSMS_ARCHIVE_PAGE_SIZE", "10"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_archive (
+    id           INTEGER PRIMARY KEY,
+    title        TEXT NOT NULL,
+    format       TEXT NOT NULL,
+    ext          TEXT NOT NULL,
+    station      TEXT,
+    period_start INTEGER,
+    period_end   INTEGER,
+    digest       TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    spec_key     TEXT,
+    created      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS report_archive_created ON report_archive (created, id);
+CREATE INDEX IF NOT EXISTS report_archive_title ON report_archive (title, created, id);
+CREATE UNIQUE INDEX IF NOT EXISTS report_archive_spec ON report_archive (spec_key);
+"""
+
+_COLUMNS = ("id", "title", "format", "ext", "station", "period_start", "period_end", "digest", "size", "created")
+
+
+def spec_key(spec):
+    """Hash of everything that determines a report's content (not how it is delivered)."""
+    keep = {k: spec.get(k) for k in ("title", "format", "start", "end", "station", "stations", "channels",
+                                     "reading", "compression")}
+    return hashlib.sha256(json.dumps(keep, sort_keys=True).encode()).hexdigest()
+
+
+# -------------------------------------------------
+# CONTENT-ADDRESSED ARTIFACT STORE
+# -------------------------------------------------
+# A finished artifact is stored as <dir>/<sha256[:2]>/<sha256><ext>. Two
+# jobs that render byte-identical output share one file, and a file that is
+# in place is complete (it is moved in only after it was fully written).
+#
+# With a `db_path`, the archive also keeps a metadata index (report_archive
+# table): one row per archived report with its type, period, size, hash and
+# creation time. Listing is keyset-paginated on (created, id), so a page
+# costs one index range scan however many reports are archived, and a
+# request whose spec was already rendered is answered from the index.
+
+class ReportArchive:
+    def __init__(self, root=ARCHIVE_DIR, db_path=None):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path is not None:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest + ext)
+
+    def put_file(self, tmp_path, ext):
+        """Move a finished temp file into the archive; returns (sha256 hex, size in bytes)."""
+        h = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        size = os.path.getsize(tmp_path)
+
+        target = self.path(digest, ext)
+        if os.path.exists(target):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(tmp_path, target)
+        return digest, size
+
+    def tmp_path(self, name):
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+        return os.path.join(self.root, "tmp", name)
+
+    # ----- METADATA INDEX -----
+    def add(self, spec, ext, digest, size, created):
+        """Record an archived report; a spec that is already indexed keeps its first row."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO report_archive (title, format, ext, station, period_start, period_end, "
+                "digest, size, spec_key, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (spec["title"], spec["format"], ext, spec.get("station"), spec.get("start"), spec.get("end"),
+                 digest, size, spec_key(spec), created))
+
+    def lookup(self, spec):
+        """Index row of an earlier report with the same spec whose file is still on disk, or None."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM report_archive WHERE spec_key = ?",
+                                     (spec_key(spec),)).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(_COLUMNS, row))
+        return entry if os.path.exists(self.path(entry["digest"], entry["ext"])) else None
+
+    def page(self, before=None, title=None, limit=PAGE_SIZE):
+        """Newest-first page of index rows older than the `before` cursor ((created, id) of the last row seen).
+
+        Returns (rows, cursor of the next page or None).
+        """
+        where, args = [], []
+        if title is not None:
+            where.append("title = ?")
+            args.append(title)
+        if before is not None:
+            where.append("(created, id) < (?, ?)")
+            args += list(before)
+        sql = (f"SELECT {', '.join(_COLUMNS)} FROM report_archive "
+               f"{'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY created DESC, id DESC LIMIT ?")
+        with self._lock:
+            rows = [dict(zip(_COLUMNS, r)) for r in self._conn.execute(sql, args + [limit + 1]).fetchall()]
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return rows, ((rows[-1]["created"], rows[-1]["id"]) if more else None)
+
+    def titles(self):
+        # Skip-scan of the title index: one seek per distinct title, not a scan of every row
+        with self._lock:
+            return [t for (t,) in self._conn.execute(
+                "WITH RECURSIVE t(title) AS (SELECT MIN(title) FROM report_archive UNION ALL "
+                "SELECT (SELECT MIN(title) FROM report_archive WHERE title > t.title) FROM t WHERE t.title IS NOT NULL) "
+                "SELECT title FROM t WHERE title IS NOT NULL")]
@@ -0,0 +1,244 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from data_hub import DB_PATH, DEFAULT_STATION
+from reports import ReportJobs, get_report_jobs
+
+# Seconds between checks for due schedules
+CHECK_INTERVAL = float(os.environ.get("CSMS_SCHEDULE_INTERVAL", "60"))
+# After downtime, at most this many missed periods per schedule are rendered (the most recent ones)
+CATCHUP_LIMIT = int(os.environ.get("CSMS_SCHEDULE_CATCHUP", "7"))
+# Set to 0 when the scheduler runs as its own process (python report_scheduler.py)
+IN_APP = os.environ.get("CSMS_SCHEDULER_IN_APP", "1") == "1"
+# Seconds a scheduler holds the lease without renewing it before another process may take over
+LEASE_TTL = float(os.environ.get("CSMS_SCHEDULE_LEASE", str(max(3 * CHECK_INTERVAL, 30))))
+
+# period -> (report title, default checkbox state on the Reports page)
+PERIODS = {
+    "daily": ("Daily Summary", True),
+    "weekly": ("Weekly Analysis", True),
+    "monthly": ("Monthly Review", False),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_schedules (
+    period     TEXT PRIMARY KEY,
+    enabled    INTEGER NOT NULL DEFAULT 0,
+    format     TEXT NOT NULL DEFAULT 'pdf',
+    station    TEXT NOT NULL,
+    recipients TEXT NOT NULL DEFAULT '[]',
+    next_start INTEGER,
+    updated    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scheduler_lease (
+    id      INTEGER PRIMARY KEY CHECK (id = 1),
+    owner   TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+# -------------------------------------------------
+# PERIOD BOUNDARIES (local time)
+# -------------------------------------------------
+# Days start at local midnight, weeks on Monday, months on the 1st.
+
+def period_start(period, ms):
+    """Start (epoch ms) of the period containing `ms`."""
+    d = datetime.fromtimestamp(ms / 1000).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "weekly":
+        d -= timedelta(days=d.weekday())
+    elif period == "monthly":
+        d = d.replace(day=1)
+    return int(d.timestamp() * 1000)
+
+
+def period_end(period, start_ms):
+    """Start (epoch ms) of the period after the one beginning at `start_ms`."""
+    d = datetime.fromtimestamp(start_ms / 1000)
+    if period == "daily":
+        d += timedelta(days=1)
+    elif period == "weekly":
+        d += timedelta(days=7)
+    else:
+        d = (d.replace(day=1) + timedelta(days=32)).replace(day=1)
+    # Re-anchor to midnight: adding whole days across a DST change lands an hour off
+    return period_start(period, int(d.timestamp() * 1000) + 3 * 3600 * 1000)
+
+
+# -------------------------------------------------
+# REPORT SCHEDULER
+# -------------------------------------------------
+# Schedules live in SQLite, each with the start of the next period still to
+# be reported. A background thread wakes every CHECK_INTERVAL seconds and
+# queues a report job for every period that has ended since, then moves
+# `next_start` on; after downtime the missed periods are queued on the first
+# check (up to CATCHUP_LIMIT each). Nothing here needs a browser session.
+#
+# Only one scheduler per database does any of this: each check first takes
+# or renews a lease row, and a scheduler that cannot (another process holds
+# it) stays idle until the lease runs out. The lease holder also resubmits
+# report jobs a previous process left behind. So the in-app scheduler and
+# the headless one (python report_scheduler.py) can both be running; only
+# one fires schedules or recovers jobs, and the other takes over within
+# LEASE_TTL if it dies.
+#
+# Deployment: Streamlit runs no app code until the first browser session,
+# so the in-app scheduler (CSMS_SCHEDULER_IN_APP=1) starts with the first
+# page view after a restart. Where reports must go out with nobody visiting,
+# run the headless scheduler as its own service and set
+# CSMS_SCHEDULER_IN_APP=0 for the app.
+#
+# The reports themselves are cheap at the period boundary: the summary
+# statistics merge the per-day/per-hour stats buckets that ingestion keeps
+# up to date, and the charts read the hourly rollups, so a monthly review
+# merges ~30 day rows instead of rescanning a month of raw samples.
+#
+# A crash between queueing a job and recording it can queue that period
+# twice on restart; reports are idempotent, so that only costs a re-render.
+
+class ReportScheduler:
+    def __init__(self, jobs, db_path=DB_PATH, interval=CHECK_INTERVAL, lease_ttl=LEASE_TTL):
+        self.jobs = jobs
+        self.interval = interval
+        self.lease_ttl = lease_ttl
+        self.owner = f"{os.getpid()}-{secrets.token_hex(4)}"
+        self.leader = False
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="report-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.release()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[scheduler] check failed: {type(e).__name__}: {e}")
+            self._stop.wait(self.interval)
+
+    def check(self, now_ms=None):
+        """Take or renew the lease, then queue due reports; returns the job ids (none without the lease)."""
+        if not self.acquire():
+            self.leader = False
+            return []
+        if not self.leader:
+            self.leader = True
+            recovered = self.jobs.recover()
+            if recovered:
+                print(f"[scheduler] resubmitted {len(recovered)} unfinished report job(s)")
+        return self.tick(now_ms)
+
+    # ----- LEASE -----
+    def acquire(self, now=None):
+        """True when this scheduler holds the lease (taking it over if it has run out)."""
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO scheduler_lease (id, owner, expires) VALUES (1, '', 0)")
+            cur = self._conn.execute(
+                "UPDATE scheduler_lease SET owner = ?, expires = ? WHERE id = 1 AND (owner = ? OR expires < ?)",
+                (self.owner, now + self.lease_ttl, self.owner, now))
+        return cur.rowcount == 1
+
+    def release(self):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE scheduler_lease SET expires = 0 WHERE id = 1 AND owner = ?", (self.owner,))
+        self.leader = False
+
+    # ----- SCHEDULES -----
+    def schedules(self):
+        """{period: {"enabled", "format", "station", "recipients", "next_start"}} for stored schedules."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT period, enabled, format, station, recipients, next_start FROM report_schedules").fetchall()
+        return {p: {"enabled": bool(en), "format": fmt, "station": station, "recipients": json.loads(rcpt),
+                    "next_start": nxt} for p, en, fmt, station, rcpt, nxt in rows}
+
+    def save(self, period, enabled, recipients=(), station=DEFAULT_STATION, fmt="pdf", now_ms=None):
+        """Create or update a schedule.
+
+        Switching a schedule on starts it with the current period, so time
+        spent disabled is never caught up; editing an enabled one keeps its place.
+        """
+        if period not in PERIODS:
+            raise ValueError(f"unknown report period {period!r}")
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT enabled, next_start FROM report_schedules WHERE period = ?",
+                                     (period,)).fetchone()
+            next_start = row[1] if row and row[0] and row[1] is not None else period_start(period, now_ms)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO report_schedules "
+                "(period, enabled, format, station, recipients, next_start, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (period, int(bool(enabled)), fmt, station, json.dumps(list(recipients)),
+                 next_start if enabled else None, time.time()))
+
+    # ----- FIRING -----
+    def due(self, now_ms=None):
+        """(period, start_ms, end_ms) of every ended, unreported period, oldest first."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        out = []
+        for period, sched in self.schedules().items():
+            if not sched["enabled"] or sched["next_start"] is None:
+                continue
+            missed = []
+            start, end = sched["next_start"], period_end(period, sched["next_start"])
+            while end <= now_ms:
+                missed.append((period, start, end))
+                start, end = end, period_end(period, end)
+            out += missed[-CATCHUP_LIMIT:]
+        return out
+
+    def tick(self, now_ms=None):
+        """Queue reports for every period that has ended; returns the job ids."""
+        schedules = self.schedules()
+        submitted = []
+        for period, start, end in self.due(now_ms):
+            sched = schedules[period]
+            job = self.jobs.submit(PERIODS[period][0], sched["format"], start, end - 1, sched["station"],
+                                   email=sched["recipients"] or False)
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE report_schedules SET next_start = ? WHERE period = ? AND enabled = 1",
+                                   (end, period))
+            submitted.append(job)
+        return submitted
+
+
+@st.cache_resource(show_spinner=False)
+def get_report_scheduler():
+    # One scheduler thread per server process, started by router.start_services() after the first page
+    # view; with CSMS_SCHEDULER_IN_APP=0 it only edits schedules and the headless process fires them
+    scheduler = ReportScheduler(get_report_jobs())
+    return scheduler.start() if IN_APP else scheduler
+
+
+if __name__ == "__main__":
+    # Headless: python report_scheduler.py (with CSMS_SCHEDULER_IN_APP=0 for the app)
+    from reports import _mailer
+
+    ReportScheduler(ReportJobs(mailer=_mailer())).start()
+    print(f"[scheduler] running, checking every {CHECK_INTERVAL:g}s")
+    threading.Event().wait()
@@ -0,0 +1,417 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from io import BytesIO
+
+import streamlit as st
+
+from alert_state import ANOMALY_PREFIX, read_incidents
+from data_hub import DB_PATH, DEFAULT_STATION
+from export import COMPRESSION, EXPORT_FORMATS, write_export
+from metrics import counter, gauge, histogram
+from report_archive import ARCHIVE_DIR, ReportArchive
+from rules import RULES
+from tsdb import TimeSeriesStore
+
+# Report rendering processes (several reports build in parallel)
+REPORT_WORKERS = int(os.environ.get("CSMS_REPORT_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+
+FORMATS = {"pdf": (".pdf", "application/pdf"),
+           "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+           **EXPORT_FORMATS}
+
+REPORT_CHANNELS = ["Temperature", "Humidity", "Pressure", "PM2.5", "CO2", "Noise"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_jobs (
+    id       INTEGER PRIMARY KEY,
+    title    TEXT NOT NULL,
+    format   TEXT NOT NULL,
+    spec     TEXT NOT NULL,
+    status   TEXT NOT NULL DEFAULT 'queued',
+    progress REAL NOT NULL DEFAULT 0,
+    stage    TEXT,
+    digest   TEXT,
+    size     INTEGER,
+    error    TEXT,
+    created  REAL NOT NULL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS report_jobs_status ON report_jobs (status);
+"""
+
+# Queue-to-file time of a report job (seconds)
+JOB_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+JOBS_SUBMITTED = counter("csms_report_jobs_submitted_total", "Report and export requests by format", ["format"])
+JOBS_FINISHED = counter("csms_report_jobs_finished_total",
+                        "Finished report jobs by format and outcome (cached: served from the archive)",
+                        ["format", "status"])
+JOB_TIME = histogram("csms_report_job_seconds", "Time from queueing a report job to its finished file", ["format"],
+                     buckets=JOB_BUCKETS)
+JOB_QUEUE = gauge("csms_report_jobs", "Report jobs not finished yet, by status", ["status"])
+
+
+# -------------------------------------------------
+# RENDERERS (run in worker processes)
+# -------------------------------------------------
+# Each renderer writes one file for a job spec and reports progress through
+# `progress(fraction, stage)`. Data comes straight from the time-series store:
+# rollups for charts and tables, raw samples only for the data exports.
+
+def _period(spec):
+    fmt = "%Y-%m-%d %H:%M"
+    return (f"{datetime.fromtimestamp(spec['start'] / 1000).strftime(fmt)} – "
+            f"{datetime.fromtimestamp(spec['end'] / 1000).strftime(fmt)}")
+
+
+def render_export(store, conn, spec, path, progress):
+    # Raw samples, streamed chunk by chunk (see export.py)
+    write_export(store, spec["format"], path, spec.get("stations") or [spec["station"]], spec["start"], spec["end"],
+                 spec.get("channels"), spec.get("compression") or COMPRESSION, progress)
+    progress(1.0, "done")
+
+
+def _incident_frame(conn, spec):
+    import pandas as pd
+
+    rows = read_incidents(conn, spec["start"], spec["end"], spec["station"])
+    return pd.DataFrame({
+        "Fired": [datetime.fromtimestamp(r["fired_ts"] / 1000) for r in rows],
+        "Parameter": [RULES.by_key[r["rule"]].name if r["rule"] in RULES.by_key
+                      else f"{r['rule'][len(ANOMALY_PREFIX):]} (anomaly)" for r in rows],
+        "Peak": [r["peak"] for r in rows],
+        "State": [r["state"] for r in rows],
+        "Acknowledged By": [r["acked_by"] for r in rows],
+    })
+
+
+def render_xlsx(store, conn, spec, path, progress):
+    import pandas as pd
+    try:
+        import openpyxl  # noqa: F401  (engine for ExcelWriter)
+    except ImportError:
+        raise RuntimeError("Excel export needs openpyxl (pip install openpyxl)")
+
+    progress(0.1, "summary")
+    summary = store.summary(spec["station"], spec["start"], spec["end"]).describe(spec.get("channels")).T
+    progress(0.4, "hourly averages")
+    hourly = store.rollup_frame(spec["station"], "1h", spec["start"], spec["end"], spec.get("channels"))
+    progress(0.7, "incidents")
+    incidents = _incident_frame(conn, spec)
+    with pd.ExcelWriter(path, engine="openpyxl") as xl:
+        summary.round(2).to_excel(xl, sheet_name="Summary")
+        hourly.to_excel(xl, sheet_name="Hourly Averages", index=False)
+        incidents.to_excel(xl, sheet_name="Incidents", index=False)
+    progress(1.0, "done")
+
+
+def _pdf_styles():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+
+    styles = getSampleStyleSheet()
+    title = ParagraphStyle('CustomTitle', parent=styles['Title'], fontSize=24, spaceAfter=30,
+                           textColor=colors.HexColor('#4deac2'))
+    return styles, title
+
+
+def _pdf_table(rows, widths):
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    table = Table(rows, colWidths=widths)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a3b5a')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#0b182c')),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#4deac2')),
+    ]))
+    return table
+
+
+def _snapshot_story(spec):
+    # One reading (the dashboard's quick export)
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles, title_style = _pdf_styles()
+    content = [Paragraph("Critical Space Monitoring Report", title_style), Spacer(1, 20),
+               Paragraph(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles["Normal"]),
+               Paragraph(f"Location: {spec['station']}", styles["Normal"]), Spacer(1, 20)]
+
+    table_data = [['Parameter', 'Value', 'Status']]
+    for param, value in spec["reading"].items():
+        lab, _ = RULES.status(param, value)
+        table_data.append([param, str(value), lab])
+    content.append(_pdf_table(table_data, [2 * inch, 1.5 * inch, 1.5 * inch]))
+    content.append(Spacer(1, 30))
+    return content
+
+
+def _chart_png(frame, channel):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(7, 2.2), dpi=110)
+    ax.plot(frame["Date"], frame[channel], color="#1a3b5a", linewidth=1)
+    ax.set_title(f"{channel} (hourly mean)", fontsize=9)
+    ax.tick_params(labelsize=7)
+    ax.grid(alpha=0.3)
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    out = BytesIO()
+    fig.savefig(out, format="png")
+    plt.close(fig)
+    out.seek(0)
+    return out
+
+
+def _period_story(store, conn, spec, progress):
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Image, Paragraph, Spacer
+
+    styles, title_style = _pdf_styles()
+    channels = spec.get("channels") or REPORT_CHANNELS
+    content = [Paragraph(f"{spec['title']} Report", title_style),
+               Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles["Normal"]),
+               Paragraph(f"Period: {_period(spec)}", styles["Normal"]),
+               Paragraph(f"Location: {spec['station']}", styles["Normal"]), Spacer(1, 20)]
+
+    progress(0.05, "summary")
+    summary = store.summary(spec["station"], spec["start"], spec["end"])
+    described = summary.describe(channels)
+    incidents = _incident_frame(conn, spec)
+    counts = summary.count()
+
+    content.append(Paragraph("Executive Summary", styles["Heading2"]))
+    content.append(Paragraph(f"Readings: {max(counts.values(), default=0)}", styles["Normal"]))
+    content.append(Paragraph(f"Critical incidents: {len(incidents)}", styles["Normal"]))
+    content.append(Spacer(1, 12))
+
+    rows = [["Parameter", "Mean", "Min", "Median", "Max", "Std"]]
+    for ch in described.columns:
+        col = described[ch]
+        rows.append([ch] + [f"{col[k]:.1f}" for k in ("mean", "min", "50%", "max", "std")])
+    content.append(_pdf_table(rows, [1.5 * inch] + [0.9 * inch] * 5))
+    content.append(Spacer(1, 20))
+
+    content.append(Paragraph("Trend Analysis", styles["Heading2"]))
+    hourly = store.rollup_frame(spec["station"], "1h", spec["start"], spec["end"], channels)
+    for i, ch in enumerate(channels):
+        content.append(Image(_chart_png(hourly, ch), width=7 * inch, height=2.2 * inch))
+        progress(0.1 + 0.8 * (i + 1) / len(channels), f"chart {i + 1} of {len(channels)}")
+
+    if len(incidents):
+        content.append(Paragraph("Alert History", styles["Heading2"]))
+        rows = [["Fired", "Parameter", "Peak", "State"]]
+        for r in incidents.head(50).itertuples(index=False):
+            rows.append([r.Fired.strftime("%Y-%m-%d %H:%M"), r.Parameter, f"{r.Peak:.1f}", r.State])
+        content.append(_pdf_table(rows, [1.8 * inch, 1.8 * inch, 1.2 * inch, 1.2 * inch]))
+    return content
+
+
+def render_pdf(store, conn, spec, path, progress):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    content = _snapshot_story(spec) if spec.get("reading") else _period_story(store, conn, spec, progress)
+    progress(0.95, "layout")
+    SimpleDocTemplate(path, pagesize=A4).build(content)
+
+
+RENDERERS = {"pdf": render_pdf, "xlsx": render_xlsx, **{fmt: render_export for fmt in EXPORT_FORMATS}}
+
+
+def run_job(job_id, spec, db_path, archive_dir):
+    """Worker entry point: render the job, file it in the archive, return (digest, size)."""
+    conn = sqlite3.connect(db_path, timeout=30)
+
+    def progress(fraction, stage):
+        with conn:
+            conn.execute("UPDATE report_jobs SET progress = ?, stage = ? WHERE id = ?",
+                         (float(fraction), stage, job_id))
+
+    with conn:
+        conn.execute("UPDATE report_jobs SET status = 'running' WHERE id = ?", (job_id,))
+    progress(0.0, "loading data")
+    archive = ReportArchive(archive_dir)
+    ext = FORMATS[spec["format"]][0]
+    tmp = archive.tmp_path(f"job{job_id}-{os.getpid()}{ext}")
+    # Workers are reused across jobs: every connection opened for this one is closed with it
+    store = None
+    try:
+        store = TimeSeriesStore(db_path)
+        RENDERERS[spec["format"]](store, conn, spec, tmp, progress)
+        return archive.put_file(tmp, ext)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        if store is not None:
+            store.close()
+        conn.close()
+
+
+# -------------------------------------------------
+# REPORT JOB QUEUE
+# -------------------------------------------------
+# submit() records a job row and returns its id at once; rendering happens
+# in a spawn-context process pool, so a long multi-chart report never holds
+# up a page render and several reports build on different cores. Workers
+# write progress into the job row; the finished file is stored by content
+# hash in the report archive and indexed there. A request whose spec is
+# already archived is completed at once from the existing file. Jobs left
+# queued or running by a previous process are resubmitted by recover(),
+# which only the process holding the scheduler lease calls (see
+# report_scheduler.py), so a web app and a headless scheduler sharing the
+# database never both pick them up.
+
+class ReportJobs:
+    def __init__(self, db_path=DB_PATH, archive_dir=ARCHIVE_DIR, workers=REPORT_WORKERS, mailer=None):
+        self.db_path = db_path
+        self.archive = ReportArchive(archive_dir, db_path)
+        self.mailer = mailer
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.workers = workers
+        self._pool = self._new_pool()
+        self._pending = set()
+        for status in ("queued", "running"):
+            JOB_QUEUE.labels(status).set_function(lambda status=status: self.count(status))
+
+    def submit(self, title, fmt, start_ms, end_ms, station=DEFAULT_STATION, channels=None, reading=None,
+               email=False, stations=None, compression=None):
+        """Queue a report and return its job id immediately.
+
+        `email` is True to mail the finished file to the default recipient, or a list of addresses.
+        Data exports (csv / parquet / arrow) cover `stations` when given, else `station`.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown report format {fmt!r}")
+        spec = {"title": title, "format": fmt, "start": int(start_ms), "end": int(end_ms), "station": station,
+                "channels": channels, "reading": reading, "email": email, "stations": stations,
+                "compression": compression}
+        # The same report was rendered before: reuse the archived file instead of rendering again
+        hit = self.archive.lookup(spec)
+        JOBS_SUBMITTED.labels(fmt).inc()
+        with self._lock, self._conn:
+            if hit is None:
+                cur = self._conn.execute("INSERT INTO report_jobs (title, format, spec, created) VALUES (?, ?, ?, ?)",
+                                         (title, fmt, json.dumps(spec), time.time()))
+            else:
+                cur = self._conn.execute(
+                    "INSERT INTO report_jobs (title, format, spec, status, progress, digest, size, created, finished) "
+                    "VALUES (?, ?, ?, 'done', 1, ?, ?, ?, ?)",
+                    (title, fmt, json.dumps(spec), hit["digest"], hit["size"], time.time(), time.time()))
+        if hit is None:
+            self._start(cur.lastrowid, spec)
+            return cur.lastrowid
+        JOBS_FINISHED.labels(fmt, "cached").inc()
+        if email and self.mailer is not None:
+            threading.Thread(target=self._mail, args=(cur.lastrowid, spec, hit["digest"]), daemon=True).start()
+        return cur.lastrowid
+
+    def recover(self):
+        """Resubmit jobs left queued or running by another process; returns their ids."""
+        with self._lock:
+            leftover = self._conn.execute(
+                "SELECT id, spec FROM report_jobs WHERE status IN ('queued', 'running')").fetchall()
+            leftover = [(job_id, spec) for job_id, spec in leftover if job_id not in self._pending]
+        for job_id, spec in leftover:
+            self._start(job_id, json.loads(spec))
+        return [job_id for job_id, _ in leftover]
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _start(self, job_id, spec):
+        with self._lock:
+            self._pending.add(job_id)
+        try:
+            future = self._pool.submit(run_job, job_id, spec, self.db_path, self.archive.root)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); later jobs get a fresh pool
+            self._pool = self._new_pool()
+            future = self._pool.submit(run_job, job_id, spec, self.db_path, self.archive.root)
+        queued = time.perf_counter()
+        future.add_done_callback(lambda f: self._finish(job_id, spec, f, queued))
+
+    def _finish(self, job_id, spec, future, queued):
+        with self._lock:
+            self._pending.discard(job_id)
+        JOB_TIME.labels(spec["format"]).observe(time.perf_counter() - queued)
+        try:
+            digest, size = future.result()
+        except Exception as e:
+            JOBS_FINISHED.labels(spec["format"], "failed").inc()
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE report_jobs SET status = 'failed', error = ?, finished = ? WHERE id = ?",
+                                   (f"{type(e).__name__}: {e}", time.time(), job_id))
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE report_jobs SET status = 'done', progress = 1, stage = NULL, digest = ?, size = ?, "
+                "finished = ? WHERE id = ?", (digest, size, time.time(), job_id))
+        JOBS_FINISHED.labels(spec["format"], "done").inc()
+        self.archive.add(spec, FORMATS[spec["format"]][0], digest, size, time.time())
+        if spec.get("email") and self.mailer is not None:
+            threading.Thread(target=self._mail, args=(job_id, spec, digest), daemon=True).start()
+
+    def _mail(self, job_id, spec, digest):
+        ext = FORMATS[spec["format"]][0]
+        try:
+            self.mailer(f"CSMS {spec['title']} Report",
+                        f"{spec['title']} report for {spec['station']}\nPeriod: {_period(spec)}\n",
+                        self.archive.path(digest, ext), f"{spec['title'].replace(' ', '_')}{ext}",
+                        spec["email"] if isinstance(spec["email"], list) else None)
+        except Exception as e:
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE report_jobs SET error = ? WHERE id = ?",
+                                   (f"email failed: {type(e).__name__}: {e}", job_id))
+
+    def count(self, status):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM report_jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def job(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, title, format, status, progress, stage, digest, size, error, created, finished "
+                "FROM report_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "title", "format", "status", "progress", "stage", "digest", "size", "error", "created",
+                "finished")
+        return dict(zip(keys, row))
+
+    def artifact(self, job):
+        """Path of a finished job's file, or None."""
+        if job is None or job["status"] != "done":
+            return None
+        return self.archive.path(job["digest"], FORMATS[job["format"]][0])
+
+
+def _mailer():
+    try:
+        import email_alert
+    except ImportError:
+        return None
+    return email_alert.send_report
+
+
+@st.cache_resource(show_spinner=False)
+def get_report_jobs():
+    # One pool per server process, shared by every session
+    return ReportJobs(mailer=_mailer())
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+
+
+# -------------------------------------------------
+# FIXED-CAPACITY LIVE HISTORY
+# -------------------------------------------------
+# Every row is written twice, at slot i and slot i + capacity, so the most
+# recent `len(buf)` rows are always one contiguous slice of the backing
+# arrays. That lets readers take plain NumPy views (no copy, no
+# concatenate) while appends stay O(1) and memory never grows.
+
+class RingBuffer:
+    """Fixed-capacity history with one float64 column per channel and int64 epoch-ms timestamps."""
+
+    def __init__(self, channels, capacity=20):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.channels = list(channels)
+        self.capacity = int(capacity)
+        self._col = {name: i for i, name in enumerate(self.channels)}
+        self._ts = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._data = np.zeros((len(self.channels), 2 * self.capacity), dtype=np.float64)
+        self._write = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    # ----- WRITES -----
+    def append(self, values, ts=None):
+        """Append one row. `values` is a dict keyed by channel or a sequence in channel order."""
+        if ts is None:
+            ts = int(time.time() * 1000)
+        if isinstance(values, dict):
+            row = [values.get(name, np.nan) for name in self.channels]
+        else:
+            row = values
+
+        with self._lock:
+            w = self._write
+            self._ts[w] = ts
+            self._ts[w + self.capacity] = ts
+            self._data[:, w] = row
+            self._data[:, w + self.capacity] = row
+            self._write = (w + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+
+    def extend(self, ts, values):
+        """Append a batch: `ts` has shape (n,), `values` has shape (n, channels)."""
+        ts = np.asarray(ts, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if len(ts) > self.capacity:
+            ts = ts[-self.capacity:]
+            values = values[-self.capacity:]
+
+        with self._lock:
+            n = len(ts)
+            slots = (self._write + np.arange(n)) % self.capacity
+            self._ts[slots] = ts
+            self._ts[slots + self.capacity] = ts
+            self._data[:, slots] = values.T
+            self._data[:, slots + self.capacity] = values.T
+            self._write = (self._write + n) % self.capacity
+            self._count = min(self._count + n, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._write = 0
+            self._count = 0
+
+    # ----- ZERO-COPY READS -----
+    def _window(self, last=None):
+        n = self._count if last is None else min(int(last), self._count)
+        start = (self._write - n) % self.capacity
+        return start, start + n
+
+    @staticmethod
+    def _readonly(arr):
+        arr.flags.writeable = False
+        return arr
+
+    def timestamps(self, last=None):
+        """Read-only int64 epoch-ms view, oldest first (optionally only the newest `last` rows)."""
+        with self._lock:
+            a, b = self._window(last)
+            return self._readonly(self._ts[a:b])
+
+    def column(self, name, last=None):
+        """Read-only float64 view of one channel, oldest first."""
+        with self._lock:
+            a, b = self._window(last)
+            return self._readonly(self._data[self._col[name], a:b])
+
+    def view(self, last=None):
+        """Read-only (timestamps, data) views; data has shape (channels, len)."""
+        with self._lock:
+            a, b = self._window(last)
+            return self._readonly(self._ts[a:b]), self._readonly(self._data[:, a:b])
+
+    def latest(self):
+        """Most recent row as a dict, or None when empty."""
+        with self._lock:
+            if not self._count:
+                return None
+            last = (self._write - 1) % self.capacity
+            return {name: float(self._data[i, last]) for i, name in enumerate(self.channels)}
+
+    def snapshot(self, last=None):
+        """Owned copies of (timestamps, data), safe to keep after further appends."""
+        ts, data = self.view(last)
+        return ts.copy(), data.copy()
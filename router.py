@@ -0,0 +1,180 @@
+import functools
+import importlib
+import os
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+from lazy_imports import preload
+from metrics import gauge, get_metrics_server, histogram
+from profiling import capture, section
+
+PAGE_CONFIG = dict(page_title="Critical Space Monitoring", page_icon="🚨", layout="wide",
+                   initial_sidebar_state="expanded")
+
+# Every key a session relies on, with its starting value (callables build a fresh one per session)
+SESSION_DEFAULTS = {
+    "logged_in": False,
+    "username": "",
+    "current_page": "dashboard",
+    "sound_allowed": True,
+    "beep_on": False,
+    "alarm": False,
+    "report_jobs": list,
+    "session_id": lambda: uuid.uuid4().hex,
+}
+
+# A session counts as active while it has run the script or a fragment within this many seconds
+SESSION_TTL = float(os.environ.get("CSMS_SESSION_TTL", "120"))
+
+PAGE_RENDER = histogram("csms_page_render_seconds", "Full script runs, by page", ["page"])
+FRAGMENT_RENDER = histogram("csms_fragment_render_seconds", "Fragment reruns (live panels), by fragment",
+                            ["fragment"])
+ACTIVE_SESSIONS = gauge("csms_active_sessions", "Browser sessions seen within the last CSMS_SESSION_TTL seconds")
+
+
+# -------------------------------------------------
+# SESSION BOOTSTRAP
+# -------------------------------------------------
+# The one place session defaults are set. It runs at the top of every
+# script run but only fills in keys that are missing, so it is idempotent
+# and a page can rely on every key above being present.
+
+def bootstrap_session():
+    state = st.session_state
+    for key, default in SESSION_DEFAULTS.items():
+        if key not in state:
+            state[key] = default() if callable(default) else default
+    get_session_tracker().touch(state.session_id)
+
+
+# -------------------------------------------------
+# ACTIVE SESSIONS
+# -------------------------------------------------
+# Every script run and fragment rerun marks its session as seen; a session
+# not seen for SESSION_TTL seconds (tab closed, browser gone) is dropped
+# when the count is next read. Open dashboards rerun their live fragments
+# every few seconds, so they stay counted while idle.
+
+class SessionTracker:
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    def touch(self, session_id):
+        with self._lock:
+            self._seen[session_id] = time.time()
+
+    def count(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            self._seen = {sid: seen for sid, seen in self._seen.items() if seen >= cutoff}
+            return len(self._seen)
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_tracker():
+    return SessionTracker()
+
+
+# -------------------------------------------------
+# PAGE REGISTRY
+# -------------------------------------------------
+# A page is a render function named as "module:function", imported only
+# when the page is shown (the login page never imports the dashboard).
+# Pages with a `chrome` function get it called first with their own name;
+# that is where the shared theme and navbar are drawn. `nav` pages appear
+# in the navbar, in registration order; the others are reached by URL.
+
+class Page:
+    def __init__(self, name, label, render, chrome=None, login_required=True, nav=True):
+        self.name = name
+        self.label = label
+        self.render = render
+        self.chrome = chrome
+        self.login_required = login_required
+        self.nav = nav
+
+
+PAGES = {}
+
+
+def register(name, label, render, chrome=None, login_required=True, nav=True):
+    PAGES[name] = Page(name, label, render, chrome, login_required, nav)
+    return PAGES[name]
+
+
+def nav_pages():
+    return [page for page in PAGES.values() if page.nav]
+
+
+def navigate(name):
+    """Switch the session to another page (takes effect on the rerun this triggers)."""
+    st.session_state.current_page = name
+    st.rerun()
+
+
+def _resolve(target):
+    module, func = target.split(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def current_page():
+    # ?page=<name> opens a page directly, including hidden (non-nav) ones
+    if "page" in st.query_params:
+        st.session_state.current_page = st.query_params.pop("page")
+    page = PAGES.get(st.session_state.current_page)
+    if page is None or page.name == "login":
+        page = PAGES["dashboard"]
+    if page.login_required and not st.session_state.logged_in:
+        page = PAGES["login"]
+    return page
+
+
+def fragment(func, run_every=None):
+    """st.fragment(func, run_every=...) with each run timed into csms_fragment_render_seconds."""
+    timer = FRAGMENT_RENDER.labels(func.__name__)
+
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        get_session_tracker().touch(st.session_state.session_id)
+        with timer.time():
+            return func(*args, **kwargs)
+
+    return st.fragment(timed, run_every=run_every)
+
+
+def start_services():
+    # Scheduled reports run in the server process from the first page view on, logged in or not
+    # (report_scheduler.py explains the headless alternative)
+    from report_scheduler import get_report_scheduler
+    get_report_scheduler()
+    # /metrics listener for the ingest, outbox, report queue and render series
+    ACTIVE_SESSIONS.set_function(get_session_tracker().count)
+    get_metrics_server()
+
+
+def run():
+    st.set_page_config(**PAGE_CONFIG)
+    bootstrap_session()
+    page = current_page()
+    started = time.perf_counter()
+    try:
+        with capture(page.name), section(page.name, "total"):
+            if page.chrome:
+                _resolve(page.chrome)(page.name)
+            _resolve(page.render)()
+    finally:
+        PAGE_RENDER.labels(page.name).observe(time.perf_counter() - started)
+        # After the page is out: load the dashboard's modules and start services in the background
+        preload(then=start_services)
+
+
+register("login", "Login", "login:login_page", login_required=False, nav=False)
+register("dashboard", "Dashboard", "dashboard:dashboard_page", chrome="dashboard:page_chrome")
+register("analytics", "Analytics", "dashboard:analytics_page", chrome="dashboard:page_chrome")
+register("reports", "Reports", "dashboard:reports_page", chrome="dashboard:page_chrome")
+register("admin", "Admin", "profiling:admin_page", chrome="dashboard:page_chrome", nav=False)
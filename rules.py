@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+OK, WARN, CRITICAL = 0, 1, 2
+LEVEL_CLASS = {OK: "ok", WARN: "mid", CRITICAL: "bad"}
+
+# -------------------------------------------------
+# THRESHOLD RULES (single source of truth)
+# -------------------------------------------------
+# One entry per channel. "above" rules trip when the value rises past the
+# band, "below" rules when it falls under it. Entries with a "station" key
+# override the default bands for that station only. A JSON file with the
+# same shape can replace these via CSMS_RULES_FILE.
+#
+# Alert state (see alert_state.py): a rule must stay critical for "hold"
+# seconds before it fires, only resolves once the value is back past the
+# critical limit by "hysteresis", and re-notifies at most every "cooldown"
+# seconds.
+
+DEFAULT_RULES = [
+    {"key": "temperature", "channel": "Temperature", "direction": "above", "warn": 26, "critical": 34,
+     "labels": ["Normal", "Warm", "High"], "unit": "°C", "icon": "🔥", "name": "Temperature",
+     "subject": "CRITICAL TEMPERATURE ALERT", "summary": "Temperature crossed safe limit!",
+     "advice": "Please take immediate action.", "hysteresis": 1},
+    {"key": "humidity", "channel": "Humidity", "direction": "above", "warn": 60, "critical": 70,
+     "labels": ["Normal", "High", "Very High"], "unit": "%", "icon": "💧", "name": "Humidity",
+     "subject": "HIGH HUMIDITY ALERT", "summary": "Humidity crossed critical limit!",
+     "advice": "Risk of mold growth and equipment damage.", "hysteresis": 2},
+    {"key": "pressure", "channel": "Pressure", "direction": "below", "warn": 1000, "critical": 990,
+     "labels": ["Normal", "Moderate", "Low"], "unit": " hPa", "icon": "🌡️", "name": "Pressure",
+     "subject": "LOW PRESSURE ALERT", "summary": "Atmospheric pressure below safe limit!",
+     "advice": "May indicate weather changes or system issues.", "hysteresis": 2},
+    {"key": "co2", "channel": "CO2", "direction": "above", "warn": 800, "critical": 1200,
+     "labels": ["Normal", "Moderate", "High"], "unit": " ppm", "icon": "☁️", "name": "CO₂",
+     "subject": "HIGH CO₂ ALERT", "summary": "CO₂ level crossed safe limit!",
+     "advice": "Ventilation required for occupant safety.", "hysteresis": 50},
+    {"key": "pm25", "channel": "PM2.5", "direction": "above", "warn": 35, "critical": 55,
+     "labels": ["Clean", "Moderate", "High"], "unit": " µg/m³", "icon": "💨", "name": "PM2.5",
+     "subject": "POOR AIR QUALITY ALERT", "summary": "PM2.5 level crossed safe limit!",
+     "advice": "Air purification or ventilation required.", "hysteresis": 5},
+]
+
+
+class Rule:
+    def __init__(self, key, channel, direction, warn, critical, labels=("Normal", "Elevated", "Critical"),
+                 unit="", icon="⚠️", name=None, subject=None, summary=None, advice="", station=None,
+                 hold=5.0, hysteresis=0.0, cooldown=600.0):
+        if direction not in ("above", "below"):
+            raise ValueError(f"direction must be 'above' or 'below', not {direction!r}")
+        self.key = key
+        self.channel = channel
+        self.direction = direction
+        self.warn = float(warn)
+        self.critical = float(critical)
+        self.labels = list(labels)
+        self.unit = unit
+        self.icon = icon
+        self.name = name or channel
+        self.subject = subject or f"{self.name.upper()} ALERT"
+        self.summary = summary or f"{self.name} crossed safe limit!"
+        self.advice = advice
+        self.station = station
+        self.hold = float(hold)
+        self.hysteresis = float(hysteresis)
+        self.cooldown = float(cooldown)
+
+    @property
+    def above(self):
+        return self.direction == "above"
+
+    @property
+    def threshold_label(self):
+        return f"{'>' if self.above else '<'}{self.critical:g}{self.unit}"
+
+    def alert_text(self, value):
+        verb = "exceeded" if self.above else "below"
+        return f"{self.icon} {self.name} {verb} {self.critical:g}{self.unit} (Current: {value}{self.unit})"
+
+    def email(self, value, when, station):
+        body = (f"{self.summary}\n\n"
+                f"Current Value: {value}{self.unit}\n"
+                f"Time: {when.strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"Location: {station}\n"
+                f"Threshold: {self.critical:g}{self.unit}\n\n"
+                f"{self.advice}")
+        return self.subject, body
+
+    def worst(self, values):
+        """Most extreme value in the alarming direction (max for 'above', min for 'below') of a Series."""
+        return values.max() if self.above else values.min()
+
+
+def load_rules(path=None):
+    path = path or os.environ.get("CSMS_RULES_FILE")
+    if path:
+        with open(path) as f:
+            return [Rule(**spec) for spec in json.load(f)]
+    return [Rule(**spec) for spec in DEFAULT_RULES]
+
+
+# -------------------------------------------------
+# VECTORISED EVALUATION
+# -------------------------------------------------
+# Rules compile to per-rule arrays (channel column, sign, warn, critical) and
+# a per-station threshold table. "below" rules are negated so every check is
+# a single `signed_value > signed_threshold`; a batch of N readings is two
+# NumPy comparisons over an (N, rules) array, no Python loop per value.
+
+class RuleEngine:
+    def __init__(self, rules):
+        self.all_rules = list(rules)
+        self.rules = [r for r in self.all_rules if r.station is None]
+        self.by_key = {r.key: r for r in self.rules}
+        self.by_channel = {r.channel: r for r in self.rules}
+        self.channels = list(dict.fromkeys(r.channel for r in self.rules))
+        self.stations = [None] + sorted({r.station for r in self.all_rules if r.station is not None})
+        self._station_idx = {s: i for i, s in enumerate(self.stations)}
+
+        self.col = np.array([self.channels.index(r.channel) for r in self.rules], dtype=np.intp)
+        self.sign = np.array([1.0 if r.above else -1.0 for r in self.rules])
+
+        # (stations, rules) threshold tables, already multiplied by sign
+        warn = np.tile([r.warn for r in self.rules], (len(self.stations), 1))
+        crit = np.tile([r.critical for r in self.rules], (len(self.stations), 1))
+        for r in self.all_rules:
+            if r.station is not None and r.key in self.by_key:
+                j = list(self.by_key).index(r.key)
+                warn[self._station_idx[r.station], j] = r.warn
+                crit[self._station_idx[r.station], j] = r.critical
+        self.warn = warn * self.sign
+        self.crit = crit * self.sign
+
+    def station_index(self, stations):
+        """Map station names to rows of the threshold table (unknown -> default bands)."""
+        return np.array([self._station_idx.get(s, 0) for s in stations], dtype=np.intp)
+
+    def evaluate(self, values, station_idx=None):
+        """values: (N, len(self.channels)) array -> (N, rules) int8 levels (OK / WARN / CRITICAL).
+
+        NaN readings evaluate to OK.
+        """
+        signed = np.asarray(values, dtype=np.float64)[:, self.col] * self.sign
+        if station_idx is None:
+            warn, crit = self.warn[0], self.crit[0]
+        else:
+            warn, crit = self.warn[station_idx], self.crit[station_idx]
+        return (signed > warn).astype(np.int8) + (signed > crit).astype(np.int8)
+
+    def evaluate_reading(self, reading, station=None):
+        """One reading dict -> {rule key: level}."""
+        row = np.array([[reading.get(ch, np.nan) for ch in self.channels]])
+        idx = None if station is None else self.station_index([station])
+        levels = self.evaluate(row, idx)[0]
+        return {r.key: int(level) for r, level in zip(self.rules, levels)}
+
+    def critical(self, reading, station=None):
+        """Rules currently in the critical band for one reading."""
+        levels = self.evaluate_reading(reading, station)
+        return [r for r in self.rules if levels[r.key] == CRITICAL]
+
+    def status(self, channel, value, station=None):
+        """(label, css class) for a table/tile cell; channels without a rule are always safe."""
+        rule = self.by_channel.get(channel)
+        if rule is None:
+            return "Safe", "ok"
+        level = self.evaluate_reading({channel: value}, station)[rule.key]
+        return rule.labels[level], LEVEL_CLASS[level]
+
+    def frame_levels(self, df):
+        """Levels for every row of a DataFrame holding the rule channels (missing columns count as OK)."""
+        values = np.column_stack([df[ch].to_numpy(dtype=np.float64) if ch in df else np.full(len(df), np.nan)
+                                  for ch in self.channels]) if len(df) else np.empty((0, len(self.channels)))
+        return self.evaluate(values)
+
+    def critical_mask(self, df, key):
+        """Boolean array: rows of `df` where rule `key` is in the critical band."""
+        return self.frame_levels(df)[:, list(self.by_key).index(key)] == CRITICAL
+
+    def critical_counts(self, df):
+        """{rule key: number of rows in the critical band}."""
+        levels = self.frame_levels(df)
+        return {r.key: int(n) for r, n in zip(self.rules, (levels == CRITICAL).sum(axis=0))}
+
+    def critical_days(self, df, key):
+        """Boolean Series indexed by calendar day of `df['Date']` (as midnight): days with any critical row for `key`."""
+        mask = pd.Series(self.critical_mask(df, key), index=df.index)
+        # normalize() stays datetime64; grouping on .dt.date builds a Python object per row
+        return mask.groupby(df["Date"].dt.normalize()).any()
+
+
+RULES = RuleEngine(load_rules())
@@ -0,0 +1,172 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# Relative accuracy of the quantile sketches (0.1% of the value, i.e. ~1 hPa on pressure)
+SKETCH_ACCURACY = 0.001
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+# Keys are offset so positive values get keys > 0, negative ones < 0 and ~0 exactly 0
+_KEY_OFFSET = 1 << 20
+_TINY = 1e-9
+
+
+# -------------------------------------------------
+# QUANTILE SKETCH KEYS
+# -------------------------------------------------
+# Log-spaced bins (DDSketch): every value maps to an integer key whose bin
+# is within SKETCH_ACCURACY of it, so a sketch is just {key: count} and two
+# sketches merge by adding counts.
+
+def sketch_keys(x):
+    x = np.asarray(x, dtype=np.float64)
+    mag = np.abs(x)
+    k = np.ceil(np.log(np.maximum(mag, _TINY)) / _LOG_GAMMA).astype(np.int64) + _KEY_OFFSET
+    return np.where(mag < _TINY, 0, np.sign(x).astype(np.int64) * k)
+
+
+def key_values(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    mag = 2 * _GAMMA ** (np.abs(keys) - _KEY_OFFSET) / (_GAMMA + 1)
+    return np.where(keys == 0, 0.0, np.sign(keys) * mag)
+
+
+# -------------------------------------------------
+# MERGEABLE SUMMARY STATISTICS
+# -------------------------------------------------
+# Sufficient statistics for a group of readings over a set of channels:
+#   n[i, j]   readings where both channel i and j are present
+#   sx[i, j]  sum of channel i over those readings     (sy = sx.T)
+#   sxx[i, j] sum of channel i squared over them       (syy = sxx.T)
+#   sxy[i, j] sum of channel i * channel j
+# plus min/max and a quantile sketch per channel. Pairwise-complete
+# correlations, means, variances and percentiles of any union of groups
+# follow from the element-wise sums, so a date range is summarised by
+# merging its rollup buckets instead of rescanning raw rows.
+
+class Summary:
+    def __init__(self, channels):
+        c = len(channels)
+        self.channels = list(channels)
+        self.n = np.zeros((c, c))
+        self.sx = np.zeros((c, c))
+        self.sxx = np.zeros((c, c))
+        self.sxy = np.zeros((c, c))
+        self.min = np.full(c, np.inf)
+        self.max = np.full(c, -np.inf)
+        # (m, 3) int64 rows of (channel index, sketch key, count)
+        self.sketch = np.empty((0, 3), dtype=np.int64)
+
+    @classmethod
+    def from_values(cls, channels, values):
+        """values: (readings, channels) float array, NaN where a channel is missing."""
+        s = cls(channels)
+        x = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(x)
+        m = present.astype(np.float64)
+        xz = np.where(present, x, 0.0)
+        s.n = m.T @ m
+        s.sx = xz.T @ m
+        s.sxx = (xz * xz).T @ m
+        s.sxy = xz.T @ xz
+        if len(x):
+            s.min = np.where(present, x, np.inf).min(axis=0)
+            s.max = np.where(present, x, -np.inf).max(axis=0)
+        col, row = np.nonzero(present.T)
+        if len(col):
+            pairs = np.column_stack([col, sketch_keys(x[row, col])])
+            uniq, counts = np.unique(pairs, axis=0, return_counts=True)
+            s.sketch = np.column_stack([uniq, counts]).astype(np.int64)
+        return s
+
+    @classmethod
+    def merge_all(cls, summaries):
+        """One Summary for the union of the groups; channels are aligned by name."""
+        summaries = [s for s in summaries if s is not None]
+        channels = list(dict.fromkeys(ch for s in summaries for ch in s.channels))
+        out = cls(channels)
+        sketches = []
+        for s in summaries:
+            idx = np.array([channels.index(ch) for ch in s.channels], dtype=np.intp)
+            grid = np.ix_(idx, idx)
+            out.n[grid] += s.n
+            out.sx[grid] += s.sx
+            out.sxx[grid] += s.sxx
+            out.sxy[grid] += s.sxy
+            out.min[idx] = np.minimum(out.min[idx], s.min)
+            out.max[idx] = np.maximum(out.max[idx], s.max)
+            if len(s.sketch):
+                sk = s.sketch.copy()
+                sk[:, 0] = idx[sk[:, 0]]
+                sketches.append(sk)
+        if sketches:
+            sk = np.concatenate(sketches)
+            # (channel, key) packed into one int64 that sorts the same way: a 1-D unique is far cheaper than axis=0
+            packed = (sk[:, 0] << 32) + (sk[:, 1] + (1 << 31))
+            uniq, inv = np.unique(packed, return_inverse=True)
+            counts = np.bincount(inv.ravel(), weights=sk[:, 2])
+            out.sketch = np.column_stack([uniq >> 32, (uniq & 0xFFFFFFFF) - (1 << 31), counts]).astype(np.int64)
+        return out
+
+    # ----- SERIALISATION (one rollup row) -----
+    def to_row(self):
+        moments = np.concatenate([self.n.ravel(), self.sx.ravel(), self.sxx.ravel(), self.sxy.ravel(),
+                                  self.min, self.max])
+        return json.dumps(self.channels), moments.tobytes(), self.sketch.tobytes()
+
+    @classmethod
+    def from_row(cls, channels, moments, sketch):
+        s = cls(json.loads(channels))
+        c = len(s.channels)
+        m = np.frombuffer(moments, dtype=np.float64)
+        s.n, s.sx, s.sxx, s.sxy = (m[i * c * c:(i + 1) * c * c].reshape(c, c).copy() for i in range(4))
+        s.min, s.max = m[4 * c * c:4 * c * c + c].copy(), m[4 * c * c + c:].copy()
+        s.sketch = np.frombuffer(sketch, dtype=np.int64).reshape(-1, 3).copy()
+        return s
+
+    # ----- RESULTS -----
+    def _pick(self, channels):
+        channels = [ch for ch in (channels or self.channels) if ch in self.channels]
+        return channels, np.array([self.channels.index(ch) for ch in channels], dtype=np.intp)
+
+    def count(self):
+        return dict(zip(self.channels, np.diag(self.n).astype(np.int64).tolist()))
+
+    def corr(self, channels=None):
+        """Pairwise-complete Pearson correlation matrix, like DataFrame.corr()."""
+        channels, idx = self._pick(channels)
+        grid = np.ix_(idx, idx)
+        n, sx, sxx, sxy = self.n[grid], self.sx[grid], self.sxx[grid], self.sxy[grid]
+        sy, syy = sx.T, sxx.T
+        with np.errstate(all="ignore"):
+            r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+        r = np.where(n > 1, np.clip(r, -1, 1), np.nan)
+        return pd.DataFrame(r, index=channels, columns=channels)
+
+    def quantiles(self, channel, qs):
+        """Approximate quantiles (within SKETCH_ACCURACY) of one channel."""
+        rows = self.sketch[self.sketch[:, 0] == self.channels.index(channel)]
+        if not len(rows):
+            return np.full(len(qs), np.nan)
+        rows = rows[np.argsort(rows[:, 1])]
+        cum = np.cumsum(rows[:, 2])
+        ranks = np.asarray(qs, dtype=np.float64) * (cum[-1] - 1)
+        return key_values(rows[np.searchsorted(cum, ranks, side="right"), 1])
+
+    def describe(self, channels=None, percentiles=(0.25, 0.5, 0.75)):
+        """Same layout as DataFrame.describe(); percentiles come from the sketches."""
+        channels, idx = self._pick(channels)
+        n, sx, sxx = np.diag(self.n)[idx], np.diag(self.sx)[idx], np.diag(self.sxx)[idx]
+        with np.errstate(all="ignore"):
+            mean = sx / n
+            std = np.sqrt(np.maximum(sxx - n * mean * mean, 0) / (n - 1))
+        lo = np.where(n > 0, self.min[idx], np.nan)
+        hi = np.where(n > 0, self.max[idx], np.nan)
+        rows = {"count": n, "mean": mean, "std": np.where(n > 1, std, np.nan), "min": lo}
+        pct = np.array([self.quantiles(ch, percentiles) for ch in channels]).reshape(len(channels), -1)
+        for j, p in enumerate(percentiles):
+            # Sketch bins are approximate; never report a percentile outside the exact min/max
+            rows[f"{p * 100:g}%"] = np.clip(pct[:, j], lo, hi)
+        rows["max"] = hi
+        return pd.DataFrame(rows, index=channels).T
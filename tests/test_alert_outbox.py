@@ -0,0 +1,192 @@
+import email
+import smtplib
+import socket
+import threading
+import time
+import warnings
+
+import pytest
+
+from alert_outbox import AlertOutbox
+from email_alert import SMTPPool, _message
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    asyncore = pytest.importorskip("asyncore")
+    smtpd = pytest.importorskip("smtpd")
+
+
+class LocalSMTP(smtpd.SMTPServer):
+    """Accepts every message except those whose subject contains REJECT."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), None, decode_data=False)
+        self.received = []
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        msg = email.message_from_bytes(data)
+        if "REJECT" in msg["Subject"]:
+            return "554 message rejected"
+        self.received.append(msg["Subject"])
+
+
+@pytest.fixture
+def smtp():
+    server = LocalSMTP()
+    thread = threading.Thread(target=asyncore.loop, kwargs={"timeout": 0.05}, daemon=True)
+    thread.start()
+    pool = SMTPPool("127.0.0.1", server.socket.getsockname()[1], use_ssl=False, login=False, keepalive=3600)
+    yield server, pool
+    pool.close()
+    asyncore.close_all()
+    thread.join(5)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def outbox(tmp_path, pool, **kwargs):
+    send_each = lambda alerts: pool.send_each([_message(subject, body) for subject, body in alerts])
+    return AlertOutbox(None, path=str(tmp_path / "outbox.db"), batch_sender=send_each, **kwargs)
+
+
+def rows(box):
+    return box._conn.execute("SELECT subject, status, attempts, next_attempt, last_error FROM outbox ORDER BY id").fetchall()
+
+
+def test_batch_delivered_over_one_session(tmp_path, smtp):
+    server, pool = smtp
+    box = outbox(tmp_path, pool)
+    for i in range(5):
+        box.enqueue(f"alert {i}", "body")
+    assert box.drain() == 5
+    assert server.received == [f"alert {i}" for i in range(5)]
+    assert box.counts() == {"sent": 5}
+    assert pool.connects == 1
+
+
+def test_only_rejected_alerts_are_retried(tmp_path, smtp):
+    server, pool = smtp
+    box = outbox(tmp_path, pool, base_delay=2.0)
+    for subject in ("ok 1", "REJECT me", "ok 2"):
+        box.enqueue(subject, "body")
+    started = time.time()
+    box.drain()
+    assert server.received == ["ok 1", "ok 2"]
+    (_, s1, _, _, _), (_, s2, attempts, next_attempt, error), (_, s3, _, _, _) = rows(box)
+    assert (s1, s2, s3) == ("sent", "pending", "sent")
+    assert attempts == 1 and error.startswith("SMTPDataError")
+    assert started + 2.0 <= next_attempt <= time.time() + 2.0
+    # Not due yet: nothing is tried again
+    assert box.drain() == 0
+
+
+def test_backoff_doubles_until_failed(tmp_path):
+    port = free_port()
+    pool = SMTPPool("127.0.0.1", port, use_ssl=False, login=False, keepalive=3600)
+    box = outbox(tmp_path, pool, max_attempts=5, base_delay=1.0, max_delay=4.0)
+    box.enqueue("alert", "body")
+    delays = []
+    for _ in range(5):
+        before = time.time()
+        assert box.drain() == 1
+        _, status, attempts, next_attempt, error = rows(box)[0]
+        assert error.startswith("ConnectionRefusedError")
+        if status == "pending":
+            delays.append(round(next_attempt - before))
+            # Make the row due again instead of waiting for it
+            box._conn.execute("UPDATE outbox SET next_attempt = 0")
+    assert delays == [1, 2, 4, 4]
+    assert (status, attempts) == ("failed", 5)
+    assert box.drain() == 0
+
+
+def test_server_down_then_back(tmp_path, smtp):
+    server, pool = smtp
+    port = pool.port
+    pool.port = free_port()
+    box = outbox(tmp_path, pool)
+    box.enqueue("a", "body")
+    box.enqueue("b", "body")
+    box.drain()
+    assert [r[1:3] for r in rows(box)] == [("pending", 1), ("pending", 1)]
+    pool.port = port
+    box._conn.execute("UPDATE outbox SET next_attempt = 0")
+    box.drain()
+    assert server.received == ["a", "b"]
+    assert [r[1:3] for r in rows(box)] == [("sent", 2), ("sent", 2)]
+
+
+def test_dns_failure_fails_the_batch_without_raising(tmp_path, smtp, monkeypatch):
+    server, pool = smtp
+    connect = pool._connect
+
+    def unresolvable():
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+    monkeypatch.setattr(pool, "_connect", unresolvable)
+    box = outbox(tmp_path, pool)
+    box.enqueue("a", "body")
+    box.enqueue("b", "body")
+    results = pool.send_each([_message("a", "body"), _message("b", "body")])
+    assert [type(r) for r in results] == [socket.gaierror, socket.gaierror]
+    box.drain()
+    assert [r[1:3] for r in rows(box)] == [("pending", 1), ("pending", 1)]
+    monkeypatch.setattr(pool, "_connect", connect)
+    box._conn.execute("UPDATE outbox SET next_attempt = 0")
+    box.drain()
+    assert server.received == ["a", "b"]
+
+
+def test_rejected_message_keeps_the_session(smtp):
+    server, pool = smtp
+    results = pool.send_each([_message("REJECT me", "body"), _message("ok", "body")])
+    assert isinstance(results[0], smtplib.SMTPDataError) and results[1] is None
+    assert server.received == ["ok"]
+    assert pool.connects == 1
+
+
+def test_dropped_session_is_reopened(tmp_path, smtp):
+    server, pool = smtp
+    box = outbox(tmp_path, pool)
+    box.enqueue("first", "body")
+    box.drain()
+    # The connection drops while the session is idle
+    pool._server.sock.shutdown(socket.SHUT_RDWR)
+    box.enqueue("second", "body")
+    box.drain()
+    assert server.received == ["first", "second"]
+    assert box.counts() == {"sent": 2}
+    assert pool.connects == 2
+
+
+def test_unfinished_sends_survive_restart(tmp_path, smtp):
+    server, pool = smtp
+    box = outbox(tmp_path, pool)
+    box.enqueue("alert", "body")
+    box._claim_batch()
+    assert box.counts() == {"sending": 1}
+    restarted = outbox(tmp_path, pool)
+    assert restarted.counts() == {"pending": 1}
+    restarted.drain()
+    assert server.received == ["alert"]
+
+
+def test_single_sender_retries_on_exception(tmp_path):
+    calls = []
+
+    def flaky(subject, body):
+        calls.append(subject)
+        if len(calls) == 1:
+            raise OSError("boom")
+
+    box = AlertOutbox(flaky, path=str(tmp_path / "outbox.db"))
+    box.enqueue("alert", "body")
+    box.drain()
+    assert box.counts() == {"pending": 1}
+    box._conn.execute("UPDATE outbox SET next_attempt = 0")
+    box.drain()
+    assert calls == ["alert", "alert"] and box.counts() == {"sent": 1}
@@ -0,0 +1,107 @@
+import sqlite3
+
+import pytest
+
+from alert_state import ACKNOWLEDGED, FIRING, OK, PENDING, RESOLVED, AlertManager
+from rules import Rule, RuleEngine
+
+STATION = "Lab"
+T0 = 1_700_000_000_000
+
+
+def ms(seconds):
+    return T0 + int(seconds * 1000)
+
+
+@pytest.fixture
+def setup(tmp_path):
+    sent = []
+    engine = RuleEngine([Rule("temperature", "Temperature", "above", 26, 34, hold=5, hysteresis=1, cooldown=600)])
+    path = str(tmp_path / "alerts.db")
+    manager = AlertManager(engine, path, notify=lambda subject, body: sent.append(subject))
+    return manager, sent, path
+
+
+def feed(manager, *readings):
+    manager.observe(STATION, [(ms(s), {"Temperature": v}) for s, v in readings])
+
+
+def incident_rows(path):
+    return sqlite3.connect(path).execute("SELECT state, pending_ts, fired_ts, resolved_ts, peak FROM incidents").fetchall()
+
+
+def test_pending_is_not_written(setup):
+    manager, sent, path = setup
+    feed(manager, (0, 40), (2, 41))
+    assert manager._track(STATION, "temperature").state == PENDING
+    assert incident_rows(path) == []
+    assert sent == []
+
+
+def test_flap_within_hold_is_not_an_incident(setup):
+    manager, sent, path = setup
+    feed(manager, (0, 40), (2, 30), (3, 40), (4, 25))
+    assert manager._track(STATION, "temperature").state == OK
+    assert incident_rows(path) == []
+    assert manager.log(ms(-1), ms(10)) == []
+
+
+def test_fires_after_hold_and_resolves_with_hysteresis(setup):
+    manager, sent, path = setup
+    feed(manager, (0, 40), (3, 45), (5, 42))
+    assert sent == ["TEMPERATURE ALERT"]
+    assert incident_rows(path) == [(FIRING, ms(0), ms(5), None, 45.0)]
+    assert [state for _, _, state, _, _ in manager.log(ms(-1), ms(10))] == [PENDING, FIRING]
+
+    # Below critical but inside the hysteresis band: still firing
+    feed(manager, (6, 33.5))
+    assert manager._track(STATION, "temperature").state == FIRING
+    feed(manager, (7, 32.5))
+    assert incident_rows(path) == [(RESOLVED, ms(0), ms(5), ms(7), 45.0)]
+    assert manager.active() == []
+
+
+def test_cooldown_suppresses_second_notification(setup):
+    manager, sent, path = setup
+    feed(manager, (0, 40), (5, 40), (6, 20), (10, 40), (15, 40))
+    assert len(sent) == 1
+    history = manager.history(ms(-1), ms(20))
+    assert [row["notified"] for row in history] == [0, 1]
+
+    # Past the cooldown the next incident notifies again
+    feed(manager, (16, 20), (700, 40), (705, 40))
+    assert len(sent) == 2
+
+
+def test_acknowledge(setup):
+    manager, sent, path = setup
+    feed(manager, (0, 40), (5, 40))
+    incident = manager.active()[0]["id"]
+    assert manager.acknowledge(incident, "operator")
+    assert not manager.acknowledge(incident, "operator")
+    assert manager.active()[0]["state"] == ACKNOWLEDGED
+    assert manager.active()[0]["acked_by"] == "operator"
+
+
+def test_open_incidents_survive_restart(setup):
+    manager, sent, path = setup
+    feed(manager, (0, 40), (5, 40))
+    restarted = AlertManager(manager.engine, path, notify=lambda subject, body: sent.append(subject))
+    assert restarted._track(STATION, "temperature").state == FIRING
+    # Still firing: no second notification, and it resolves normally
+    restarted.observe(STATION, [(ms(6), {"Temperature": 41}), (ms(7), {"Temperature": 20})])
+    assert len(sent) == 1
+    assert incident_rows(path)[0][0] == RESOLVED
+
+
+def test_partial_readings_do_not_reset_pending(setup):
+    manager, sent, path = setup
+    # Temperature and Humidity arrive on separate lines, so every other reading lacks Temperature
+    readings = []
+    for s in range(20):
+        readings.append((ms(s), {"Temperature": 40.0}))
+        readings.append((ms(s + 0.5), {"Humidity": 50.0}))
+    manager.observe(STATION, readings)
+    assert manager._track(STATION, "temperature").state == FIRING
+    assert sent == ["TEMPERATURE ALERT"]
+    assert incident_rows(path)[0][:3] == (FIRING, ms(0), ms(5))
@@ -0,0 +1,79 @@
+import numpy as np
+
+from anomaly import OUTLIER, SPIKE, STUCK, AnomalyDetector, kinds
+
+CHANNELS = ["Temperature", "CO2"]
+T0 = 1_700_000_000_000
+
+
+def noisy(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([22 + rng.normal(0, 0.2, n), 600 + rng.normal(0, 10, n)])
+
+
+def feed(detector, station, values, start=0):
+    ts = T0 + (start + np.arange(len(values))) * 1000
+    return detector.observe([(station, ts, values)])
+
+
+def test_kinds():
+    assert kinds(SPIKE | STUCK) == ["spike", "stuck sensor"]
+    assert kinds(0) == []
+
+
+def test_spike_is_flagged_once_and_clears_after_quiet_readings():
+    detector = AnomalyDetector(CHANNELS, warmup=30, quiet=5)
+    onsets, clears = feed(detector, "Lab", noisy(200))
+    assert onsets == [] and clears == []
+
+    spike = noisy(1, seed=1)
+    spike[0, 1] = 5000
+    onsets, _ = feed(detector, "Lab", spike, start=200)
+    assert len(onsets) == 1
+    station, ts, channel, flags, value, score = onsets[0]
+    assert (station, ts, channel, value) == ("Lab", T0 + 200_000, "CO2", 5000)
+    assert flags & (SPIKE | OUTLIER) and score > 4
+    assert "CO2" in detector.flags("Lab")
+
+    _, clears = feed(detector, "Lab", noisy(10, seed=2), start=201)
+    assert [(c[0], c[2]) for c in clears] == [("Lab", "CO2")]
+    assert detector.flags("Lab") == {}
+
+
+def test_outliers_do_not_move_the_baseline():
+    detector = AnomalyDetector(CHANNELS)
+    feed(detector, "Lab", noisy(200))
+    mean = detector._state["mean"][0].copy()
+    feed(detector, "Lab", np.array([[22.0, 9000.0]]), start=200)
+    assert abs(detector._state["mean"][0, 1] - mean[1]) < 1
+
+
+def test_stuck_sensor():
+    detector = AnomalyDetector(CHANNELS, stuck_after=20)
+    values = noisy(100)
+    values[50:, 0] = 21.5
+    onsets, _ = feed(detector, "Lab", values)
+    stuck = [o for o in onsets if o[3] & STUCK]
+    # The 20th repeat after the first stuck reading
+    assert [(o[2], o[1]) for o in stuck] == [("Temperature", T0 + 70_000)]
+
+
+def test_missing_readings_are_skipped():
+    detector = AnomalyDetector(CHANNELS)
+    values = noisy(100)
+    values[::2, 1] = np.nan
+    assert feed(detector, "Lab", values) == ([], [])
+    assert detector._state["n"][0].tolist() == [100, 50]
+
+
+def test_stations_in_one_batch_match_separate_batches():
+    together, apart = AnomalyDetector(CHANNELS), AnomalyDetector(CHANNELS)
+    a, b = noisy(120, seed=3), noisy(80, seed=4)
+    a[100, 0] = b[70, 1] = 1e4
+    ts_a, ts_b = T0 + np.arange(120) * 1000, T0 + np.arange(80) * 1000
+    onsets, _ = together.observe([("A", ts_a[:60], a[:60]), ("B", ts_b, b), ("A", ts_a[60:], a[60:])])
+    separate = apart.observe([("A", ts_a, a)])[0] + apart.observe([("B", ts_b, b)])[0]
+    assert sorted(onsets) == sorted(separate)
+    assert {o[:3] for o in onsets} == {("A", T0 + 100_000, "Temperature"), ("B", T0 + 70_000, "CO2")}
+    for field in AnomalyDetector.FIELDS:
+        assert np.allclose(together._state[field], apart._state[field])
@@ -0,0 +1,70 @@
+import base64
+import hashlib
+import os
+
+import pytest
+
+import assets
+from assets import asset_url, data_uri
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(assets, "STATIC_DIR", str(tmp_path / "static"))
+    monkeypatch.setattr(assets, "INLINE_ASSETS", False)
+    assets._published_name.clear()
+    data_uri.clear()
+    yield tmp_path
+    assets._published_name.clear()
+    data_uri.clear()
+
+
+def write(site, name, data):
+    with open(site / name, "wb") as f:
+        f.write(data)
+
+
+def test_images_get_content_hashed_static_urls(site):
+    data = b"\x89PNG first"
+    write(site, "logo.png", data)
+    url = asset_url("logo.png")
+    name = f"logo.{hashlib.sha256(data).hexdigest()[:8]}.png"
+    assert url == f"app/static/{name}"
+    with open(site / "static" / name, "rb") as f:
+        assert f.read() == data
+    assert asset_url("logo.png") == url
+
+    # A changed file is published under a new name (once the process cache is dropped)
+    write(site, "logo.png", b"\x89PNG second")
+    assets._published_name.clear()
+    assert asset_url("logo.png") != url
+    assert sorted(os.listdir(site / "static")) == sorted([name, asset_url("logo.png").rsplit("/", 1)[1]])
+
+
+def test_audio_and_inline_mode_use_data_uris(site, monkeypatch):
+    write(site, "beep.mp3", b"ID3 audio")
+    assert asset_url("beep.mp3") == "data:audio/mpeg;base64," + base64.b64encode(b"ID3 audio").decode()
+    write(site, "bg.png", b"\x89PNG bg")
+    monkeypatch.setattr(assets, "INLINE_ASSETS", True)
+    assert asset_url("bg.png").startswith("data:image/png;base64,")
+    assert not os.path.exists(site / "static")
+
+
+def test_missing_files_fall_back(site):
+    assert asset_url("nope.png", fallback="fallback.png") == "fallback.png"
+    assert asset_url("nope.mp3", fallback="data:,") == "data:,"
+    assert data_uri("nope.mp3") is None
+
+
+def test_webp_only_when_smaller(site):
+    pytest.importorskip("PIL")
+    from io import BytesIO
+
+    from PIL import Image
+
+    out = BytesIO()
+    Image.new("RGB", (256, 256), (40, 90, 160)).save(out, format="PNG", compress_level=0)
+    write(site, "bg1.png", out.getvalue())
+    assert asset_url("bg1.png", webp=True).endswith(".webp")
+    assert asset_url("bg1.png").endswith(".png")
@@ -0,0 +1,76 @@
+import numpy as np
+
+from decimate import box_summary, decimate, decimate_frame, envelope, histogram, lttb_indices, minmax_indices
+
+
+def series(n=10_000, seed=3):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 500) + rng.normal(0, 0.05, n)
+    y[int(n * 0.43)] = 25.0
+    y[int(n * 0.78)] = -25.0
+    return x, y
+
+
+def test_small_input_is_untouched():
+    x, y = series(50)
+    assert lttb_indices(x, y, 100).tolist() == list(range(50))
+    assert minmax_indices(x, y, 100).tolist() == list(range(50))
+
+
+def test_lttb_keeps_ends_and_peaks():
+    x, y = series()
+    idx = lttb_indices(x, y, 500)
+    assert len(idx) == 500
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 4300 in idx and 7800 in idx
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    x, y = series()
+    idx = minmax_indices(x, y, 200)
+    assert len(idx) <= 200
+    assert 4300 in idx and 7800 in idx
+    assert y[idx].max() == y.max() and y[idx].min() == y.min()
+
+
+def test_decimate_drops_nan_and_works_on_datetimes():
+    x, y = series(5000)
+    y[::7] = np.nan
+    t = np.datetime64("2024-01-01T00:00:00") + x.astype("timedelta64[s]")
+    dx, dy = decimate(t, y, 300)
+    assert len(dx) == 300 and not np.isnan(dy).any()
+    assert dx.dtype == t.dtype and np.all(np.diff(dx) > np.timedelta64(0, "s"))
+
+
+def test_envelope_merges_bucket_extremes():
+    x = np.arange(10)
+    lo = np.arange(10, dtype=np.float64)
+    hi = lo + 100
+    lo[3] = np.nan
+    ex, ey = envelope(x, lo, hi, points=100)
+    assert ex.tolist() == np.repeat(np.delete(x, 3), 2).tolist()
+
+    ex, ey = envelope(x, np.arange(10.0), np.arange(10.0) + 100, points=4)
+    # Two merged buckets: the lowest low and the highest high of each half
+    assert ex.tolist() == [0, 0, 5, 5]
+    assert ey.tolist() == [0.0, 104.0, 5.0, 109.0]
+
+
+def test_decimate_frame_uses_minmax_for_spiky_channels():
+    import pandas as pd
+
+    x, y = series()
+    df = pd.DataFrame({"t": x, "PM2.5": y})
+    out = decimate_frame(df, "t", "PM2.5", 100)
+    assert len(out) <= 100 and 4300 in out.index and 7800 in out.index
+
+
+def test_histogram_and_box_summary():
+    values = np.concatenate([np.arange(100.0), [np.nan]])
+    centers, counts, widths = histogram(values, bins=10)
+    assert counts.sum() == 100 and len(centers) == len(widths) == 10
+    box = box_summary(values)
+    assert box["median"] == [49.5] and box["lowerfence"] == [0.0] and box["upperfence"] == [99.0]
+    assert histogram([np.nan])[0].size == 0 and box_summary([]) == {}
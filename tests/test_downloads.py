@@ -0,0 +1,55 @@
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from downloads import DownloadLinks, _Handler
+
+
+def test_links_are_reused_then_renewed(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("downloads.time.time", lambda: now[0])
+    links = DownloadLinks(ttl=100)
+    token = links.issue("s1", "/a.pdf", "a.pdf", "application/pdf")
+    assert links.issue("s1", "/a.pdf", "a.pdf", "application/pdf") == token
+    assert links.issue("s2", "/a.pdf", "a.pdf", "application/pdf") != token
+    now[0] += 60
+    renewed = links.issue("s1", "/a.pdf", "a.pdf", "application/pdf")
+    assert renewed != token and links.resolve(token) is not None
+    now[0] += 50
+    assert links.resolve(token) is None
+    assert links.resolve(renewed)["path"] == "/a.pdf"
+    assert links.resolve("unknown") is None
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.links = DownloadLinks(ttl=60)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_streams_the_file(server, tmp_path):
+    path = tmp_path / "report.csv"
+    data = b"x" * (3 * 2 ** 20 + 5)
+    path.write_bytes(data)
+    token = server.links.issue("s", str(path), "Daily report.csv", "text/csv")
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/download/{token}") as resp:
+        assert resp.headers["Content-Type"] == "text/csv"
+        assert resp.headers["Content-Length"] == str(len(data))
+        assert resp.headers["Content-Disposition"] == "attachment; filename*=UTF-8''Daily%20report.csv"
+        assert resp.read() == data
+
+
+def test_unknown_token_or_missing_file_is_404(server, tmp_path):
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    token = server.links.issue("s", str(tmp_path / "gone.pdf"), "gone.pdf", "application/pdf")
+    for url in (f"{base}/download/nope", f"{base}/download/{token}", f"{base}/"):
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(url)
+        assert e.value.code == 404
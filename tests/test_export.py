@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from export import HOUR_MS, iter_chunks, write_export
+from tsdb import TimeSeriesStore, ms_to_datetime
+
+T0 = 1_699_920_000_000
+STATIONS = ["Lab", "Roof"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = TimeSeriesStore(str(tmp_path / "ts.db"))
+    ts = T0 + np.arange(0, 50 * HOUR_MS, 60_000, dtype=np.int64)
+    s.write_frame("Lab", ts, {"Temperature": np.arange(len(ts), dtype=np.float64), "Humidity": np.full(len(ts), 40.0)})
+    s.write_frame("Roof", ts[::2], {"Temperature": np.full(len(ts[::2]), -1.0)})
+    yield s
+    s.close()
+
+
+def expected(store, start, end):
+    frames = []
+    for lo in range(start, end + 1, 24 * HOUR_MS):
+        for station in STATIONS:
+            df = store.frame(station, lo, min(lo + 24 * HOUR_MS - 1, end), ["Temperature", "Humidity"])
+            df.insert(1, "Station", station)
+            frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_chunks_cover_the_range_once(store):
+    chunks = list(iter_chunks(store, STATIONS, T0, T0 + 50 * HOUR_MS, ["Temperature"], chunk_ms=7 * HOUR_MS))
+    lab = np.concatenate([ts for station, ts, _ in chunks if station == "Lab"])
+    assert len(lab) == 3000 and np.all(np.diff(lab) > 0)
+    assert [station for station, _, _ in chunks[:2]] == ["Lab", "Roof"]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_formats_hold_the_same_rows(store, tmp_path, fmt):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"out.{fmt}"
+    progress = []
+    end = T0 + 50 * HOUR_MS - 1
+    rows = write_export(store, fmt, str(path), STATIONS, T0, end, ["Temperature", "Humidity"],
+                        progress=lambda p, text: progress.append(p))
+    assert rows == 4500
+    assert 0 < progress[0] and progress[-1] == pytest.approx(1.0, abs=1e-3)
+
+    if fmt == "csv":
+        got = pd.read_csv(path, parse_dates=["Date"])
+    elif fmt == "parquet":
+        got = pd.read_parquet(path)
+    else:
+        import pyarrow as pa
+        got = pa.ipc.open_file(str(path)).read_all().to_pandas()
+    want = expected(store, T0, end)
+    assert list(got.columns) == ["Date", "Station", "Temperature", "Humidity"]
+    pd.testing.assert_frame_equal(got, want, check_dtype=False)
+
+
+def test_dates_are_local_time(store, tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow as pa
+
+    path = tmp_path / "out.arrow"
+    write_export(store, "arrow", str(path), ["Lab"], T0, T0 + HOUR_MS - 1, ["Temperature"])
+    table = pa.ipc.open_file(str(path)).read_all()
+    assert table.schema.field("Date").type == pa.timestamp("ms")
+    assert table["Date"].to_pandas().tolist() == list(ms_to_datetime(T0 + np.arange(60, dtype=np.int64) * 60_000))
+
+
+def test_unknown_format(store, tmp_path):
+    with pytest.raises(ValueError):
+        write_export(store, "xlsx", str(tmp_path / "x"), STATIONS, T0, T0 + 1)
@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+pytest.importorskip("statsmodels")
+
+from forecast import HOUR_MS, ForecastService, fit_forecast
+
+T0 = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+
+
+def daily_cycle(hours, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = T0 + np.arange(hours, dtype=np.int64) * HOUR_MS
+    return ts, 25 + 3 * np.sin(2 * np.pi * np.arange(hours) / 24) + rng.normal(0, 0.1, hours)
+
+
+def test_seasonal_fit_follows_the_cycle():
+    ts, values = daily_cycle(24 * 5)
+    result = fit_forecast(ts, values, horizon=24)
+    assert result["seasonal"] and result["trained_to"] == ts[-1]
+    assert result["ts"][0] == ts[-1] + HOUR_MS and len(result["mean"]) == 24
+    expected = 25 + 3 * np.sin(2 * np.pi * np.arange(24 * 5, 24 * 6) / 24)
+    assert np.abs(result["mean"] - expected).max() < 1
+    assert np.all(result["lower"] <= result["mean"]) and np.all(result["mean"] <= result["upper"])
+    # Warm start from the previous parameters
+    again = fit_forecast(ts, values, horizon=24, start_params=result["params"])
+    assert np.allclose(again["mean"], result["mean"], atol=0.1)
+
+
+def test_short_history_drops_the_season_and_fills_gaps():
+    ts, values = daily_cycle(30)
+    keep = np.ones(30, dtype=bool)
+    keep[10:13] = False
+    result = fit_forecast(ts[keep], values[keep], horizon=6)
+    assert not result["seasonal"] and len(result["ts"]) == 6
+
+
+class FakeStore:
+    def __init__(self, hours):
+        self.ts, self.values = daily_cycle(hours)
+        self.calls = 0
+
+    def rollup_range(self, station, channel, tier, start_ms, end_ms):
+        self.calls += 1
+        ok = (self.ts >= start_ms) & (self.ts <= end_ms)
+        return {"ts": self.ts[ok], "mean": self.values[ok], "count": np.ones(ok.sum(), dtype=np.int64)}
+
+
+def wait_for(service, channel, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with service._lock:
+            if not service._running:
+                break
+        time.sleep(0.05)
+    return service.get(channel, station="Lab", horizon=6)
+
+
+def test_service_refits_only_on_new_buckets(monkeypatch):
+    store = FakeStore(24 * 3)
+    # Fits anchor on the last complete hour before now
+    monkeypatch.setattr(time, "time", lambda: (int(store.ts[-1]) + 2 * HOUR_MS) / 1000)
+    service = ForecastService(store, stations=["Lab"], channels=["Temperature"], workers=1)
+    service._pool.shutdown()
+    service._pool = ThreadPoolExecutor(1)
+    try:
+        assert service.get("Temperature", station="Lab") is None
+        assert service.refresh() == 1
+        first = wait_for(service, "Temperature")
+        assert first["trained_to"] == store.ts[-1] and len(first["mean"]) == 6
+        assert service.refresh() == 0
+
+        store.ts, store.values = daily_cycle(24 * 3 + 1)
+        monkeypatch.setattr(time, "time", lambda: (int(store.ts[-1]) + 2 * HOUR_MS) / 1000)
+        assert service.refresh() == 1
+        assert wait_for(service, "Temperature")["trained_to"] == store.ts[-1]
+        assert service.error("Temperature", station="Lab") is None
+    finally:
+        service._pool.shutdown()
+
+
+def test_too_little_history_is_not_fitted(monkeypatch):
+    store = FakeStore(11)
+    monkeypatch.setattr(time, "time", lambda: (int(store.ts[-1]) + 2 * HOUR_MS) / 1000)
+    service = ForecastService(store, stations=["Lab"], channels=["Temperature"], workers=1)
+    try:
+        assert service.refresh() == 0 and store.calls == 1
+    finally:
+        service.stop()
@@ -0,0 +1,107 @@
+import socket
+import time
+
+import pytest
+
+from ingestion import CHANNELS, Ingestor, SimulatorSource, Source, TCPSource, UDPSource, make_source, parse_line
+
+
+class ScriptedSource(Source):
+    """Hands out the given batches one per poll, then nothing; an Exception in the script is raised instead."""
+    name = "scripted"
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.opened = 0
+        self.closed = 0
+
+    def open(self):
+        self.opened += 1
+
+    def poll(self, timeout):
+        if not self.script:
+            time.sleep(0.01)
+            return []
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        self.closed += 1
+
+
+def run_until(ingestor, done, timeout=5):
+    ingestor.start()
+    deadline = time.time() + timeout
+    while not done() and time.time() < deadline:
+        time.sleep(0.01)
+    ingestor.stop()
+    assert done()
+
+
+def test_parse_line_formats():
+    assert parse_line('{"ts": 1000, "Temperature": 24.5, "CO2": "600"}') == (1000, {"Temperature": 24.5, "CO2": 600.0})
+    assert parse_line(b"ts=2000,Humidity=50 Noise=40") == (2000, {"Humidity": 50.0, "Noise": 40.0})
+    ts, values = parse_line("Pressure=1000")
+    assert values == {"Pressure": 1000.0} and abs(ts - time.time() * 1000) < 5000
+    for junk in ("", "   ", "hello", "Temperature=warm", "{not json", '{"Unknown": 1}', "[1, 2]"):
+        assert parse_line(junk) is None
+
+
+def test_make_source():
+    sim = make_source("sim?rate=100&seed=7")
+    assert isinstance(sim, SimulatorSource) and sim.period == pytest.approx(0.01)
+    assert isinstance(make_source("udp://127.0.0.1:5000"), UDPSource)
+    assert isinstance(make_source("tcp://0.0.0.0:5001"), TCPSource)
+    with pytest.raises(ValueError):
+        make_source("ftp://example.com")
+
+
+def test_readings_reach_buffer_and_sink():
+    batches = []
+    source = ScriptedSource([[(1000, {"Temperature": 20.0})], [(2000, {"Temperature": 21.0, "CO2": 500.0})]])
+    ingestor = Ingestor(source, capacity=10, sink=batches.append)
+    run_until(ingestor, lambda: ingestor.received == 2 and len(batches) == 2)
+    assert ingestor.buffer.timestamps().tolist() == [1000, 2000]
+    assert ingestor.latest()["CO2"] == 500.0
+    assert list(ingestor.buffer.channels) == CHANNELS
+
+
+def test_sink_failure_keeps_the_source_open():
+    calls = []
+
+    def sink(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise OSError("database is locked")
+
+    source = ScriptedSource([[(1000, {"Noise": 30.0})], [(2000, {"Noise": 31.0})]])
+    ingestor = Ingestor(source, capacity=10, sink=sink)
+    run_until(ingestor, lambda: len(calls) == 2)
+    assert (ingestor.sink_errors, ingestor.errors) == (1, 0)
+    assert isinstance(ingestor.last_sink_error, OSError)
+    assert source.opened == 1
+    assert ingestor.buffer.timestamps().tolist() == [1000, 2000]
+
+
+def test_source_failure_reopens_the_source():
+    source = ScriptedSource([ConnectionResetError("gone"), [(1000, {"Noise": 30.0})]])
+    ingestor = Ingestor(source, capacity=10)
+    run_until(ingestor, lambda: ingestor.received == 1)
+    assert ingestor.errors == 1 and source.opened == 2 and source.closed >= 1
+
+
+def test_udp_source_receives_datagrams():
+    source = UDPSource("127.0.0.1", 0)
+    source.open()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(b"ts=1000,Temperature=20\nts=2000,Temperature=21\n", source.sock.getsockname())
+        readings = []
+        deadline = time.time() + 5
+        while len(readings) < 2 and time.time() < deadline:
+            readings += source.poll(0.1)
+    finally:
+        source.close()
+    assert readings == [(1000, {"Temperature": 20.0}), (2000, {"Temperature": 21.0})]
@@ -0,0 +1,39 @@
+import sys
+import threading
+
+import lazy_imports
+from lazy_imports import (DASHBOARD_IMPORT_BUDGET, HEAVY, LOGIN_CHAIN, LOGIN_IMPORT_BUDGET, LazyModule, import_cost,
+                          lazy_import)
+
+
+def test_login_chain_stays_light_and_within_budget():
+    seconds, added = import_cost(LOGIN_CHAIN)
+    assert "router" in added and "login" in added
+    assert [h for h in HEAVY if h in added] == []
+    assert seconds <= LOGIN_IMPORT_BUDGET
+
+
+def test_dashboard_import_within_budget():
+    seconds, added = import_cost("dashboard")
+    assert "pandas" in added
+    assert seconds <= DASHBOARD_IMPORT_BUDGET
+
+
+def test_lazy_module_imports_on_first_use():
+    sys.modules.pop("colorsys", None)
+    module = lazy_import("colorsys")
+    assert isinstance(module, LazyModule) and "colorsys" not in sys.modules
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert "colorsys" in sys.modules
+    # Already imported: the real module is handed out
+    assert lazy_import("colorsys") is sys.modules["colorsys"]
+
+
+def test_preload_runs_once_then_continues(monkeypatch):
+    monkeypatch.setattr(lazy_imports, "_preload_thread", None)
+    monkeypatch.setattr(lazy_imports, "preloaded", threading.Event())
+    calls = []
+    lazy_imports.preload(("json", "no_such_module_here"), then=lambda: calls.append(1))
+    lazy_imports.preload(("json",), then=lambda: calls.append(2))
+    assert lazy_imports.preloaded.wait(10)
+    assert calls == [1]
@@ -0,0 +1,103 @@
+import math
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, Registry, _Handler, counter
+
+
+def sample_lines(registry):
+    return [ln for ln in registry.exposition().splitlines() if not ln.startswith("#")]
+
+
+def test_counter_sums_across_threads():
+    registry = Registry()
+    c = registry.get_or_create(Counter, "c_total", "help", ["source"])
+    child = c.labels("udp")
+
+    def work():
+        for _ in range(1000):
+            child.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Exited threads are folded into the retired total and still count
+    child.inc(5)
+    assert sample_lines(registry) == ['c_total{source="udp"} 8005.0']
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    h = registry.get_or_create(Histogram, "latency_seconds", "help", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        h.observe(value)
+    assert sample_lines(registry) == [
+        'latency_seconds_bucket{le="0.1"} 2.0',
+        'latency_seconds_bucket{le="1.0"} 3.0',
+        'latency_seconds_bucket{le="+Inf"} 4.0',
+        "latency_seconds_sum 2.65",
+        "latency_seconds_count 4.0",
+    ]
+
+
+def test_gauge_function_and_failures():
+    registry = Registry()
+    g = registry.get_or_create(Gauge, "queue", "help")
+    g.set(3)
+    g.inc(2)
+    g.dec()
+    assert sample_lines(registry) == ["queue 4.0"]
+    g.set_function(lambda: 1 / 0)
+    assert sample_lines(registry) == ["queue NaN"]
+
+
+def test_help_and_label_escaping():
+    registry = Registry()
+    c = registry.get_or_create(Counter, "x_total", 'line\none \\ "q"', ["path"])
+    c.labels('a"b\\c').inc()
+    text = registry.exposition()
+    assert '# HELP x_total line\\none \\\\ "q"' in text
+    assert 'x_total{path="a\\"b\\\\c"} 1.0' in text
+
+
+def test_declarations():
+    registry = Registry()
+    c = registry.get_or_create(Counter, "d_total", "help", ["a"])
+    assert registry.get_or_create(Counter, "d_total", "help", ["a"]) is c
+    with pytest.raises(ValueError):
+        registry.get_or_create(Gauge, "d_total", "help", ["a"])
+    with pytest.raises(ValueError):
+        c.labels("x", "y")
+    # Module-level declarations go to the process registry
+    assert counter("csms_test_total", "help") is counter("csms_test_total", "help")
+
+
+def test_http_listener():
+    registry = Registry()
+    registry.get_or_create(Counter, "served_total", "help").inc(2)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics") as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "served_total 2.0" in resp.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/other")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_special_numbers():
+    registry = Registry()
+    g = registry.get_or_create(Gauge, "g", "help", ["k"])
+    g.labels("inf").set(math.inf)
+    g.labels("neg").set(-math.inf)
+    assert sample_lines(registry) == ['g{k="inf"} +Inf', 'g{k="neg"} -Inf']
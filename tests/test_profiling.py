@@ -0,0 +1,78 @@
+import json
+
+import pytest
+import streamlit as st
+
+import profiling
+from profiling import (BUCKETS_MS, CAPTURES_KEPT, Profiler, SectionStats, arm_capture, capture, get_profiler, laps,
+                       section)
+
+
+@pytest.fixture
+def profiler():
+    profiler = get_profiler()
+    profiler.reset()
+    yield profiler
+    profiler.reset()
+
+
+def test_section_stats_quantiles():
+    stats = SectionStats()
+    for ms in [0.3] * 90 + [40] * 9 + [20_000]:
+        stats.add(ms / 1000, ms / 2000, 10)
+    assert stats.quantile(0.5) == 0.5
+    assert stats.quantile(0.95) == 50
+    assert stats.quantile(1.0) == pytest.approx(20_000)
+    summary = stats.to_dict()
+    assert summary["count"] == 100 and summary["alloc_blocks_mean"] == 10
+    assert sum(summary["histogram"].values()) == 100 and summary["histogram"]["slower"] == 1
+    assert len(summary["histogram"]) == len(BUCKETS_MS) + 1
+    assert SectionStats().quantile(0.5) == 0.0
+
+
+def test_profiler_export_and_capture_limit():
+    profiler = Profiler()
+    profiler.record("dashboard", "chart", 0.002, 0.001, 5)
+    profiler.record("dashboard", "chart", 0.004, 0.002, 5)
+    profiler.record("reports", "total", 0.1, 0.05, 0)
+    for i in range(CAPTURES_KEPT + 2):
+        profiler.add_capture({"page": "dashboard", "report": str(i)})
+    data = json.loads(profiler.to_json())
+    assert [(s["page"], s["section"], s["count"]) for s in data["sections"]] == \
+        [("dashboard", "chart", 2), ("reports", "total", 1)]
+    assert [c["report"] for c in data["captures"]] == [str(i) for i in range(2, CAPTURES_KEPT + 2)]
+    profiler.reset()
+    assert profiler.sections() == [] and profiler.captures == []
+
+
+def test_laps_and_sections_record_into_the_shared_profiler(profiler):
+    lap = laps("page")
+    sum(range(1000))
+    lap("first")
+    lap("second")
+    with section("page", "block"):
+        pass
+    assert [name for _, name, _ in profiler.sections()] == ["first", "second", "block"]
+
+
+def test_profiling_off_records_nothing(profiler, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING", False)
+    laps("page")("first")
+    with section("page", "block"):
+        pass
+    assert profiler.sections() == []
+
+
+@pytest.mark.parametrize("mode", ["cprofile", "tracemalloc"])
+def test_armed_capture_runs_once_for_its_page(profiler, mode):
+    arm_capture(mode, "analytics")
+    with capture("dashboard"):
+        pass
+    assert profiler.captures == []
+    with capture("analytics"):
+        [bytearray(1000) for _ in range(100)]
+    with capture("analytics"):
+        pass
+    assert [(c["page"], c["mode"]) for c in profiler.captures] == [("analytics", mode)]
+    assert profiler.captures[0]["report"]
+    assert "profile_capture" not in st.session_state
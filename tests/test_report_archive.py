@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from report_archive import ReportArchive
+
+
+def spec(title="Daily", start=0, fmt="PDF"):
+    return {"title": title, "format": fmt, "start": start, "end": start + 86_400_000, "station": "Lab"}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return ReportArchive(str(tmp_path / "archive"), db_path=str(tmp_path / "archive.db"))
+
+
+def put(archive, name, content, ext=".pdf"):
+    tmp = archive.tmp_path(name)
+    with open(tmp, "wb") as f:
+        f.write(content)
+    return archive.put_file(tmp, ext)
+
+
+def test_identical_content_is_stored_once(archive):
+    first = put(archive, "a", b"same bytes")
+    second = put(archive, "b", b"same bytes")
+    assert first == second
+    assert os.path.exists(archive.path(first[0], ".pdf"))
+    assert os.listdir(os.path.join(archive.root, "tmp")) == []
+    files = [f for d in os.listdir(archive.root) if d != "tmp" for f in os.listdir(os.path.join(archive.root, d))]
+    assert files == [first[0] + ".pdf"]
+    assert put(archive, "c", b"other bytes") != first
+
+
+def test_same_spec_keeps_first_row(archive):
+    digest, size = put(archive, "a", b"report")
+    archive.add(spec(), ".pdf", digest, size, created=1.0)
+    archive.add(spec(), ".pdf", "another", 1, created=2.0)
+    entry = archive.lookup(spec())
+    assert (entry["digest"], entry["created"]) == (digest, 1.0)
+    assert archive.lookup(spec(start=1)) is None
+
+    # An index row whose file was removed is not a hit
+    os.remove(archive.path(digest, ".pdf"))
+    assert archive.lookup(spec()) is None
+
+
+def test_keyset_pagination(archive):
+    # Several rows share a creation time: the id breaks the tie
+    for i in range(23):
+        archive.add(spec(title="Daily" if i % 3 else "Weekly", start=i), ".pdf", f"d{i}", i, created=float(i // 2))
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = archive.page(before=cursor, limit=5)
+        seen += rows
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 5
+    assert len(seen) == 23 and len({r["id"] for r in seen}) == 23
+    keys = [(r["created"], r["id"]) for r in seen]
+    assert keys == sorted(keys, reverse=True)
+
+    weekly, cursor = archive.page(title="Weekly", limit=100)
+    assert cursor is None and {r["title"] for r in weekly} == {"Weekly"} and len(weekly) == 8
+    assert archive.titles() == ["Daily", "Weekly"]
+
+
+def test_exact_page_has_no_next_cursor(archive):
+    for i in range(5):
+        archive.add(spec(start=i), ".pdf", f"d{i}", i, created=float(i))
+    rows, cursor = archive.page(limit=5)
+    assert len(rows) == 5 and cursor is None
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pytest
+
+from report_scheduler import CATCHUP_LIMIT, ReportScheduler, period_end, period_start
+
+
+def ms(*args):
+    return int(datetime(*args).timestamp() * 1000)
+
+
+class FakeJobs:
+    def __init__(self):
+        self.submitted = []
+        self.recovered = 0
+
+    def submit(self, title, fmt, start_ms, end_ms, station, email=False):
+        self.submitted.append((title, fmt, start_ms, end_ms, station, email))
+        return len(self.submitted)
+
+    def recover(self):
+        self.recovered += 1
+        return []
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "schedules.db")
+
+
+def test_period_boundaries():
+    now = ms(2024, 3, 14, 15, 30)  # a Thursday
+    assert period_start("daily", now) == ms(2024, 3, 14)
+    assert period_start("weekly", now) == ms(2024, 3, 11)
+    assert period_start("monthly", now) == ms(2024, 3, 1)
+    assert period_end("daily", ms(2024, 3, 14)) == ms(2024, 3, 15)
+    assert period_end("weekly", ms(2024, 3, 11)) == ms(2024, 3, 18)
+    assert period_end("monthly", ms(2024, 1, 1)) == ms(2024, 2, 1)
+    assert period_end("monthly", ms(2024, 12, 1)) == ms(2025, 1, 1)
+
+
+def test_save_starts_with_current_period_and_keeps_place(db):
+    scheduler = ReportScheduler(FakeJobs(), db_path=db)
+    scheduler.save("daily", True, ["a@example.com"], now_ms=ms(2024, 3, 14, 12))
+    assert scheduler.schedules()["daily"]["next_start"] == ms(2024, 3, 14)
+    scheduler.save("daily", True, ["b@example.com"], now_ms=ms(2024, 3, 20, 12))
+    saved = scheduler.schedules()["daily"]
+    assert (saved["next_start"], saved["recipients"]) == (ms(2024, 3, 14), ["b@example.com"])
+    scheduler.save("daily", False, now_ms=ms(2024, 3, 20, 12))
+    assert scheduler.schedules()["daily"]["next_start"] is None
+    with pytest.raises(ValueError):
+        scheduler.save("hourly", True)
+
+
+def test_tick_queues_ended_periods_up_to_catchup_limit(db):
+    jobs = FakeJobs()
+    scheduler = ReportScheduler(jobs, db_path=db)
+    scheduler.save("daily", True, ["a@example.com"], now_ms=ms(2024, 3, 1, 12))
+    assert scheduler.tick(ms(2024, 3, 1, 23)) == []
+    now = ms(2024, 3, 1 + CATCHUP_LIMIT + 3, 12)
+    assert len(scheduler.tick(now)) == CATCHUP_LIMIT
+    # The most recent periods are the ones rendered; each covers [start, end - 1]
+    title, fmt, start, end, station, email = jobs.submitted[-1]
+    assert (title, fmt, email) == ("Daily Summary", "pdf", ["a@example.com"])
+    assert (start, end) == (ms(2024, 3, 2 + CATCHUP_LIMIT + 1), ms(2024, 3, 3 + CATCHUP_LIMIT + 1) - 1)
+    assert scheduler.schedules()["daily"]["next_start"] == period_start("daily", now)
+    assert scheduler.tick(now) == []
+
+
+def test_only_the_lease_holder_fires_and_recovers(db):
+    first_jobs, second_jobs = FakeJobs(), FakeJobs()
+    first = ReportScheduler(first_jobs, db_path=db, lease_ttl=60)
+    second = ReportScheduler(second_jobs, db_path=db, lease_ttl=60)
+    first.save("daily", True, now_ms=ms(2024, 3, 1, 12))
+    now = ms(2024, 3, 3, 12)
+
+    assert len(first.check(now)) == 2
+    assert second.check(now) == []
+    assert first.check(now) == []
+    assert (first_jobs.recovered, second_jobs.recovered) == (1, 0)
+    assert second_jobs.submitted == []
+
+    # The holder goes away: the other scheduler takes over and recovers its jobs
+    first.release()
+    assert second.acquire()
+    assert second.check(ms(2024, 3, 4, 12)) == [1]
+    assert second_jobs.recovered == 1
+    assert not first.acquire()
+
+
+def test_expired_lease_is_taken_over(db):
+    first = ReportScheduler(FakeJobs(), db_path=db, lease_ttl=10)
+    second = ReportScheduler(FakeJobs(), db_path=db, lease_ttl=10)
+    assert first.acquire(now=1000)
+    assert not second.acquire(now=1005)
+    assert second.acquire(now=1011)
+    assert not first.acquire(now=1012)
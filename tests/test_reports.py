@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+import reports
+from reports import SCHEMA, ReportJobs, run_job
+from tsdb import TimeSeriesStore
+
+STATION = "Lab"
+T0 = 1_699_920_000_000
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "ts.db")
+    store = TimeSeriesStore(path)
+    store.write_frame(STATION, [T0 + i * 60_000 for i in range(120)],
+                      {"Temperature": [20.0 + i / 10 for i in range(120)], "Humidity": [50.0] * 120})
+    store.close()
+    return path
+
+
+def queue_job(db, spec):
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.executescript(SCHEMA)
+        job_id = conn.execute("INSERT INTO report_jobs (title, format, spec, created) VALUES ('t', ?, '{}', 0)",
+                              (spec["format"],)).lastrowid
+    conn.close()
+    return job_id
+
+
+def spec(fmt="csv"):
+    return {"title": "Daily Summary", "format": fmt, "start": T0, "end": T0 + 3_600_000, "station": STATION,
+            "channels": None}
+
+
+def test_run_job_archives_the_file_and_records_progress(db, tmp_path):
+    job_id = queue_job(db, spec())
+    digest, size = run_job(job_id, spec(), db, str(tmp_path / "archive"))
+    path = os.path.join(str(tmp_path / "archive"), digest[:2], digest + ".csv")
+    assert os.path.getsize(path) == size
+    with open(path, encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 1 + 61
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT status, progress, stage FROM report_jobs WHERE id = ?", (job_id,)).fetchone() \
+        == ("running", 1.0, "done")
+    assert os.listdir(str(tmp_path / "archive" / "tmp")) == []
+
+
+def test_run_job_closes_the_store_when_rendering_fails(db, tmp_path, monkeypatch):
+    closed = []
+
+    class Store(TimeSeriesStore):
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    def fail(store, conn, spec, path, progress):
+        store.stations()
+        raise RuntimeError("render failed")
+
+    monkeypatch.setattr(reports, "TimeSeriesStore", Store)
+    monkeypatch.setitem(reports.RENDERERS, "csv", fail)
+    with pytest.raises(RuntimeError):
+        run_job(queue_job(db, spec()), spec(), db, str(tmp_path / "archive"))
+    assert len(closed) == 1
+    assert closed[0]._local.conn is None
+
+
+def wait(jobs, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.job(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_jobs_render_in_workers_and_reuse_the_archive(db, tmp_path):
+    jobs = ReportJobs(db_path=db, archive_dir=str(tmp_path / "archive"), workers=1)
+    first = wait(jobs, jobs.submit("Export", "csv", T0, T0 + 3_600_000, STATION))
+    assert first["status"] == "done", first["error"]
+    assert os.path.exists(jobs.artifact(first))
+    # The same spec again is completed from the archived file without rendering
+    again = jobs.job(jobs.submit("Export", "csv", T0, T0 + 3_600_000, STATION))
+    assert (again["status"], again["digest"]) == ("done", first["digest"])
+    with pytest.raises(ValueError):
+        jobs.submit("Export", "docx", T0, T0 + 1, STATION)
+
+
+def test_recover_resubmits_only_jobs_it_is_not_running(db, tmp_path, monkeypatch):
+    jobs = ReportJobs(db_path=db, archive_dir=str(tmp_path / "archive"), workers=1)
+    started = []
+    monkeypatch.setattr(jobs, "_start", lambda job_id, spec: started.append(job_id))
+    leftover = queue_job(db, spec())
+    jobs._pending.add(queue_job(db, spec()))
+    assert jobs.recover() == [leftover]
+    assert started == [leftover]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from ring_buffer import RingBuffer
+
+CHANNELS = ["Temperature", "Humidity"]
+
+
+def test_appends_wrap_and_stay_contiguous():
+    buf = RingBuffer(CHANNELS, capacity=3)
+    assert len(buf) == 0 and buf.latest() is None
+    for i in range(5):
+        buf.append({"Temperature": float(i), "Humidity": 10.0 + i}, ts=1000 * i)
+    assert len(buf) == 3
+    assert buf.timestamps().tolist() == [2000, 3000, 4000]
+    assert buf.column("Humidity").tolist() == [12.0, 13.0, 14.0]
+    assert buf.column("Temperature", last=2).tolist() == [3.0, 4.0]
+    assert buf.latest() == {"Temperature": 4.0, "Humidity": 14.0}
+    # One slice of the backing array, not a copy
+    assert np.shares_memory(buf.timestamps(), buf._ts)
+
+
+def test_missing_channels_are_nan():
+    buf = RingBuffer(CHANNELS, capacity=4)
+    buf.append({"Temperature": 1.0}, ts=1)
+    buf.append([2.0, 3.0], ts=2)
+    assert np.isnan(buf.column("Humidity")[0])
+    assert buf.column("Humidity")[1] == 3.0
+
+
+def test_extend_matches_appends():
+    rows = np.arange(14, dtype=np.float64).reshape(7, 2)
+    appended, extended = RingBuffer(CHANNELS, capacity=5), RingBuffer(CHANNELS, capacity=5)
+    for i, row in enumerate(rows):
+        appended.append(row, ts=i)
+    extended.extend(range(3), rows[:3])
+    extended.extend(range(3, 7), rows[3:])
+    for a, b in zip(appended.view(), extended.view()):
+        assert np.array_equal(a, b)
+    # A batch longer than the buffer keeps its newest rows
+    big = RingBuffer(CHANNELS, capacity=2)
+    big.extend(range(7), rows)
+    assert big.timestamps().tolist() == [5, 6]
+
+
+def test_views_are_read_only_and_snapshots_are_owned():
+    buf = RingBuffer(CHANNELS, capacity=3)
+    buf.extend([1, 2], [[1.0, 2.0], [3.0, 4.0]])
+    ts, data = buf.view()
+    with pytest.raises(ValueError):
+        ts[0] = 0
+    with pytest.raises(ValueError):
+        data[0, 0] = 0
+    snap_ts, snap_data = buf.snapshot()
+    buf.extend([3, 4, 5], np.zeros((3, 2)))
+    assert snap_ts.tolist() == [1, 2] and snap_data.tolist() == [[1.0, 3.0], [2.0, 4.0]]
+    buf.clear()
+    assert len(buf) == 0 and buf.timestamps().size == 0
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        RingBuffer(CHANNELS, capacity=0)
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tsdb import ROLLUP_TIERS, TimeSeriesStore, pick_tier
+
+STATION = "Lab"
+CHANNELS = ("Temperature", "Humidity")
+DAY = ROLLUP_TIERS["1d"]
+# A UTC midnight, so the range below covers whole day buckets
+T0 = 1_699_920_000_000
+
+
+def samples(n=5000, days=3, seed=1):
+    rng = np.random.default_rng(seed)
+    ts = np.sort(rng.choice(days * DAY, n, replace=False)) + T0
+    temp = rng.normal(22, 3, n)
+    hum = 50 + 0.8 * (temp - 22) + rng.normal(0, 2, n)
+    hum[rng.random(n) < 0.05] = np.nan
+    return ts.astype(np.int64), {"Temperature": temp, "Humidity": hum}
+
+
+def write_in_batches(store, ts, cols, size=700):
+    for lo in range(0, len(ts), size):
+        store.write_frame(STATION, ts[lo:lo + size], {ch: v[lo:lo + size] for ch, v in cols.items()})
+
+
+def raw_frame(ts, cols):
+    return pd.DataFrame({"ts": ts, **cols})
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = TimeSeriesStore(str(tmp_path / "ts.db"))
+    yield s
+    s.close()
+
+
+@pytest.mark.parametrize("tier", list(ROLLUP_TIERS))
+def test_rollups_match_raw(store, tier):
+    ts, cols = samples()
+    write_in_batches(store, ts, cols)
+    width = ROLLUP_TIERS[tier]
+    for ch in CHANNELS:
+        df = raw_frame(ts, cols).dropna(subset=[ch])
+        expected = df.groupby(df["ts"] // width * width)[ch].agg(["min", "max", "mean", "count", "last"])
+        got = store.rollup_range(STATION, ch, tier, T0, T0 + 3 * DAY)
+        assert got["ts"].tolist() == expected.index.tolist()
+        assert got["count"].tolist() == expected["count"].tolist()
+        for stat in ("min", "max", "mean", "last"):
+            np.testing.assert_allclose(got[stat], expected[stat].to_numpy())
+
+
+def test_merged_buckets_match_raw(store):
+    ts, cols = samples()
+    write_in_batches(store, ts, cols)
+    step = 7 * ROLLUP_TIERS["1h"]
+    for ch in CHANNELS:
+        df = raw_frame(ts, cols).dropna(subset=[ch])
+        expected = df.groupby(df["ts"] // step * step)[ch].agg(["min", "max", "mean", "count", "last"])
+        got = store.rollup_range(STATION, ch, "1h", T0, T0 + 3 * DAY, step=step)
+        assert got["ts"].tolist() == expected.index.tolist()
+        assert got["count"].tolist() == expected["count"].tolist()
+        for stat in ("min", "max", "mean", "last"):
+            np.testing.assert_allclose(got[stat], expected[stat].to_numpy())
+
+
+def test_resent_samples_are_counted_once(store):
+    ts, cols = samples(n=1000, days=1)
+    write_in_batches(store, ts, cols, size=300)
+    # The same readings again, an overlapping batch, and repeats inside one batch
+    write_in_batches(store, ts, cols, size=450)
+    store.write_frame(STATION, np.concatenate([ts[:10], ts[:10]]),
+                      {ch: np.concatenate([v[:10] + 100, v[:10] + 100]) for ch, v in cols.items()})
+
+    r = store.rollup_range(STATION, "Temperature", "1d", T0, T0 + DAY)
+    assert r["count"].tolist() == [1000]
+    np.testing.assert_allclose(r["mean"], [cols["Temperature"].mean()])
+    # The first value stored for a timestamp wins
+    _, values = store.range(STATION, "Temperature", ts[0], ts[9])
+    np.testing.assert_allclose(values, cols["Temperature"][:10])
+    assert store.summary(STATION, T0, T0 + DAY - 1).count()["Temperature"] == 1000
+
+
+def test_rebuild_matches_incremental(store):
+    ts, cols = samples(n=2000, days=2)
+    write_in_batches(store, ts, cols)
+    before = store.rollup_range(STATION, "Humidity", "1h", T0, T0 + 2 * DAY)
+    store.rebuild_rollups()
+    after = store.rollup_range(STATION, "Humidity", "1h", T0, T0 + 2 * DAY)
+    for key in before:
+        np.testing.assert_allclose(after[key], before[key])
+
+
+def test_rollup_frame_extremes(store):
+    ts, cols = samples(n=2000, days=1)
+    write_in_batches(store, ts, cols)
+    df = store.rollup_frame(STATION, "1h", T0, T0 + DAY, ["Temperature", "Humidity"], extremes=("Temperature",))
+    assert list(df.columns) == ["Date", "Temperature", "Temperature min", "Temperature max", "Humidity"]
+    raw = raw_frame(ts, cols)
+    hourly = raw.groupby(raw["ts"] // ROLLUP_TIERS["1h"])["Temperature"]
+    np.testing.assert_allclose(df["Temperature min"], hourly.min().to_numpy())
+    np.testing.assert_allclose(df["Temperature max"], hourly.max().to_numpy())
+
+
+def test_pick_tier():
+    assert pick_tier(T0, T0 + 30 * DAY, 1000) == "1min"
+    assert pick_tier(T0, T0 + 365 * DAY, 1000) == "1h"
+    assert pick_tier(T0, T0 + 3650 * DAY, 1000) == "1d"
+    assert pick_tier(T0, T0 + DAY, 2000) is None
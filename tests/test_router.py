@@ -0,0 +1,17 @@
+from router import SessionTracker
+
+
+def test_sessions_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("router.time.time", lambda: now[0])
+    tracker = SessionTracker(ttl=60)
+    tracker.touch("a")
+    tracker.touch("b")
+    tracker.touch("a")
+    assert tracker.count() == 2
+    now[0] += 45
+    tracker.touch("b")
+    now[0] += 30
+    assert tracker.count() == 1
+    now[0] += 61
+    assert tracker.count() == 0
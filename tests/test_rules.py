@@ -0,0 +1,65 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from rules import CRITICAL, OK, WARN, Rule, RuleEngine, load_rules
+
+
+def engine():
+    return RuleEngine([
+        Rule("temperature", "Temperature", "above", 26, 34),
+        Rule("pressure", "Pressure", "below", 1000, 990),
+        Rule("temperature", "Temperature", "above", 20, 25, station="Cold Room"),
+    ])
+
+
+def test_levels_above_and_below():
+    e = engine()
+    levels = e.evaluate(np.array([[20.0, 1013.0], [30.0, 995.0], [40.0, 980.0]]))
+    assert levels.tolist() == [[OK, OK], [WARN, WARN], [CRITICAL, CRITICAL]]
+
+
+def test_band_edges_are_not_crossed():
+    e = engine()
+    assert e.evaluate(np.array([[26.0, 1000.0], [34.0, 990.0]])).tolist() == [[OK, OK], [WARN, WARN]]
+
+
+def test_nan_is_ok():
+    e = engine()
+    assert e.evaluate_reading({"Temperature": np.nan}) == {"temperature": OK, "pressure": OK}
+
+
+def test_station_override():
+    e = engine()
+    assert e.evaluate_reading({"Temperature": 30}, "Cold Room")["temperature"] == CRITICAL
+    assert e.evaluate_reading({"Temperature": 30}, "Elsewhere")["temperature"] == WARN
+    assert [r.key for r in e.critical({"Temperature": 30, "Pressure": 980}, "Cold Room")] == ["temperature",
+                                                                                              "pressure"]
+
+
+def test_status_label():
+    e = engine()
+    assert e.status("Temperature", 40) == ("Critical", "bad")
+    assert e.status("Humidity", 99) == ("Safe", "ok")
+
+
+def test_frame_counts_and_days():
+    e = engine()
+    df = pd.DataFrame({
+        "Date": pd.to_datetime(["2024-01-01 08:00", "2024-01-01 09:00", "2024-01-02 08:00", "2024-01-03 08:00"]),
+        "Temperature": [40.0, 41.0, 20.0, 35.0],
+    })
+    assert e.critical_counts(df) == {"temperature": 3, "pressure": 0}
+    days = e.critical_days(df, "temperature")
+    assert days.tolist() == [True, False, True]
+    assert int(days.sum()) == 2
+
+
+def test_load_rules_from_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"key": "co2", "channel": "CO2", "direction": "above", "warn": 800,
+                                 "critical": 1200}]))
+    rules = load_rules(str(path))
+    assert [r.key for r in rules] == ["co2"]
+    assert RuleEngine(rules).evaluate_reading({"CO2": 1500}) == {"co2": CRITICAL}
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stats import SKETCH_ACCURACY, Summary
+from tsdb import ROLLUP_TIERS, TimeSeriesStore
+
+STATION = "Lab"
+CHANNELS = ("Temperature", "Humidity")
+DAY = ROLLUP_TIERS["1d"]
+# A UTC midnight, so the range below covers whole day buckets
+T0 = 1_699_920_000_000
+
+
+def samples(n=5000, days=3, seed=1):
+    rng = np.random.default_rng(seed)
+    ts = np.sort(rng.choice(days * DAY, n, replace=False)) + T0
+    temp = rng.normal(22, 3, n)
+    hum = 50 + 0.8 * (temp - 22) + rng.normal(0, 2, n)
+    hum[rng.random(n) < 0.05] = np.nan
+    return ts.astype(np.int64), {"Temperature": temp, "Humidity": hum}
+
+
+def write_in_batches(store, ts, cols, size=700):
+    for lo in range(0, len(ts), size):
+        store.write_frame(STATION, ts[lo:lo + size], {ch: v[lo:lo + size] for ch, v in cols.items()})
+
+
+def raw_frame(ts, cols):
+    return pd.DataFrame({"ts": ts, **cols})
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = TimeSeriesStore(str(tmp_path / "ts.db"))
+    yield s
+    s.close()
+
+
+def check_summary(summary, df):
+    desc = summary.describe(list(CHANNELS))
+    expected = df[list(CHANNELS)].describe()
+    for row in ("count", "mean", "std", "min", "max"):
+        np.testing.assert_allclose(desc.loc[row].to_numpy(), expected.loc[row].to_numpy())
+    # Percentiles come from the sketches: within their relative accuracy (plus the bin width)
+    for row in ("25%", "50%", "75%"):
+        np.testing.assert_allclose(desc.loc[row].to_numpy(), expected.loc[row].to_numpy(),
+                                   rtol=4 * SKETCH_ACCURACY)
+    np.testing.assert_allclose(summary.corr(list(CHANNELS)).to_numpy(), df[list(CHANNELS)].corr().to_numpy())
+
+
+def test_summary_matches_raw(tmp_path):
+    store = TimeSeriesStore(str(tmp_path / "ts.db"))
+    ts, cols = samples()
+    write_in_batches(store, ts, cols)
+    df = raw_frame(ts, cols)
+
+    # Whole range (day buckets) and a range with partial days at both ends (hour buckets)
+    check_summary(store.summary(STATION, T0, T0 + 3 * DAY - 1), df)
+    hour = ROLLUP_TIERS["1h"]
+    lo, hi = T0 + 5 * hour, T0 + 2 * DAY + 7 * hour - 1
+    check_summary(store.summary(STATION, lo, hi), df[(df["ts"] >= lo) & (df["ts"] <= hi)])
+
+    # The open buckets are written on close and read back from the database
+    store.close()
+    reopened = TimeSeriesStore(store.path)
+    try:
+        check_summary(reopened.summary(STATION, T0, T0 + 3 * DAY - 1), df)
+    finally:
+        reopened.close()
+
+
+def test_summary_merge_and_serialisation():
+    ts, cols = samples(n=3000)
+    x = np.column_stack([cols[ch] for ch in CHANNELS])
+    parts = [Summary.from_values(list(CHANNELS), x[lo:lo + 500]) for lo in range(0, len(x), 500)]
+    # Merge through the stored form, with channel order differing between groups
+    parts = [Summary.from_row(*p.to_row()) for p in parts]
+    parts.append(Summary.from_values(list(CHANNELS[::-1]), np.empty((0, 2))))
+    check_summary(Summary.merge_all(parts), pd.DataFrame(cols))
+
+
+def test_rebuild_matches_incremental(store):
+    ts, cols = samples(n=2000, days=2)
+    write_in_batches(store, ts, cols)
+    described = store.summary(STATION, T0, T0 + 2 * DAY - 1).describe()
+    store.rebuild_stats()
+    pd.testing.assert_frame_equal(store.summary(STATION, T0, T0 + 2 * DAY - 1).describe(), described)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from time_index import TimeIndex
+
+
+def filled(n=100, capacity=8, **kwargs):
+    index = TimeIndex(["a", "b"], capacity=capacity, **kwargs)
+    ts = np.arange(n, dtype=np.int64) * 10
+    index.append(ts, {"a": ts * 1.0, "b": ts * 2.0})
+    return index
+
+
+def test_bounds_are_inclusive():
+    index = filled()
+    assert index.bounds(100, 200) == (10, 21)
+    assert index.bounds(101, 109) == (11, 11)
+    assert index.bounds(-50, 10_000) == (0, 100)
+    ts, cols = index.slice(100, 200)
+    assert ts.tolist() == list(range(100, 201, 10))
+    assert cols["b"].tolist() == [2.0 * t for t in range(100, 201, 10)]
+
+
+def test_grows_past_capacity_in_order():
+    index = filled(n=10, capacity=4)
+    for lo in range(100, 1000, 30):
+        ts = np.arange(lo, lo + 30, 3, dtype=np.int64)
+        index.append(ts, {"a": ts * 1.0, "b": ts * 2.0})
+    ts, cols = index.slice(0, 10_000)
+    assert np.all(np.diff(ts) > 0)
+    np.testing.assert_array_equal(cols["a"], ts)
+    assert index.first == 0 and index.last == ts[-1]
+
+
+def test_older_rows_are_dropped():
+    index = filled(n=10)
+    assert index.append(np.array([50, 90, 95, 100]), {"a": np.array([0.0, 0.0, 1.0, 2.0])}) == 2
+    ts, cols = index.slice(0, 1000)
+    assert ts[-3:].tolist() == [90, 95, 100]
+    assert cols["a"][-2:].tolist() == [1.0, 2.0]
+    # A channel missing from the batch is NaN for those rows
+    assert np.isnan(cols["b"][-2:]).all()
+
+
+def test_new_channel_is_backfilled_with_nan():
+    index = filled(n=5)
+    index.append(np.array([100]), {"a": np.array([1.0]), "c": np.array([7.0])})
+    _, cols = index.slice(0, 1000)
+    assert np.isnan(cols["c"][:5]).all() and cols["c"][5] == 7.0
+
+
+def test_views_are_read_only_and_stable():
+    index = filled(n=10, capacity=16)
+    ts, cols = index.slice(0, 1000)
+    with pytest.raises(ValueError):
+        cols["a"][0] = 1.0
+    # Appending (even with a reallocation) leaves earlier views untouched
+    index.append(np.arange(100, 1000, 10), {"a": np.zeros(90), "b": np.zeros(90)})
+    assert ts.tolist() == list(range(0, 100, 10))
+    assert cols["a"].tolist() == [float(t) for t in range(0, 100, 10)]
+
+
+def test_retention_drops_old_rows_on_growth():
+    index = filled(n=8, capacity=8, retention_ms=50)
+    index.append(np.array([80, 90]), {"a": np.zeros(2), "b": np.zeros(2)})
+    assert index.first == 40
+    assert len(index) == 6
+
+
+def test_frame():
+    df = filled(n=20).frame(50, 60, ["a"])
+    assert list(df.columns) == ["Date", "a"]
+    assert df["a"].tolist() == [50.0, 60.0]
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from dateutil import tz
+
+from tsdb import TimeSeriesStore, ms_to_datetime, to_ms
+
+STATION = "Lab"
+T0 = 1_699_920_000_000
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = TimeSeriesStore(str(tmp_path / "ts.db"), batch_size=10, flush_interval=3600)
+    yield s
+    s.close()
+
+
+def test_range_is_sorted_and_inclusive(store):
+    store.write_many(STATION, [(T0 + 3000, {"Temperature": 3.0}), (T0 + 1000, {"Temperature": 1.0}),
+                               (T0 + 2000, {"Temperature": 2.0}), (T0 + 4000, {"Temperature": 4.0})])
+    store.flush()
+    ts, values = store.range(STATION, "Temperature", T0 + 1000, T0 + 3000)
+    assert ts.tolist() == [T0 + 1000, T0 + 2000, T0 + 3000]
+    assert values.tolist() == [1.0, 2.0, 3.0]
+    assert ts.dtype == np.int64
+    assert store.range(STATION, "Missing", T0, T0 + 5000)[0].size == 0
+
+
+def test_writes_are_batched(store):
+    store.write_many(STATION, [(T0, {"Temperature": 1.0})])
+    assert store.is_empty()
+    store.write_many(STATION, [(T0 + i, {"Temperature": 1.0, "Humidity": 2.0}) for i in range(1, 6)])
+    assert not store.is_empty()
+
+
+def test_frame_outer_joins_channels(store):
+    store.write_frame(STATION, [T0, T0 + 1000], {"Temperature": [20.0, 21.0]})
+    store.write_frame(STATION, [T0 + 1000, T0 + 2000], {"Humidity": [50.0, 51.0]})
+    df = store.frame(STATION, T0, T0 + 2000)
+    assert list(df.columns) == ["Date", "Temperature", "Humidity"]
+    assert df["Temperature"].tolist()[:2] == [20.0, 21.0] and np.isnan(df["Temperature"].iloc[2])
+    assert np.isnan(df["Humidity"].iloc[0])
+    assert store.stations() == [STATION]
+    assert store.channels(STATION) == ["Temperature", "Humidity"]
+
+
+def test_data_survives_reopen(tmp_path):
+    path = str(tmp_path / "ts.db")
+    first = TimeSeriesStore(path)
+    first.write_many(STATION, [(T0, {"CO2": 400.0})])
+    first.close()
+    again = TimeSeriesStore(path)
+    try:
+        assert again.range(STATION, "CO2", T0, T0)[1].tolist() == [400.0]
+    finally:
+        again.close()
+
+
+def test_local_time_conversion():
+    # Both sides of a year, so a DST change (where the host has one) is crossed
+    stamps = np.array([T0, T0 + 180 * 86_400_000], dtype=np.int64)
+    got = ms_to_datetime(stamps)
+    assert list(got) == [datetime.fromtimestamp(t / 1000) for t in stamps.tolist()]
+    assert [to_ms(d) for d in got] == stamps.tolist()
+
+
+def test_conversion_follows_dst_rules(monkeypatch):
+    berlin = tz.gettz("Europe/Berlin")
+    monkeypatch.setattr("tsdb.LOCAL_TZ", berlin)
+    # Hourly across the last Sunday of March and of October
+    stamps = np.concatenate([np.arange(1_711_846_800_000, 1_711_846_800_000 + 6 * 3_600_000, 3_600_000),
+                             np.arange(1_729_987_200_000, 1_729_987_200_000 + 6 * 3_600_000, 3_600_000)])
+    expected = [datetime.fromtimestamp(t / 1000, berlin).replace(tzinfo=None) for t in stamps.tolist()]
+    assert list(ms_to_datetime(stamps)) == expected
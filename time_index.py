@@ -0,0 +1,114 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from tsdb import ms_to_datetime
+
+
+# -------------------------------------------------
+# TIME-SORTED COLUMN INDEX
+# -------------------------------------------------
+# Historical readings for one station as an int64 epoch-ms array kept in
+# ascending order plus one float64 column per channel. A range is located
+# with two searchsorted calls (O(log n)), and the result is a set of NumPy
+# views of the backing arrays, so selecting a range allocates nothing.
+#
+# Rows are appended in time order into arrays with spare capacity (doubled
+# when full), so growing the index is amortised O(1) per row. Readers get
+# read-only views; appends never touch rows that are already visible. With
+# a `retention_ms`, rows that old are dropped whenever the arrays are
+# reallocated, which keeps a long-running index bounded.
+
+class TimeIndex:
+    def __init__(self, channels=(), capacity=1024, retention_ms=None):
+        self.channels = list(channels)
+        self.retention_ms = retention_ms
+        self._lock = threading.Lock()
+        self._size = 0
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._cols = {ch: np.empty(capacity) for ch in self.channels}
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def first(self):
+        return int(self._ts[0]) if self._size else None
+
+    @property
+    def last(self):
+        return int(self._ts[self._size - 1]) if self._size else None
+
+    # ----- WRITES -----
+    def _reserve(self, n, newest):
+        if self._size + n <= len(self._ts):
+            return
+        lo = 0
+        if self.retention_ms is not None:
+            lo = int(np.searchsorted(self._ts[:self._size], newest - self.retention_ms, "left"))
+        keep = self._size - lo
+        cap = len(self._ts)
+        while cap < keep + n:
+            cap *= 2
+        # Old views keep pointing at the old arrays, which stay valid
+        ts = np.empty(cap, dtype=np.int64)
+        ts[:keep] = self._ts[lo:self._size]
+        self._ts = ts
+        for ch, col in self._cols.items():
+            grown = np.empty(cap)
+            grown[:keep] = col[lo:self._size]
+            self._cols[ch] = grown
+        self._size = keep
+
+    def append(self, ts, columns):
+        """Append rows newer than `last`: `ts` int64 array (ascending), `columns` {channel: array}.
+
+        Rows at or before the current last timestamp are dropped, so the index stays monotonic.
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        keep = slice(None) if not self._size else slice(np.searchsorted(ts, self._ts[self._size - 1], "right"), None)
+        ts = ts[keep]
+        if not len(ts):
+            return 0
+        with self._lock:
+            self._reserve(len(ts), ts[-1])
+            lo, hi = self._size, self._size + len(ts)
+            for ch in columns:
+                if ch not in self._cols:
+                    # A channel seen for the first time: earlier rows have no value for it
+                    self.channels.append(ch)
+                    self._cols[ch] = np.full(len(self._ts), np.nan)
+            self._ts[lo:hi] = ts
+            for ch, col in self._cols.items():
+                values = columns.get(ch)
+                col[lo:hi] = np.nan if values is None else np.asarray(values, dtype=np.float64)[keep]
+            self._size = hi
+        return len(ts)
+
+    # ----- ZERO-COPY READS -----
+    def bounds(self, start_ms, end_ms):
+        """(lo, hi) row positions of start_ms <= ts <= end_ms."""
+        ts = self._ts[:self._size]
+        # int64 keys: a float key would make searchsorted convert the whole array
+        return (int(np.searchsorted(ts, np.int64(start_ms), "left")),
+                int(np.searchsorted(ts, np.int64(end_ms), "right")))
+
+    def _view(self, arr, lo, hi):
+        v = arr[lo:hi]
+        v.flags.writeable = False
+        return v
+
+    def slice(self, start_ms, end_ms, channels=None):
+        """(ts, {channel: values}) views for the range."""
+        with self._lock:
+            lo, hi = self.bounds(start_ms, end_ms)
+            cols = {ch: self._view(self._cols[ch], lo, hi) for ch in (channels or self.channels) if ch in self._cols}
+            return self._view(self._ts, lo, hi), cols
+
+    def frame(self, start_ms, end_ms, channels=None):
+        """DataFrame with a 'Date' column, built on the sliced views without copying the values."""
+        ts, cols = self.slice(start_ms, end_ms, channels)
+        data = {"Date": ms_to_datetime(ts)}
+        data.update(cols)
+        return pd.DataFrame(data, copy=False)
@@ -0,0 +1,540 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil import tz
+
+from stats import Summary
+
+# The host's zone with its DST rules (not the UTC offset in force at import time). gettz()
+# loads the zone file ($TZ or /etc/localtime), whose transition table pandas converts
+# whole arrays with; tzlocal() would be called once per timestamp.
+LOCAL_TZ = tz.gettz()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id      INTEGER PRIMARY KEY,
+    station TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    UNIQUE (station, channel)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    series INTEGER NOT NULL,
+    ts     INTEGER NOT NULL,
+    value  REAL,
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    series  INTEGER NOT NULL,
+    width   INTEGER NOT NULL,
+    bucket  INTEGER NOT NULL,
+    min     REAL,
+    max     REAL,
+    sum     REAL,
+    count   INTEGER,
+    last    REAL,
+    last_ts INTEGER,
+    PRIMARY KEY (series, width, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    station  TEXT NOT NULL,
+    width    INTEGER NOT NULL,
+    bucket   INTEGER NOT NULL,
+    channels TEXT NOT NULL,
+    moments  BLOB NOT NULL,
+    sketch   BLOB NOT NULL,
+    PRIMARY KEY (station, width, bucket)
+) WITHOUT ROWID;
+"""
+
+# Rollup tiers, finest first: name -> bucket width in ms
+ROLLUP_TIERS = {
+    "1min": 60 * 1000,
+    "1h": 60 * 60 * 1000,
+    "1d": 24 * 60 * 60 * 1000,
+}
+
+# Merge a partial bucket into the stored one (SET expressions see the old row)
+ROLLUP_UPSERT = """
+INSERT INTO rollups (series, width, bucket, min, max, sum, count, last, last_ts)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (series, width, bucket) DO UPDATE SET
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    sum = sum + excluded.sum,
+    count = count + excluded.count,
+    last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,
+    last_ts = MAX(last_ts, excluded.last_ts)
+"""
+
+
+# Tiers that also keep joint summary statistics (see stats.Summary)
+STATS_TIERS = ("1h", "1d")
+
+# Batches an open stats bucket collects before they are merged (merging costs the size of the bucket's sketch)
+STATS_MERGE_EVERY = 64
+
+
+def to_ms(dt):
+    """datetime / date / pandas Timestamp (naive = local time) -> epoch ms."""
+    if not isinstance(dt, datetime):
+        dt = datetime(dt.year, dt.month, dt.day)
+    return int(dt.timestamp() * 1000)
+
+
+def ms_to_datetime(ts):
+    """int64 epoch-ms array -> naive local-time DatetimeIndex (what the pages compare against)."""
+    return pd.to_datetime(ts, unit="ms", utc=True).tz_convert(LOCAL_TZ).tz_localize(None)
+
+
+def pick_tier(start_ms, end_ms, points):
+    """Coarsest rollup tier that still gives at least `points` buckets over the range (None = raw)."""
+    span = max(end_ms - start_ms, 0)
+    for name, width in reversed(list(ROLLUP_TIERS.items())):
+        if span // width >= points:
+            return name
+    return None
+
+
+def aggregate(sid, ts, val, width):
+    """Vectorised min/max/sum/count/last per (series, bucket) for a batch of samples -> upsert rows."""
+    keep = ~np.isnan(val)
+    sid, ts, val = sid[keep], ts[keep], val[keep]
+    if not len(ts):
+        return []
+
+    bucket = ts // width * width
+    order = np.lexsort((ts, bucket, sid))
+    sid, bucket, ts, val = sid[order], bucket[order], ts[order], val[order]
+
+    starts = np.concatenate(([0], np.flatnonzero((np.diff(sid) != 0) | (np.diff(bucket) != 0)) + 1))
+    ends = np.append(starts[1:], len(ts)) - 1
+    return list(zip(
+        sid[starts].tolist(),
+        [width] * len(starts),
+        bucket[starts].tolist(),
+        np.minimum.reduceat(val, starts).tolist(),
+        np.maximum.reduceat(val, starts).tolist(),
+        np.add.reduceat(val, starts).tolist(),
+        (ends - starts + 1).tolist(),
+        val[ends].tolist(),
+        ts[ends].tolist(),
+    ))
+
+
+# -------------------------------------------------
+# PERSISTENT TIME-SERIES STORE
+# -------------------------------------------------
+# SQLite in WAL mode: one writer connection fed in batches from the ingest
+# threads, plus one read-only connection per reader thread so page renders
+# never wait on inserts. Samples are keyed by (series, ts) where a series is
+# a (station, channel) pair, which is the range-scan index.
+#
+# Every flush also folds the batch into the 1 min / 1 h / 1 day rollup
+# tables in the same transaction, so long-range queries never touch raw rows.
+# A sample is written once: the first value stored for a (series, ts) wins
+# and later copies are dropped before the insert, so a re-sent reading is
+# never counted twice in the rollups.
+# The 1 h / 1 day tiers additionally keep one joint Summary per station and
+# bucket (moments, cross-products, quantile sketches) for correlations and
+# describe()-style tables over any date range. Summaries of the buckets
+# still receiving data are accumulated in memory and written when the
+# bucket closes (a newer bucket arrives for that station) or at the next
+# checkpoint (every `stats_checkpoint` seconds and on close). summary()
+# reads the in-memory buckets too; other processes see them as of the
+# last checkpoint.
+
+class TimeSeriesStore:
+    def __init__(self, path="csms.db", batch_size=500, flush_interval=1.0, stats_checkpoint=60.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats_checkpoint = stats_checkpoint
+        self._wlock = threading.Lock()
+        self._local = threading.local()
+        self._series = {}
+        self._pending = []
+        self._last_flush = time.time()
+        # Open stats buckets: (station, width) -> {bucket: [Summary, ...] still to be merged}; the lock only guards the dicts
+        self._open_stats = {}
+        self._dirty_stats = set()
+        self._closed_stats = []
+        self._stats_lock = threading.Lock()
+        self._last_checkpoint = time.time()
+
+        self._writer = sqlite3.connect(path, check_same_thread=False)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._writer.executescript(SCHEMA)
+        self._writer.commit()
+        self._series_of = {}
+        for sid, station, channel in self._writer.execute("SELECT id, station, channel FROM series"):
+            self._series[(station, channel)] = sid
+            self._series_of[sid] = (station, channel)
+
+        # Databases written before rollups / summary stats existed get them built once
+        has_samples = self._writer.execute("SELECT 1 FROM samples LIMIT 1").fetchone() is not None
+        if has_samples and self._writer.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None:
+            self.rebuild_rollups()
+        if has_samples and self._writer.execute("SELECT 1 FROM stats LIMIT 1").fetchone() is None:
+            self.rebuild_stats()
+
+    # ----- CONNECTIONS -----
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA query_only=ON")
+            self._local.conn = conn
+        return conn
+
+    def _series_id(self, station, channel):
+        sid = self._series.get((station, channel))
+        if sid is None:
+            self._writer.execute("INSERT OR IGNORE INTO series (station, channel) VALUES (?, ?)",
+                                 (station, channel))
+            sid = self._writer.execute("SELECT id FROM series WHERE station = ? AND channel = ?",
+                                       (station, channel)).fetchone()[0]
+            self._series[(station, channel)] = sid
+            self._series_of[sid] = (station, channel)
+        return sid
+
+    # ----- WRITES -----
+    def write_many(self, station, readings):
+        """Queue [(ts_ms, {channel: value}), ...]; flushed in one transaction per batch."""
+        with self._wlock:
+            for ts, values in readings:
+                for channel, value in values.items():
+                    self._pending.append((self._series_id(station, channel), int(ts), float(value)))
+            if len(self._pending) >= self.batch_size or time.time() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def write_frame(self, station, ts, columns):
+        """Bulk insert: `ts` int64 epoch-ms array, `columns` {channel: float array}."""
+        ts = np.asarray(ts, dtype=np.int64).tolist()
+        with self._wlock:
+            for channel, values in columns.items():
+                sid = self._series_id(station, channel)
+                self._pending.extend(zip([sid] * len(ts), ts, np.asarray(values, dtype=np.float64).tolist()))
+            self._flush_locked()
+
+    def flush(self):
+        with self._wlock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._pending:
+            sid, ts, val = (np.asarray(col) for col in zip(*self._pending))
+            with self._writer:
+                sid, ts, val = self._fresh(sid.astype(np.int64), ts.astype(np.int64), val.astype(np.float64))
+                self._writer.executemany("INSERT OR IGNORE INTO samples (series, ts, value) VALUES (?, ?, ?)",
+                                         zip(sid.tolist(), ts.tolist(), val.tolist()))
+                self._update_rollups(sid, ts, val)
+                self._update_stats(sid, ts, val)
+            self._drop_closed_stats()
+            self._pending = []
+        if time.time() - self._last_checkpoint >= self.stats_checkpoint:
+            with self._writer:
+                self._write_stats()
+        self._last_flush = time.time()
+
+    def _fresh(self, sid, ts, val):
+        """The samples of a batch that are not stored yet (and the first of any repeats within it)."""
+        order = np.lexsort((ts, sid))
+        sid, ts, val = sid[order], ts[order], val[order]
+        keep = np.ones(len(ts), dtype=bool)
+        keep[1:] = (np.diff(sid) != 0) | (np.diff(ts) != 0)
+        # One index range scan per series over the span the batch covers
+        starts = np.flatnonzero(np.diff(sid, prepend=-1))
+        for a, b in zip(starts.tolist(), np.append(starts[1:], len(ts)).tolist()):
+            stored = np.fromiter((t for (t,) in self._writer.execute(
+                "SELECT ts FROM samples WHERE series = ? AND ts BETWEEN ? AND ?",
+                (int(sid[a]), int(ts[a]), int(ts[b - 1])))), dtype=np.int64)
+            if len(stored):
+                keep[a:b] &= ~np.isin(ts[a:b], stored)
+        return sid[keep], ts[keep], val[keep]
+
+    def _update_rollups(self, sid, ts, val):
+        for width in ROLLUP_TIERS.values():
+            self._writer.executemany(ROLLUP_UPSERT, aggregate(sid, ts, val, width))
+
+    def _update_stats(self, sid, ts, val):
+        # Pivot the flat (series, ts, value) batch into one row per reading and station
+        uniq, inv = np.unique(sid, return_inverse=True)
+        station_of = np.array([self._series_of[int(u)][0] for u in uniq], dtype=object)[inv.ravel()]
+        for station in dict.fromkeys(station_of):
+            mine = station_of == station
+            s_sid, s_ts, s_val = sid[mine], ts[mine], val[mine]
+            sids = np.unique(s_sid)
+            channels = [self._series_of[int(u)][1] for u in sids]
+            times, row = np.unique(s_ts, return_inverse=True)
+            x = np.full((len(times), len(sids)), np.nan)
+            x[row.ravel(), np.searchsorted(sids, s_sid)] = s_val
+
+            for tier in STATS_TIERS:
+                width = ROLLUP_TIERS[tier]
+                buckets = times // width * width
+                with self._stats_lock:
+                    open_ = self._open_stats.setdefault((station, width), {})
+                for bucket in np.unique(buckets).tolist():
+                    parts = open_.get(bucket)
+                    if parts is None:
+                        # (Re)opened: continue from what an earlier run or checkpoint stored
+                        row = self._writer.execute(
+                            "SELECT channels, moments, sketch FROM stats WHERE station = ? AND width = ? AND bucket = ?",
+                            (station, width, bucket)).fetchone()
+                        parts = [Summary.from_row(*row)] if row else []
+                    part = Summary.from_values(channels, x[buckets == bucket])
+                    with self._stats_lock:
+                        open_[bucket] = parts + [part]
+                    if len(parts) >= STATS_MERGE_EVERY:
+                        self._merge_open(station, width, bucket)
+                    self._dirty_stats.add((station, width, bucket))
+
+                # Only a station's newest bucket still receives readings; older ones are written out
+                newest = max(open_)
+                closed = [(station, width, bucket) for bucket in open_ if bucket < newest]
+                self._write_stats(closed)
+                self._closed_stats += closed
+
+    def _merge_open(self, station, width, bucket):
+        merged = Summary.merge_all(self._open_stats[(station, width)][bucket])
+        with self._stats_lock:
+            self._open_stats[(station, width)][bucket] = [merged]
+        return merged
+
+    def _write_stats(self, keys=None):
+        """Store changed open stats buckets (all of them by default), inside the caller's transaction."""
+        if keys is None:
+            keys = [(station, width, bucket) for (station, width), open_ in self._open_stats.items()
+                    for bucket in open_]
+            self._last_checkpoint = time.time()
+        for key in keys:
+            if key in self._dirty_stats:
+                self._writer.execute("INSERT OR REPLACE INTO stats VALUES (?, ?, ?, ?, ?, ?)",
+                                     (*key, *self._merge_open(*key).to_row()))
+                self._dirty_stats.discard(key)
+
+    def _drop_closed_stats(self):
+        # Only once their rows are committed, so summary() always finds a bucket in one place or the other
+        with self._stats_lock:
+            for station, width, bucket in self._closed_stats:
+                self._open_stats[(station, width)].pop(bucket, None)
+        self._closed_stats = []
+
+    def rebuild_stats(self, chunk=500000):
+        """Recompute the summary statistics from the raw samples (read in time order)."""
+        with self._wlock, self._writer:
+            self._writer.execute("DELETE FROM stats")
+            with self._stats_lock:
+                self._open_stats.clear()
+            self._dirty_stats.clear()
+            self._closed_stats = []
+            cur = self._writer.cursor()
+            cur.execute("SELECT series, ts, value FROM samples ORDER BY ts")
+            carry = []
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                rows = carry + rows
+                # Keep the last timestamp's readings for the next chunk so a reading is never split
+                last = rows[-1][1]
+                cut = len(rows)
+                while cut and rows[cut - 1][1] == last:
+                    cut -= 1
+                rows, carry = rows[:cut], rows[cut:]
+                if rows:
+                    sid, ts, val = (np.asarray(col) for col in zip(*rows))
+                    self._update_stats(sid.astype(np.int64), ts.astype(np.int64), val.astype(np.float64))
+            if carry:
+                sid, ts, val = (np.asarray(col) for col in zip(*carry))
+                self._update_stats(sid.astype(np.int64), ts.astype(np.int64), val.astype(np.float64))
+            self._write_stats()
+        self._drop_closed_stats()
+
+    def rebuild_rollups(self, chunk=500000):
+        """Recompute every rollup tier from the raw samples."""
+        with self._wlock, self._writer:
+            self._writer.execute("DELETE FROM rollups")
+            cur = self._writer.cursor()
+            cur.execute("SELECT series, ts, value FROM samples")
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                sid, ts, val = (np.asarray(col) for col in zip(*rows))
+                self._update_rollups(sid.astype(np.int64), ts.astype(np.int64), val.astype(np.float64))
+
+    def close(self):
+        with self._wlock:
+            self._flush_locked()
+            with self._writer:
+                self._write_stats()
+        self._writer.close()
+        # Only the calling thread's reader can be closed here; other threads' go with the threads
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ----- READS -----
+    def is_empty(self):
+        return self._reader().execute("SELECT 1 FROM samples LIMIT 1").fetchone() is None
+
+    def stations(self):
+        return [r[0] for r in self._reader().execute("SELECT DISTINCT station FROM series ORDER BY station")]
+
+    def channels(self, station):
+        return [r[0] for r in self._reader().execute(
+            "SELECT channel FROM series WHERE station = ? ORDER BY id", (station,))]
+
+    def range(self, station, channel, start_ms, end_ms):
+        """(ts int64 array, values float64 array) for start_ms <= ts <= end_ms, sorted by time."""
+        sid = self._series.get((station, channel))
+        if sid is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        cur = self._reader().execute(
+            "SELECT ts, value FROM samples WHERE series = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+            (sid, int(start_ms), int(end_ms)))
+        rows = np.fromiter(cur, dtype=[("ts", np.int64), ("value", np.float64)])
+        return rows["ts"], rows["value"]
+
+    def rollup_range(self, station, channel, tier, start_ms, end_ms, step=None):
+        """Buckets of one tier overlapping the range: dict of arrays ts, min, max, mean, count, last.
+
+        `step` (ms, a multiple of the tier width) merges the buckets of each
+        step-aligned stretch into one row inside SQLite, so a long range of a
+        fine tier comes back as a few hundred rows instead of tens of thousands.
+        """
+        width = ROLLUP_TIERS[tier]
+        sid = self._series.get((station, channel))
+        dtype = [("ts", np.int64), ("min", np.float64), ("max", np.float64),
+                 ("sum", np.float64), ("count", np.int64), ("last", np.float64)]
+        lo, hi = int(start_ms) // width * width, int(end_ms)
+        if sid is None:
+            rows = np.empty(0, dtype=dtype)
+        elif step is None or step <= width:
+            cur = self._reader().execute(
+                "SELECT bucket, min, max, sum, count, last FROM rollups "
+                "WHERE series = ? AND width = ? AND bucket BETWEEN ? AND ? ORDER BY bucket", (sid, width, lo, hi))
+            rows = np.fromiter(cur, dtype=dtype)
+        else:
+            step = int(step) // width * width
+            # `last` of a merged row is the `last` of its newest bucket
+            cur = self._reader().execute(
+                "SELECT g.b, g.lo, g.hi, g.s, g.n, r.last FROM ("
+                "  SELECT bucket / ? * ? AS b, MIN(min) AS lo, MAX(max) AS hi, SUM(sum) AS s, SUM(count) AS n, "
+                "         MAX(bucket) AS newest FROM rollups "
+                "  WHERE series = ? AND width = ? AND bucket BETWEEN ? AND ? GROUP BY b) g "
+                "JOIN rollups r ON r.series = ? AND r.width = ? AND r.bucket = g.newest ORDER BY g.b",
+                (step, step, sid, width, lo, hi, sid, width))
+            rows = np.fromiter(cur, dtype=dtype)
+
+        return {
+            "ts": rows["ts"],
+            "min": rows["min"],
+            "max": rows["max"],
+            "mean": rows["sum"] / np.maximum(rows["count"], 1),
+            "count": rows["count"],
+            "last": rows["last"],
+        }
+
+    def summary(self, station, start_ms, end_ms):
+        """Summary of the range, merged from whole days plus the hours at either end.
+
+        Hours are the finest grain, so an edge hour that is only partly inside
+        the range counts in full.
+        """
+        day, hour = ROLLUP_TIERS["1d"], ROLLUP_TIERS["1h"]
+        start_ms, end_ms = int(start_ms), int(end_ms)
+        first_day = -(-start_ms // day) * day
+        end_day = (end_ms + 1) // day * day
+        if first_day < end_day:
+            parts = [(day, first_day, end_day - 1), (hour, start_ms // hour * hour, first_day - 1),
+                     (hour, end_day, end_ms)]
+        else:
+            parts = [(hour, start_ms // hour * hour, end_ms)]
+
+        parts = [(width, lo, hi) for width, lo, hi in parts if lo <= hi]
+        with self._stats_lock:
+            # Open buckets hold everything stored for them plus what arrived since
+            live = {(width, bucket): list(p) for width, lo, hi in parts
+                    for bucket, p in self._open_stats.get((station, width), {}).items() if lo <= bucket <= hi}
+
+        summaries = [s for p in live.values() for s in p]
+        for width, lo, hi in parts:
+            for bucket, *row in self._reader().execute(
+                    "SELECT bucket, channels, moments, sketch FROM stats "
+                    "WHERE station = ? AND width = ? AND bucket BETWEEN ? AND ?", (station, width, lo, hi)):
+                if (width, bucket) not in live:
+                    summaries.append(Summary.from_row(*row))
+        return Summary.merge_all(summaries)
+
+    def columns(self, station, start_ms, end_ms, channels=None):
+        """Range query for several channels outer-joined on time: (ts int64 array, {channel: float64 array})."""
+        channels = channels or self.channels(station)
+        series = {ch: self.range(station, ch, start_ms, end_ms) for ch in channels}
+
+        parts = [ts for ts, _ in series.values() if len(ts)]
+        ts_all = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+        cols = {}
+        for ch, (ts, values) in series.items():
+            col = np.full(len(ts_all), np.nan)
+            col[np.searchsorted(ts_all, ts)] = values
+            cols[ch] = col
+        return ts_all, cols
+
+    def frame(self, station, start_ms, end_ms, channels=None):
+        """Range query for several channels, outer-joined on time into a DataFrame with a 'Date' column."""
+        ts, cols = self.columns(station, start_ms, end_ms, channels)
+        data = {"Date": ms_to_datetime(ts)}
+        data.update(cols)
+        return pd.DataFrame(data)
+
+    def rollup_frame(self, station, tier, start_ms, end_ms, channels=None, stat="mean", extremes=(), step=None):
+        """Like frame() but one row per rollup bucket (or per `step`, see rollup_range), holding `stat` of each channel.
+
+        Channels listed in `extremes` also get "<channel> min" / "<channel> max"
+        columns with each bucket's extremes.
+        """
+        channels = channels or self.channels(station)
+        series = {ch: self.rollup_range(station, ch, tier, start_ms, end_ms, step) for ch in channels}
+
+        parts = [r["ts"] for r in series.values() if len(r["ts"])]
+        ts_all = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+        data = {"Date": ms_to_datetime(ts_all)}
+        for ch, r in series.items():
+            at = np.searchsorted(ts_all, r["ts"])
+            columns = [(ch, stat)] + ([(f"{ch} min", "min"), (f"{ch} max", "max")] if ch in extremes else [])
+            for name, key in columns:
+                col = np.full(len(ts_all), np.nan)
+                col[at] = r[key]
+                data[name] = col
+        return pd.DataFrame(data)
+
+
+# Channels and value ranges of the demo history
+DEMO_CHANNELS = {
+    'Temperature': (22, 36),
+    'Humidity': (40, 75),
+    'Pressure': (980, 1025),
+    'PM2.5': (10, 80),
+    'CO2': (400, 1500),
+    'Noise': (25, 85),
+    'Energy_Consumption': (50, 200),
+}
+
+
+def seed_demo_history(store, station, days=30, channels=None):
+    """Backfill `days` of hourly demo readings into an empty store so the analytics pages have data."""
+    channels = channels or DEMO_CHANNELS
+    end = int(time.time() // 3600 * 3600 * 1000)
+    ts = end - np.arange(days * 24)[::-1] * 3600 * 1000
+    store.write_frame(station, ts, {ch: np.random.uniform(lo, hi, len(ts)) for ch, (lo, hi) in channels.items()})